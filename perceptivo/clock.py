@@ -0,0 +1,89 @@
+"""
+A common time base for frames, sound onsets, and pupil measurements.
+
+Times are int nanoseconds from a monotonic clock (:func:`time.monotonic_ns` ),
+which is shared by all processes on a machine and doesn't jump when the wall clock is
+adjusted (eg. by NTP), so aligning pupil measurements to a sound onset is just
+subtracting integers (or int64 arrays, see :func:`.to_seconds` ).
+
+Monotonic times only mean something relative to each other, so each session records a
+:class:`.Clock_Anchor` pairing a monotonic time with the wall-clock time, from :func:`.get_anchor` ,
+to convert them to datetimes when needed.
+"""
+import time
+import typing
+from datetime import datetime
+
+import numpy as np
+from pydantic import BaseModel
+
+NS_PER_S = 1_000_000_000
+
+now_ns = time.monotonic_ns
+"""
+Current time in int ns from the monotonic clock (an alias of :func:`time.monotonic_ns` , to avoid a function call in hot paths)
+"""
+
+_ANCHOR = None # type: typing.Optional['Clock_Anchor']
+
+
+class Clock_Anchor(BaseModel):
+    """
+    A monotonic time and the wall-clock time at the same moment
+
+    Attributes:
+        monotonic_ns (int): from :func:`.now_ns`
+        wall_ns (int): ns since the epoch, from :func:`time.time_ns`
+    """
+    monotonic_ns: int
+    wall_ns: int
+
+    @classmethod
+    def now(cls) -> 'Clock_Anchor':
+        """
+        Anchor for the current moment, using the middle of two monotonic readings
+        taken around the wall-clock reading
+        """
+        before = time.monotonic_ns()
+        wall = time.time_ns()
+        after = time.monotonic_ns()
+        return cls(monotonic_ns=(before + after) // 2, wall_ns=wall)
+
+    def to_wall_ns(self, ns: typing.Union[int, np.ndarray]) -> typing.Union[int, np.ndarray]:
+        """Convert monotonic ns to ns since the epoch"""
+        return ns - self.monotonic_ns + self.wall_ns
+
+    def to_datetime(self, ns: int) -> datetime:
+        """Convert monotonic ns to a local :class:`datetime.datetime`"""
+        wall = self.to_wall_ns(ns)
+        return datetime.fromtimestamp(wall // NS_PER_S).replace(microsecond=(wall % NS_PER_S) // 1000)
+
+    def from_datetime(self, timestamp: datetime) -> int:
+        """Convert a local :class:`datetime.datetime` to monotonic ns"""
+        wall = int(timestamp.timestamp()) * NS_PER_S + timestamp.microsecond * 1000
+        return wall - self.wall_ns + self.monotonic_ns
+
+
+def get_anchor() -> Clock_Anchor:
+    """
+    The anchor for this session, made the first time it is requested.
+    Processes forked after it is made share it.
+    """
+    global _ANCHOR
+    if _ANCHOR is None:
+        _ANCHOR = Clock_Anchor.now()
+    return _ANCHOR
+
+
+def to_seconds(times: typing.Union[typing.Sequence[int], np.ndarray], since: int) -> np.ndarray:
+    """
+    Convert monotonic ns to float seconds since some time, eg. pupil measurements since a sound onset
+
+    Args:
+        times (list, :class:`numpy.ndarray`): monotonic times in ns
+        since (int): monotonic time in ns to measure from
+
+    Returns:
+        :class:`numpy.ndarray` of float64 seconds
+    """
+    return (np.asarray(times, dtype=np.int64) - np.int64(since)) / NS_PER_S
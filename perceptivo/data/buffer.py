@@ -0,0 +1,118 @@
+"""
+Fixed-size buffers for streams of data that shouldn't grow without bound
+"""
+import typing
+
+import numpy as np
+
+
+class Ring_Buffer:
+    """
+    Preallocated numpy ring buffer.
+
+    Holds the most recent ``size`` values, overwriting the oldest once full,
+    so memory use stays constant however long values are appended.
+
+    Examples:
+
+        buffer = Ring_Buffer(1000)
+        buffer.extend(np.arange(1500))
+        buffer.values()
+        # array([ 500,  501, ..., 1499.])
+
+    Args:
+        size (int): Number of values to hold
+        shape (tuple): Shape of each value, eg. ``(2,)`` for x/y pairs, default ``()`` for scalars
+        dtype (str): numpy dtype of the buffer
+        fill: Value to fill the empty buffer with
+    """
+
+    def __init__(self,
+                 size: int,
+                 shape: typing.Tuple[int, ...] = (),
+                 dtype: str = 'float64',
+                 fill: typing.Any = np.nan):
+        if size < 1:
+            raise ValueError(f'Ring buffer size must be at least 1, got {size}')
+        self.size = size
+        self.shape = tuple(shape)
+        self.fill = fill
+        self.buffer = np.full((size,) + self.shape, fill, dtype=dtype) # type: np.ndarray
+        self.index = 0
+        """Index in :attr:`.buffer` that the next value will be written to"""
+        self.count = 0
+        """Total number of values ever appended"""
+
+    def __len__(self) -> int:
+        return min(self.count, self.size)
+
+    @property
+    def full(self) -> bool:
+        return self.count >= self.size
+
+    def append(self, value):
+        """
+        Append a single value, overwriting the oldest value if full
+        """
+        self.buffer[self.index] = value
+        self.index = (self.index + 1) % self.size
+        self.count += 1
+
+    def extend(self, values: typing.Union[np.ndarray, typing.Sequence]):
+        """
+        Append several values at once, with at most two slice assignments.
+
+        Args:
+            values (:class:`numpy.ndarray`): Array of values with shape ``(n,) + shape``
+        """
+        values = np.asarray(values, dtype=self.buffer.dtype)
+        n = values.shape[0]
+        if n == 0:
+            return
+        if n >= self.size:
+            # only the newest values fit
+            self.buffer[:] = values[-self.size:]
+            self.index = 0
+            self.count += n
+            return
+
+        end = self.index + n
+        if end <= self.size:
+            self.buffer[self.index:end] = values
+        else:
+            split = self.size - self.index
+            self.buffer[self.index:] = values[:split]
+            self.buffer[:end - self.size] = values[split:]
+        self.index = end % self.size
+        self.count += n
+
+    def values(self, out: typing.Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Values in the order they were appended, oldest first
+
+        Args:
+            out (:class:`numpy.ndarray`): Optional preallocated array at least as long as the buffer to copy into,
+                to avoid allocating a new array each call.
+
+        Returns:
+            :class:`numpy.ndarray` of length ``len(self)`` , a view of ``out`` if given
+        """
+        n = len(self)
+        if out is None:
+            out = np.empty((n,) + self.shape, dtype=self.buffer.dtype)
+        else:
+            out = out[:n]
+
+        if not self.full:
+            out[:] = self.buffer[:n]
+        else:
+            split = self.size - self.index
+            out[:split] = self.buffer[self.index:]
+            out[split:] = self.buffer[:self.index]
+        return out
+
+    def clear(self):
+        """Empty the buffer, without reallocating it"""
+        self.buffer[:] = self.fill
+        self.index = 0
+        self.count = 0
@@ -1,16 +1,29 @@
 """
 Logging and debugging tools
+
+Loggers don't write to files or the terminal themselves. Each module-level logger made by
+:func:`.init_logger` has a :class:`.Perceptivo_QueueHandler` that puts its records in a
+:class:`multiprocessing.Queue` shared by all processes (see :func:`.get_log_queue` ), and a
+:class:`logging.handlers.QueueListener` thread in the process that made the queue
+writes them to each module's log file and the terminal, so logging calls don't block on I/O.
+
+Messages are formatted only once a record has passed the logger's level and any
+:class:`.Rate_Limit_Filter` , so hot paths should log with %-style arguments rather than
+f-strings, eg. ``logger.debug('processed %d frames', n)`` .
 """
 
 import os
+import json
 import logging
 import typing
 import re
 import multiprocessing as mp
 import inspect
+import time
 from pathlib import Path
-from logging.handlers import RotatingFileHandler
+from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener
 from threading import Lock
+import atexit
 import warnings
 
 from perceptivo import Directories
@@ -22,8 +35,254 @@ List of instantiated loggers, used in :func:`.init_logger` to return existing lo
 
 _INIT_LOCK = Lock() # type: Lock
 
+_QUEUE = None # type: typing.Optional[mp.Queue]
+"""Queue that all loggers put their records in, see :func:`.get_log_queue`"""
+
+_QUEUE_PID = None # type: typing.Optional[int]
+"""pid of the process that made :data:`._QUEUE` , which runs the :data:`._LISTENER`"""
+
+_LISTENER = None # type: typing.Optional[QueueListener]
+
+LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s : %(message)s"
+
+
+class Json_Formatter(logging.Formatter):
+    """
+    Format records as one JSON object per line, with the time, logger name,
+    level, message, process and thread, and the exception if there is one.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'time': self.formatTime(record),
+            'name': record.name,
+            'level': record.levelname,
+            'message': record.getMessage(),
+            'process': record.process,
+            'thread': record.threadName
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry)
+
+
+class Rate_Limit_Filter(logging.Filter):
+    """
+    Limit how many records a logger emits per second, for loggers used in hot paths like
+    per-frame processing.
+
+    A token bucket holds up to ``burst`` records and refills at ``rate`` records per second.
+    Records are dropped when it is empty, and the next record that is let through
+    notes how many were dropped. Records above ``level`` are never dropped.
+
+    Args:
+        rate (float): Records per second
+        burst (int): Most records to let through at once, default ``rate``
+        level (int): Highest level to limit, default ``logging.DEBUG``
+    """
+
+    def __init__(self, rate: float, burst: typing.Optional[int] = None, level: int = logging.DEBUG):
+        super(Rate_Limit_Filter, self).__init__()
+        self.rate = rate
+        self.burst = burst if burst is not None else max(rate, 1)
+        self.level = level
+        self.suppressed = 0
+        self._tokens = self.burst
+        self._last = time.monotonic()
+        self._lock = Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > self.level:
+            return True
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            if self._tokens < 1:
+                self.suppressed += 1
+                return False
+            self._tokens -= 1
+            suppressed, self.suppressed = self.suppressed, 0
+        if suppressed:
+            record.msg = f'{record.msg} [{suppressed} suppressed]'
+        return True
+
+
+class Perceptivo_QueueHandler(QueueHandler):
+    """
+    Put records in the shared log queue, marked with the module logger they came from
+    so the listener can write them to that module's file.
+
+    Only merges the message with its arguments and renders any exception,
+    since records need to be pickled to cross processes -- formatting happens in the listener.
+
+    Args:
+        queue (:class:`multiprocessing.Queue`): Queue to put records in
+        module_name (str): Module logger name, used as the name of the log file
+    """
+
+    def __init__(self, queue: mp.Queue, module_name: str):
+        super(Perceptivo_QueueHandler, self).__init__(queue)
+        self.module_name = module_name
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = _EXC_FORMATTER.formatException(record.exc_info)
+            record.exc_info = None
+        record.log_module = self.module_name
+        return record
+
+
+_EXC_FORMATTER = logging.Formatter()
+
+
+class _Module_Handler(logging.Handler):
+    """
+    Used by the :data:`._LISTENER` to write records to their module's rotating log file, made when
+    a module's first record arrives, and to the terminal.
+
+    Args:
+        json_lines (bool): Write files as JSON lines (``module.jsonl`` ) with a :class:`.Json_Formatter`
+            rather than text (``module.log`` )
+    """
+
+    def __init__(self, json_lines: bool = False):
+        super(_Module_Handler, self).__init__()
+        self.json_lines = json_lines
+        self.files = {} # type: typing.Dict[str, logging.Handler]
+        self.stream = logging.StreamHandler()
+        self.stream.setFormatter(logging.Formatter(LOG_FORMAT))
+
+    def emit(self, record: logging.LogRecord):
+        module_name = getattr(record, 'log_module', record.name)
+        handler = self.files.get(module_name, None)
+        if handler is None:
+            handler = _file_handler(module_name, self.json_lines)
+            self.files[module_name] = handler
+        handler.handle(record)
+        self.stream.handle(record)
+
+    def close(self):
+        for handler in self.files.values():
+            handler.close()
+        super(_Module_Handler, self).close()
+
+
+def _file_handler(module_name: str, json_lines: bool = False) -> RotatingFileHandler:
+    """
+    Make a rotating file handler for a module in :attr:`.Directories.log_dir`
+    """
+    # base filename is the module_name + '.log
+    base_filename = Path(Directories.log_dir) / (module_name + ('.jsonl' if json_lines else '.log'))
+
+    # if directory doesn't exist, try to make it
+    if not base_filename.parent.exists():
+        base_filename.parent.mkdir(parents=True, exist_ok=True)
+
+    try:
+        fh = RotatingFileHandler(
+            str(base_filename),
+            mode='a',
+            maxBytes=2**24,
+            backupCount=4
+        )
+    except PermissionError as e:
+        # catch permissions errors, try to chmod our way out of it
+        try:
+            for mod_file in Path(base_filename).parent.glob(f"{Path(base_filename).stem}*"):
+                os.chmod(mod_file, 0o777)
+                warnings.warn(f'Couldnt access {mod_file}, changed permissions to 0o777')
+
+            fh = RotatingFileHandler(
+                base_filename,
+                mode='a',
+                maxBytes=2**16,
+                backupCount=4
+            )
+        except Exception as f:
+            raise PermissionError(f'Couldnt open logfile {base_filename}, and couldnt chmod our way out of it.\n'+'-'*20+f'\ngot errors:\n{e}\n\n{f}\n'+'-'*20)
+
+    if json_lines:
+        fh.setFormatter(Json_Formatter())
+    else:
+        fh.setFormatter(logging.Formatter(LOG_FORMAT))
+    return fh
+
+
+def get_log_queue() -> mp.Queue:
+    """
+    Get the queue that loggers put records in, making it if it doesn't exist.
+
+    Processes started with ``fork`` inherit the queue. Processes started another way should
+    be given it and call :func:`.set_log_queue` before making any loggers, eg.
+    :class:`.video.cameras.Picamera_Process` ::
+
+        def __init__(self):
+            self._log_queue = get_log_queue()
+
+        def run(self):
+            set_log_queue(self._log_queue)
+    """
+    global _QUEUE, _QUEUE_PID
+    if _QUEUE is None:
+        _QUEUE = mp.Queue(-1)
+        _QUEUE_PID = os.getpid()
+    return _QUEUE
+
+
+def set_log_queue(queue: mp.Queue):
+    """
+    Use a log queue made in another process, so records are written by that process' listener.
+
+    Args:
+        queue (:class:`multiprocessing.Queue`): Queue from :func:`.get_log_queue` in the parent process
+    """
+    global _QUEUE, _QUEUE_PID
+    _QUEUE = queue
+    _QUEUE_PID = None
+
 
-def init_logger(instance=None, module_name=None, class_name=None, object_name=None, loglevel:typing.Optional[str]=None) -> logging.Logger:
+def start_listener(json_lines: bool = False) -> typing.Optional[QueueListener]:
+    """
+    Start the thread that writes records from the log queue, if this process made the queue
+    and it isn't already running. Stopped at exit, after writing the remaining records.
+
+    Args:
+        json_lines (bool): Write log files as JSON lines, see :class:`._Module_Handler`
+
+    Returns:
+        :class:`logging.handlers.QueueListener` , or ``None`` if another process writes the records
+    """
+    global _LISTENER
+    queue = get_log_queue()
+    if _QUEUE_PID != os.getpid():
+        return None
+    if _LISTENER is None:
+        _LISTENER = QueueListener(queue, _Module_Handler(json_lines=json_lines))
+        _LISTENER.start()
+        atexit.register(stop_listener)
+    return _LISTENER
+
+
+def stop_listener():
+    """
+    Stop the listener thread once it has written all queued records
+    """
+    global _LISTENER
+    if _LISTENER is None:
+        return
+    _LISTENER.stop()
+    for handler in _LISTENER.handlers:
+        handler.close()
+    _LISTENER = None
+
+
+def init_logger(instance=None, module_name=None, class_name=None, object_name=None, loglevel:typing.Optional[str]=None,
+                rate_limit: typing.Union[bool, float] = False) -> logging.Logger:
     """
     Initialize a logger
 
@@ -33,6 +292,8 @@ def init_logger(instance=None, module_name=None, class_name=None, object_name=No
     * If the passed object has a ``name`` attribute, that name will be prefixed to its log messages in the file
     * The loglevel for the file handler and the stdout is determined by ``prefs.get('LOGLEVEL')``, and if none is provided ``WARNING`` is used by default
     * logs are rotated according to ``prefs.get('LOGSIZE')`` (in bytes) and ``prefs.get('LOGNUM')`` (number of backups of ``prefs.get('LOGSIZE')`` to cycle through)
+    * records are written by a listener thread rather than by the logging call, see the module docstring,
+      and written as JSON lines if :attr:`.Prefs.log_json` is ``True``
 
     Logs are stored in ``prefs.get('LOGDIR')``, and are formatted like::
 
@@ -47,6 +308,9 @@ def init_logger(instance=None, module_name=None, class_name=None, object_name=No
         module_name (None, str): If no ``instance`` passed, the module name to create a logger for
         class_name (None, str): If no ``instance`` passed, the class name to create a logger for
         object_name (None, str): If no ``instance`` passed, the object name/id to create a logger for
+        loglevel (str): Level of the module logger, if ``None`` use :attr:`.Prefs.loglevel`
+        rate_limit (bool, float): Limit the logger's debug records with a :class:`.Rate_Limit_Filter`.
+            ``True`` uses :attr:`.Prefs.log_rate_limit` records per second, or give a rate.
 
     Returns:
         :class:`logging.logger`
@@ -54,14 +318,18 @@ def init_logger(instance=None, module_name=None, class_name=None, object_name=No
 
     # try to get global prefs for loglevel
     from perceptivo.prefs import get_global
+    globalprefs = get_global()
     if loglevel is None:
-        globalprefs = get_global()
         if globalprefs is not None:
             loglevel = globalprefs.loglevel
         else:
             loglevel = 'WARNING'
     loglevel = getattr(logging, loglevel)
 
+    json_lines = globalprefs.log_json if globalprefs is not None else False
+    if rate_limit is True:
+        rate_limit = globalprefs.log_rate_limit if globalprefs is not None else 20
+
 
     # --------------------------------------------------
     # gather variables
@@ -139,54 +407,73 @@ def init_logger(instance=None, module_name=None, class_name=None, object_name=No
             parent_logger = logging.getLogger(module_name)
             parent_logger.setLevel(loglevel)
 
-            # make formatter that includes name
-            log_formatter = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s : %(message)s")
-
-            ## file handler
-            # base filename is the module_name + '.log
-            base_filename = Path(Directories.log_dir) / (module_name + '.log')
-
-            # if directory doesn't exist, try to make it
-            if not base_filename.parent.exists():
-                base_filename.parent.mkdir(parents=True, exist_ok=True)
-
-            try:
-                fh = RotatingFileHandler(
-                    str(base_filename),
-                    mode='a',
-                    maxBytes=2**24,
-                    backupCount=4
-                )
-            except PermissionError as e:
-                # catch permissions errors, try to chmod our way out of it
-                try:
-                    for mod_file in Path(base_filename).parent.glob(f"{Path(base_filename).stem}*"):
-                        os.chmod(mod_file, 0o777)
-                        warnings.warn(f'Couldnt access {mod_file}, changed permissions to 0o777')
-
-                    fh = RotatingFileHandler(
-                        base_filename,
-                        mode='a',
-                        maxBytes=2**16,
-                        backupCount=4
-                    )
-                except Exception as f:
-                    raise PermissionError(f'Couldnt open logfile {base_filename}, and couldnt chmod our way out of it.\n'+'-'*20+f'\ngot errors:\n{e}\n\n{f}\n'+'-'*20)
-
-            fh.setLevel(loglevel)
-            fh.setFormatter(log_formatter)
-            parent_logger.addHandler(fh)
-
-            sh = logging.StreamHandler()
-            fh.setFormatter(log_formatter)
-            sh.setLevel(loglevel)
-            parent_logger.addHandler(sh)
+            # records are written by the listener, see module docstring
+            start_listener(json_lines=json_lines)
+            parent_logger.addHandler(Perceptivo_QueueHandler(get_log_queue(), module_name))
 
             ## log creation
             globals()['_LOGGERS'].append(module_name)
-            parent_logger.info(f'parent, module-level logger created: {module_name}')
+            parent_logger.info('parent, module-level logger created: %s', module_name)
 
         logger = logging.getLogger(logger_name)
-        logger.info(f"Logger created: {logger_name}")
+        if rate_limit and not any(isinstance(f, Rate_Limit_Filter) for f in logger.filters):
+            logger.addFilter(Rate_Limit_Filter(rate_limit))
+        logger.info("Logger created: %s", logger_name)
+
+    return logger
 
-    return logger
\ No newline at end of file
+def benchmark_logging(n_calls: int = 10000, directory: typing.Optional[Path] = None) -> typing.Dict[str, float]:
+    """
+    Measure the time the caller spends per logging call (μs) when logging:
+
+    * ``file`` - directly to a rotating file handler, as loggers did before the queue
+    * ``queue`` - through a :class:`.Perceptivo_QueueHandler` to a listener thread
+    * ``rate_limited`` - through the queue with a :class:`.Rate_Limit_Filter` dropping most records
+    * ``disabled`` - below the logger's level
+
+    Each logs a %-style debug message with an argument, like per-frame messages.
+
+    Args:
+        n_calls (int): Number of logging calls to time for each
+        directory (:class:`pathlib.Path`): Directory to write log files in, default a temporary directory
+
+    Returns:
+        dict of μs per call for each
+    """
+    import tempfile
+    from queue import Queue
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmpdir:
+        directory = Path(tmpdir) if directory is None else Path(directory)
+        for kind in ('file', 'queue', 'rate_limited', 'disabled'):
+            logger = logging.getLogger(f'perceptivo_benchmark.{kind}')
+            logger.propagate = False
+            logger.setLevel(logging.INFO if kind == 'disabled' else logging.DEBUG)
+
+            file_handler = RotatingFileHandler(str(directory / f'{kind}.log'), maxBytes=2**24, backupCount=1)
+            file_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+            listener = None
+            if kind == 'file':
+                logger.addHandler(file_handler)
+            else:
+                queue = Queue()
+                logger.addHandler(Perceptivo_QueueHandler(queue, kind))
+                listener = QueueListener(queue, file_handler)
+                listener.start()
+            if kind == 'rate_limited':
+                logger.addFilter(Rate_Limit_Filter(rate=100))
+
+            start = time.perf_counter()
+            for i in range(n_calls):
+                logger.debug('processed %d frames', i)
+            results[kind] = (time.perf_counter() - start) / n_calls * 1e6
+
+            if listener is not None:
+                listener.stop()
+            for handler in list(logger.handlers):
+                logger.removeHandler(handler)
+            for filt in list(logger.filters):
+                logger.removeFilter(filt)
+            file_handler.close()
+    return results
@@ -0,0 +1,395 @@
+"""
+Counters, gauges, and histograms to monitor queue depths, frame rates, and latencies while running.
+
+Each process has one :class:`.Metrics_Registry` , from :func:`.get_registry` .
+:class:`.Perceptivo_Object` s get metrics named after their class from their
+:attr:`~.Perceptivo_Object.metrics` property, eg. in :class:`.video.cameras.Picamera_Process` ::
+
+    frames = self.metrics.counter('frames')
+    frames.inc()
+    # -> 'picamera_process.frames'
+
+Processes started by the runtime (like the :class:`.video.cameras.Picamera_Process` ) send
+their metrics to the runtime's registry with :meth:`.Metrics_Registry.publish` , where they are
+aggregated with :meth:`.Metrics_Registry.snapshot` , which can be served as text by a
+:class:`.Metrics_Server` or sent to the clinician (see :meth:`.runtimes.patient.Patient.send_metrics` ).
+"""
+import json
+import math
+import multiprocessing as mp
+import os
+import re
+import threading
+import time
+import typing
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from queue import Empty
+
+DEFAULT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, math.inf)
+"""Default upper bounds of :class:`.Histogram` buckets, in ms"""
+
+_REGISTRY = None # type: typing.Optional[Metrics_Registry]
+_QUEUE = None # type: typing.Optional[mp.Queue]
+_LOCK = threading.Lock()
+
+
+class Counter:
+    """
+    A value that only goes up, eg. number of frames captured
+    """
+    kind = 'counter'
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, n: float = 1):
+        with self._lock:
+            self.value += n
+
+    def snapshot(self) -> dict:
+        return {'type': self.kind, 'value': self.value}
+
+
+class Gauge:
+    """
+    A value that can go up and down, eg. the depth of a queue
+    """
+    kind = 'gauge'
+
+    def __init__(self):
+        self.value = 0
+
+    def set(self, value: float):
+        self.value = value
+
+    def snapshot(self) -> dict:
+        return {'type': self.kind, 'value': self.value}
+
+
+class Histogram:
+    """
+    Distribution of observed values, eg. latencies in ms, counted in fixed buckets
+    so memory doesn't grow with the number of observations.
+
+    Args:
+        buckets (tuple): Upper bounds of buckets, ending with ``math.inf`` , default :data:`.DEFAULT_BUCKETS`
+    """
+    kind = 'histogram'
+
+    def __init__(self, buckets: typing.Tuple[float, ...] = DEFAULT_BUCKETS):
+        if buckets[-1] != math.inf:
+            buckets = tuple(buckets) + (math.inf,)
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.max = -math.inf
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        with self._lock:
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self.counts[i] += 1
+                    break
+            self.count += 1
+            self.sum += value
+            if value > self.max:
+                self.max = value
+
+    @contextmanager
+    def time(self):
+        """
+        Observe the time (ms) spent in a ``with`` block::
+
+            with histogram.time():
+                do_something()
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe((time.perf_counter() - start) * 1000)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                'type': self.kind,
+                'count': self.count,
+                'sum': self.sum,
+                'max': self.max if self.count else None,
+                'buckets': [[bound, n] for bound, n in zip(self.buckets, self.counts)]
+            }
+
+
+def quantile(snapshot: dict, q: float) -> typing.Optional[float]:
+    """
+    Estimate a quantile of a histogram snapshot as the upper bound of the bucket it falls in
+    (or the maximum, for the last bucket)
+
+    Args:
+        snapshot (dict): from :meth:`.Histogram.snapshot`
+        q (float): quantile, from 0-1
+
+    Returns:
+        float, or ``None`` if nothing has been observed
+    """
+    if not snapshot['count']:
+        return None
+    target = q * snapshot['count']
+    seen = 0
+    for bound, n in snapshot['buckets']:
+        seen += n
+        if seen >= target:
+            return snapshot['max'] if bound == math.inf else min(bound, snapshot['max'])
+    return snapshot['max']
+
+
+def merge(snapshots: typing.Iterable[typing.Dict[str, dict]]) -> typing.Dict[str, dict]:
+    """
+    Aggregate snapshots from several registries: counters and histograms are summed,
+    and gauges take the last value given.
+
+    Args:
+        snapshots: iterable of dicts from :meth:`.Metrics_Registry.snapshot`
+
+    Returns:
+        dict of merged snapshots
+    """
+    merged = {} # type: typing.Dict[str, dict]
+    for snapshot in snapshots:
+        for name, metric in snapshot.items():
+            if name not in merged or metric['type'] == 'gauge':
+                merged[name] = {k: ([list(b) for b in v] if k == 'buckets' else v) for k, v in metric.items()}
+            elif metric['type'] == 'counter':
+                merged[name]['value'] += metric['value']
+            elif metric['type'] == 'histogram':
+                existing = merged[name]
+                existing['count'] += metric['count']
+                existing['sum'] += metric['sum']
+                maxes = [m for m in (existing['max'], metric['max']) if m is not None]
+                existing['max'] = max(maxes) if maxes else None
+                for bucket, (_, n) in zip(existing['buckets'], metric['buckets']):
+                    bucket[1] += n
+    return merged
+
+
+class Metrics_Scope:
+    """
+    Get metrics from a registry with names prefixed by a scope, eg. the class that uses them.
+    See :attr:`.Perceptivo_Object.metrics`
+    """
+
+    def __init__(self, registry: 'Metrics_Registry', prefix: str):
+        self.registry = registry
+        self.prefix = prefix
+
+    def counter(self, name: str) -> Counter:
+        return self.registry.counter(f'{self.prefix}.{name}')
+
+    def gauge(self, name: str) -> Gauge:
+        return self.registry.gauge(f'{self.prefix}.{name}')
+
+    def histogram(self, name: str, buckets: typing.Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self.registry.histogram(f'{self.prefix}.{name}', buckets)
+
+
+class Metrics_Registry:
+    """
+    Named metrics for one process, along with the latest snapshots published by other processes.
+
+    Args:
+        queue (:class:`multiprocessing.Queue`): Queue to publish snapshots to and collect them from,
+            default the queue from :func:`.get_metrics_queue` , if it has been made
+    """
+
+    def __init__(self, queue: typing.Optional[mp.Queue] = None):
+        self.metrics = {} # type: typing.Dict[str, typing.Union[Counter, Gauge, Histogram]]
+        self.remote = {} # type: typing.Dict[int, typing.Dict[str, dict]]
+        """Latest snapshot from each other process, by pid"""
+        self.queue = queue
+        self.pid = os.getpid()
+        self._last_publish = 0.0
+        self._lock = threading.Lock()
+
+    def _get(self, name: str, cls: typing.Type, *args):
+        metric = self.metrics.get(name, None)
+        if metric is None:
+            with self._lock:
+                metric = self.metrics.get(name, None)
+                if metric is None:
+                    metric = cls(*args)
+                    self.metrics[name] = metric
+        if not isinstance(metric, cls):
+            raise TypeError(f'Metric {name} is a {metric.kind}, not a {cls.kind}')
+        return metric
+
+    def counter(self, name: str) -> Counter:
+        return self._get(name, Counter)
+
+    def gauge(self, name: str) -> Gauge:
+        return self._get(name, Gauge)
+
+    def histogram(self, name: str, buckets: typing.Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get(name, Histogram, buckets)
+
+    def scope(self, prefix: str) -> Metrics_Scope:
+        return Metrics_Scope(self, prefix)
+
+    def local_snapshot(self) -> typing.Dict[str, dict]:
+        """Snapshot of this process' metrics"""
+        return {name: metric.snapshot() for name, metric in list(self.metrics.items())}
+
+    def _queue(self) -> typing.Optional[mp.Queue]:
+        return self.queue if self.queue is not None else _QUEUE
+
+    def publish(self, interval: float = 1.0) -> bool:
+        """
+        Send this process' snapshot to the registry that made the queue, at most once every ``interval`` seconds,
+        so it is cheap to call every loop.
+
+        Returns:
+            bool: ``True`` if a snapshot was sent
+        """
+        queue = self._queue()
+        now = time.monotonic()
+        if queue is None or now - self._last_publish < interval:
+            return False
+        self._last_publish = now
+        try:
+            queue.put_nowait((self.pid, self.local_snapshot()))
+        except Exception:
+            return False
+        return True
+
+    def collect(self):
+        """Store the snapshots other processes have published"""
+        queue = self._queue()
+        if queue is None:
+            return
+        while True:
+            try:
+                pid, snapshot = queue.get_nowait()
+            except (Empty, OSError, ValueError):
+                break
+            if pid != self.pid:
+                self.remote[pid] = snapshot
+
+    def snapshot(self) -> typing.Dict[str, dict]:
+        """
+        Snapshot of the metrics from this process merged with the latest from other processes, see :func:`.merge`
+        """
+        self.collect()
+        return merge([self.local_snapshot()] + list(self.remote.values()))
+
+    def render_text(self) -> str:
+        """
+        Render :meth:`.snapshot` in the Prometheus text format, eg.::
+
+            perceptivo_picamera_process_frames 1200
+            perceptivo_pupilextractor_extraction_ms_bucket{le="5"} 10
+        """
+        lines = []
+        for name, metric in sorted(self.snapshot().items()):
+            name = 'perceptivo_' + re.sub(r'[^a-zA-Z0-9_]', '_', name)
+            lines.append(f"# TYPE {name} {metric['type']}")
+            if metric['type'] == 'histogram':
+                cumulative = 0
+                for bound, n in metric['buckets']:
+                    cumulative += n
+                    le = '+Inf' if bound == math.inf else f'{bound:g}'
+                    lines.append(f'{name}_bucket{{le="{le}"}} {cumulative}')
+                lines.append(f"{name}_sum {metric['sum']:g}")
+                lines.append(f"{name}_count {metric['count']}")
+            else:
+                lines.append(f"{name} {metric['value']:g}")
+        return '\n'.join(lines) + '\n'
+
+
+class Metrics_Server:
+    """
+    Serve a registry's metrics over HTTP from a thread, as text at ``/metrics``
+    (see :meth:`.Metrics_Registry.render_text` ) and as JSON at ``/metrics.json``
+
+    Args:
+        registry (:class:`.Metrics_Registry`): Registry to serve, default from :func:`.get_registry`
+        port (int): Port to serve on, ``0`` to pick a free one
+        host (str): Host to serve on, default only locally
+    """
+
+    def __init__(self, registry: typing.Optional[Metrics_Registry] = None, port: int = 9100, host: str = '127.0.0.1'):
+        self.registry = registry if registry is not None else get_registry()
+        registry = self.registry
+
+        class _Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == '/metrics':
+                    body = registry.render_text().encode('utf-8')
+                    content_type = 'text/plain; version=0.0.4'
+                elif self.path == '/metrics.json':
+                    body = json.dumps(registry.snapshot()).encode('utf-8')
+                    content_type = 'application/json'
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), _Handler)
+        self.port = self.server.server_address[1]
+        self._thread = None # type: typing.Optional[threading.Thread]
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def get_metrics_queue() -> mp.Queue:
+    """
+    Get the queue that processes publish snapshots to, making it if it doesn't exist.
+    Like :func:`.data.logging.get_log_queue` , processes not started with ``fork`` need to be
+    given it and call :func:`.set_metrics_queue` .
+    """
+    global _QUEUE
+    with _LOCK:
+        if _QUEUE is None:
+            _QUEUE = mp.Queue(maxsize=64)
+    return _QUEUE
+
+
+def set_metrics_queue(queue: mp.Queue):
+    """
+    Publish to a queue made by another process
+
+    Args:
+        queue (:class:`multiprocessing.Queue`): from :func:`.get_metrics_queue` in the parent process
+    """
+    global _QUEUE
+    _QUEUE = queue
+
+
+def get_registry() -> Metrics_Registry:
+    """
+    Get this process' registry.
+
+    A forked process gets a new, empty registry rather than the copy of its parent's,
+    so the parent's metrics aren't counted twice when it publishes.
+    """
+    global _REGISTRY
+    if _REGISTRY is None or _REGISTRY.pid != os.getpid():
+        with _LOCK:
+            if _REGISTRY is None or _REGISTRY.pid != os.getpid():
+                _REGISTRY = Metrics_Registry()
+    return _REGISTRY
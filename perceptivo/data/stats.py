@@ -0,0 +1,165 @@
+"""
+Streaming statistics that update in O(1) time and memory per value, for quantities
+that are accumulated over a whole session, like pupil diameters (see :mod:`.psychophys.calibration` ).
+
+* :class:`.Welford` - count, mean, and variance with Welford's algorithm
+* :class:`.P2_Quantile` - a quantile estimated with the P² algorithm (Jain & Chlamtac, 1985)
+"""
+import math
+import typing
+
+
+class Welford:
+    """
+    Running count, mean, and variance with Welford's algorithm, which stays accurate
+    when the variance is small relative to the mean (unlike summing squares)
+
+    Examples:
+
+        stats = Welford()
+        stats.update_many([1, 2, 3, 4])
+        stats.mean, stats.var
+        # (2.5, 1.6666666666666667)
+    """
+
+    def __init__(self):
+        self.n = 0
+        self.mean = 0.
+        self._m2 = 0.
+
+    def update(self, value: float):
+        """Add one value"""
+        self.n += 1
+        delta = value - self.mean
+        self.mean += delta / self.n
+        self._m2 += delta * (value - self.mean)
+
+    def update_many(self, values: typing.Iterable[float]):
+        """Add several values"""
+        for value in values:
+            self.update(value)
+
+    def merge(self, other: 'Welford') -> 'Welford':
+        """
+        Combine with another :class:`.Welford` , eg. from another process, with Chan et al.'s parallel update
+
+        Returns:
+            :class:`.Welford` , a new object with the combined statistics
+        """
+        merged = Welford()
+        merged.n = self.n + other.n
+        if merged.n == 0:
+            return merged
+        delta = other.mean - self.mean
+        merged.mean = self.mean + delta * other.n / merged.n
+        merged._m2 = self._m2 + other._m2 + delta ** 2 * self.n * other.n / merged.n
+        return merged
+
+    @property
+    def var(self) -> float:
+        """Sample variance, ``nan`` with fewer than two values"""
+        if self.n < 2:
+            return math.nan
+        return self._m2 / (self.n - 1)
+
+    @property
+    def std(self) -> float:
+        """Sample standard deviation, ``nan`` with fewer than two values"""
+        return math.sqrt(self.var)
+
+    def __repr__(self) -> str:
+        return f'Welford(n={self.n}, mean={self.mean}, std={self.std})'
+
+
+class P2_Quantile:
+    """
+    Estimate a quantile of a stream without storing it, with the P² algorithm.
+
+    Five markers track the minimum, the ``p/2`` , ``p`` , and ``(1+p)/2`` quantiles, and the maximum.
+    As values arrive, markers that fall behind or ahead of their desired position are moved by
+    piecewise-parabolic interpolation of their neighbors. Until five values have been seen, the exact
+    quantile of those values is returned.
+
+    References:
+        Jain, R. and Chlamtac, I. (1985) The P² algorithm for dynamic calculation of quantiles and
+        histograms without storing observations. Communications of the ACM, 28(10), 1076-1085.
+
+    Args:
+        p (float): Quantile to estimate, between 0 and 1
+    """
+
+    def __init__(self, p: float):
+        if not 0 < p < 1:
+            raise ValueError(f'Quantile must be between 0 and 1, got {p}')
+        self.p = p
+        self.n = 0
+        self._heights = [] # type: typing.List[float]
+        self._positions = [0, 1, 2, 3, 4]
+        self._desired = [0, 2 * p, 4 * p, 2 + 2 * p, 4]
+        self._increments = [0, p / 2, p, (1 + p) / 2, 1]
+
+    def update(self, value: float):
+        """Add one value"""
+        self.n += 1
+        q = self._heights
+        if len(q) < 5:
+            q.append(value)
+            q.sort()
+            return
+
+        # find the cell the value falls in, extending the extremes if needed
+        if value < q[0]:
+            q[0] = value
+            k = 0
+        elif value >= q[4]:
+            q[4] = value
+            k = 3
+        else:
+            k = 0
+            while value >= q[k + 1]:
+                k += 1
+
+        n = self._positions
+        for i in range(k + 1, 5):
+            n[i] += 1
+        for i in range(5):
+            self._desired[i] += self._increments[i]
+
+        # adjust the middle markers
+        for i in range(1, 4):
+            d = self._desired[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                d = 1 if d > 0 else -1
+                height = self._parabolic(i, d)
+                if not q[i - 1] < height < q[i + 1]:
+                    height = q[i] + d * (q[i + d] - q[i]) / (n[i + d] - n[i])
+                q[i] = height
+                n[i] += d
+
+    def _parabolic(self, i: int, d: int) -> float:
+        q, n = self._heights, self._positions
+        return q[i] + d / (n[i + 1] - n[i - 1]) * (
+            (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i]) +
+            (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1])
+        )
+
+    def update_many(self, values: typing.Iterable[float]):
+        """Add several values"""
+        for value in values:
+            self.update(value)
+
+    @property
+    def value(self) -> float:
+        """The current estimate, ``nan`` if no values have been added"""
+        if self.n == 0:
+            return math.nan
+        if self.n < 5:
+            # exact quantile, interpolating between the values we have
+            position = self.p * (self.n - 1)
+            lower = math.floor(position)
+            upper = min(lower + 1, self.n - 1)
+            return self._heights[lower] + (position - lower) * (self._heights[upper] - self._heights[lower])
+        return self._heights[2]
+
+    def __repr__(self) -> str:
+        return f'P2_Quantile(p={self.p}, n={self.n}, value={self.value})'
@@ -0,0 +1,6 @@
+# configured here rather than in the top-level package so only the GUI pays to import pyqtgraph
+try:
+    import pyqtgraph
+    pyqtgraph.setConfigOption('useOpenGL', True)
+except ImportError:
+    pass
@@ -4,12 +4,14 @@ Main Gui container for Perceptivo Clinician interface
 
 """
 import sys
+import typing
+from collections import deque
 from typing import Optional, Dict
 import cv2
 
 import numpy as np
 from PySide6 import QtWidgets
-from PySide6.QtCore import Signal, Slot, QThread, QTimer
+from PySide6.QtCore import Signal, Slot, QThread, QTimer, QSocketNotifier
 from importlib.metadata import version
 import threading
 import zmq
@@ -17,12 +19,15 @@ import zmq
 from perceptivo.gui import widgets
 from perceptivo.root import Perceptivo_Object
 from perceptivo.prefs import Clinician_Prefs
+from perceptivo.clock import now_ns
 from perceptivo.networking.node import Node
+from perceptivo.networking.clock_sync import Clock_Sync, ping, pong, PING_KEY, PONG_KEY
 from perceptivo.networking.messages import Message
 from perceptivo.data.logging import init_logger
 
 from perceptivo.types.networking import Clinician_Networking, Socket
 from perceptivo.types.video import Frame
+from perceptivo.types.pupil import Pupil_Calibration_State
 from perceptivo.types.gui import GUI_Control
 from perceptivo.types.psychophys import Samples
 from perceptivo.types.exam import Exam_Params
@@ -30,6 +35,19 @@ from perceptivo.types.exam import Exam_Params
 class Perceptivo_Clinician(QtWidgets.QMainWindow):
     """
     GUI container for the Perceptivo clinician interface
+
+    Messages from the patient are received when the control socket's file descriptor
+    becomes readable (with a :class:`PySide6.QtCore.QSocketNotifier` ), rather than by polling,
+    see :meth:`.receive_messages`
+
+    Connected patients are pinged every :attr:`.Clinician_Prefs.ping_interval` seconds to estimate
+    round trip times and the offsets of their clocks, so times in their :class:`.types.psychophys.Sample` s
+    can be converted to the clinician's clock with :meth:`.patient_time` , see :mod:`.networking.clock_sync`
+
+    Args:
+        prefs (:class:`.prefs.Clinician_Prefs`): Clinician prefs
+        networking (:class:`.types.networking.Clinician_Networking`): Sockets to use
+        update_period (float): Unused, kept for compatibility. Messages used to be polled at this interval.
     """
     quitting = Signal()
     launched = Signal()
@@ -57,8 +75,8 @@ class Perceptivo_Clinician(QtWidgets.QMainWindow):
 
         self.control_panel = None # type: Optional[widgets.Control_Panel]
         self.pupil_ts = None # type: Optional[widgets.Pupil]
-        self.vid_pupil = None # type: Optional[widgets.Video]
-        self.vid_patient = None # type: Optional[widgets.Video]
+        self.vid_pupil = None # type: Optional[typing.Union[widgets.Video, widgets.GLVideo]]
+        self.vid_patient = None # type: Optional[typing.Union[widgets.Video, widgets.GLVideo]]
         self.audiogram = None # type: Optional[widgets.Audiogram]
         self.samples = None # type: Optional[Samples]
         self._started = False
@@ -72,22 +90,35 @@ class Perceptivo_Clinician(QtWidgets.QMainWindow):
 
         self.callbacks = {
             'CONNECT': self.cb_connect,
-            'DATA': self.cb_data
+            'DATA': self.cb_data,
+            'COMPLETE': self.cb_complete,
+            'METRICS': self.cb_metrics,
+            PING_KEY: self.cb_ping,
+            PONG_KEY: self.cb_pong
         }
 
         self.senders = []
 
+        self.patient_metrics = {} # type: Dict[str, dict]
+        """Latest metrics sent by the patient, see :mod:`.data.metrics`"""
+
+        self.message_latency = deque(maxlen=1000) # type: typing.Deque[float]
+        """Latency (ms) between when recent messages were sent and when they were received, see :meth:`.receive_messages`"""
+
+        self.pupil_calibration = None # type: typing.Optional[Pupil_Calibration_State]
+        """Latest state of the patient's pupil calibration, see :mod:`.psychophys.calibration`"""
+
+        self.clocks = {} # type: Dict[str, Clock_Sync]
+        """Round trip time and clock offset estimates for each connected patient"""
+
+        self.node = None # type: Optional[Node]
+        self.msg_notifier = None # type: Optional[QSocketNotifier]
+        self.ping_timer = None # type: Optional[QTimer]
+
         self._init_ui()
         self._init_networking()
         self._init_signals()
 
-        # make timer to check for messages
-        self.msg_timer = QTimer()
-        self.msg_timer.setSingleShot(True)
-        self.msg_timer.timeout.connect(self.receive_messages)
-        self.msg_timer.setInterval(self.update_period*1000)
-
-
         self.show()
         self.launched.emit()
         self.receive_messages()
@@ -109,8 +140,9 @@ class Perceptivo_Clinician(QtWidgets.QMainWindow):
             default_frequencies=self.control_panel.widgets['frequency_range'].value()
         )
         self.pupil_ts = widgets.Pupil()
-        self.vid_pupil = widgets.Video()
-        self.vid_patient = widgets.Video()
+        video_widget = widgets.get_video_widget(self.prefs.gui.video_widget)
+        self.vid_pupil = video_widget()
+        self.vid_patient = video_widget()
 
         # layout widgets!
         self.layout.addWidget(self.control_panel, 0, 0)
@@ -131,6 +163,19 @@ class Perceptivo_Clinician(QtWidgets.QMainWindow):
             self.networking.control,
             poll_mode=Node.Poll_Mode.NONE
         )
+        # the zmq fd signals when the socket's events change, see receive_messages
+        self.msg_notifier = QSocketNotifier(
+            self.node.socket.getsockopt(zmq.FD),
+            QSocketNotifier.Type.Read,
+            self
+        )
+        self.msg_notifier.activated.connect(self.receive_messages)
+
+        if self.prefs.ping_interval is not None:
+            self.ping_timer = QTimer(self)
+            self.ping_timer.setInterval(round(self.prefs.ping_interval * 1000))
+            self.ping_timer.timeout.connect(self.ping)
+            self.ping_timer.start()
 
     def _init_signals(self):
         # signals coming into the GUI
@@ -161,10 +206,7 @@ class Perceptivo_Clinician(QtWidgets.QMainWindow):
         """
         # create a message to send to patient
         msg = Message(control=value, key="CONTROL")
-        self.node.send(
-            to="patient:control",
-            msg=msg
-        )
+        self.send(msg=msg, to="patient:control")
         self.controlChanged.emit(value)
 
 
@@ -197,12 +239,14 @@ class Perceptivo_Clinician(QtWidgets.QMainWindow):
 
 
     def _start_exam(self):
+        self.pupil_ts.clear()
+        self.audiogram.clear()
         msg = Message(key='START', params=self.exam_params)
-        self.node.send(msg=msg, to='patient:control')
+        self.send(msg=msg, to='patient:control')
 
 
     def _stop_exam(self):
-        self.node.send(Message(key='STOP'), to="patient:control")
+        self.send(Message(key='STOP'), to="patient:control")
         self.logger.debug('sent stop message to patient')
 
     @property
@@ -211,36 +255,134 @@ class Perceptivo_Clinician(QtWidgets.QMainWindow):
         # TODO
         return self._settings
 
-    @Slot(Frame)
-    def drawFrame(self, frame):
-        frame = np.frombuffer(frame, dtype='uint8')
-        self.vid_pupil.setImage(cv2.imdecode(frame, -1))
-        # frame = Message.from_serialized(frame).value['frame']
-        # self.vid_pupil.setImage(frame.frame)
+    @Slot()
+    def drawFrame(self):
+        """
+        Draw the newest frame decoded by the :class:`.Frame_Receiver` .
+
+        The receiver only signals when there isn't already a frame waiting to be drawn,
+        so frames that arrive faster than they can be painted are dropped rather than queued.
+        """
+        frame = self.frame_receiver.take()
+        if frame is not None:
+            self.vid_pupil.setImage(frame)
+
 
+    def send(self, msg: Message, to: str):
+        """
+        Send a message with the control :attr:`.node`
+
+        Sending changes the socket's events without the fd necessarily becoming readable,
+        so messages that arrived meanwhile are drained once control returns to the event loop.
+        """
+        self.node.send(msg=msg, to=to)
+        QTimer.singleShot(0, self.receive_messages)
 
     def receive_messages(self):
+        """
+        Handle all messages waiting on the control socket.
 
+        The zmq fd is edge-triggered: the :attr:`.msg_notifier` fires when the socket's
+        events change, not once per message, so the socket is drained until it has no
+        more incoming messages.
+
+        The latency of each message from a patient whose clock has been :meth:`.ping` ed
+        (from when it was sent to when it was received, see :meth:`.Clock_Sync.latency_ms` )
+        is stored in :attr:`.message_latency` , see :attr:`.latency` .
+        """
+        if self.msg_notifier is not None:
+            self.msg_notifier.setEnabled(False)
+
+        n_messages = 0
         try:
+            while self.node.socket.getsockopt(zmq.EVENTS) & zmq.POLLIN:
+                try:
+                    frames = self.node.socket.recv_multipart(flags=zmq.NOBLOCK)
+                except zmq.Again:
+                    break
+                received = now_ns()
+                try:
+                    msg = Message.from_serialized(frames[-1])
+                except Exception as e:
+                    # keep draining, the notifier won't fire again for messages already waiting
+                    self.logger.exception('Could not deserialize message: %s', e)
+                    continue
+                msg.received = received
+                if len(frames) > 1:
+                    msg.sender = frames[0].decode('utf-8')
+                n_messages += 1
+
+                clock = self.clocks.get(msg.sender, None)
+                latency = clock.latency_ms(msg.sent, received) if clock is not None else None
+                if latency is not None:
+                    self.message_latency.append(latency)
+                self.logger.debug('Received message: %s, latency: %sms', msg, latency)
+
+                if msg.key in self.callbacks.keys():
+                    try:
+                        self.callbacks[msg.key](msg)
+                        self.logger.debug('Called callback for key %s', msg.key)
+                    except Exception as e:
+                        self.logger.exception('Exception in callback for key %s: %s', msg.key, e)
+        finally:
+            if self.msg_notifier is not None:
+                self.msg_notifier.setEnabled(True)
 
-            msg = self.node.socket.recv_multipart(flags=zmq.NOBLOCK)
-            msg = Message.from_serialized(msg[-1])
+        if n_messages > 1:
+            self.logger.debug(f'Handled {n_messages} messages in one wakeup')
 
-            self.logger.debug(f'Received message: {msg}')
+    @property
+    def latency(self) -> Dict[str, float]:
+        """
+        Summary of :attr:`.message_latency` (ms): ``n`` , ``mean`` , ``median`` , ``max``
+        """
+        if len(self.message_latency) == 0:
+            return {'n': 0, 'mean': np.nan, 'median': np.nan, 'max': np.nan}
+        latency = np.array(self.message_latency)
+        return {
+            'n': len(latency),
+            'mean': float(np.mean(latency)),
+            'median': float(np.median(latency)),
+            'max': float(np.max(latency))
+        }
 
-            if msg.key in self.callbacks.keys():
-                self.callbacks[msg.key](msg)
-                self.logger.debug(f"Called callback for key {msg.key}")
+    @Slot()
+    def ping(self):
+        """
+        Ping each connected patient, the replies are handled by :meth:`.cb_pong`
+        """
+        for sender in self.senders:
+            self.node.send(Message(key=PING_KEY, **ping()), to=sender)
 
-        except zmq.ZMQError as e:
-            if str(e) == 'Resource temporarily unavailable':
-                pass
-                # no messages to process
-            else:
-                raise e
+    def patient_time(self, ns: typing.Any, patient: Optional[str] = None) -> typing.Any:
+        """
+        Convert a time (or array of times) from a patient's clock to the clinician's, eg.
+        a :attr:`.types.sound.Sound.timestamp` , see :meth:`.Clock_Sync.to_local`
 
-        finally:
-            self.msg_timer.start()
+        Args:
+            ns (int, :class:`numpy.ndarray`): patient's monotonic time in ns
+            patient (str): ID of the patient, defaults to the first connected patient
+
+        Returns:
+            monotonic time in ns on the clinician's clock
+        """
+        if patient is None:
+            if len(self.senders) == 0:
+                raise ValueError('No patients are connected')
+            patient = self.senders[0]
+        if patient not in self.clocks:
+            raise ValueError(f'Patient {patient} has not been pinged yet')
+        return self.clocks[patient].to_local(ns)
+
+    def cb_ping(self, msg:Message):
+        """Reply to a clock ping from a patient"""
+        self.node.send(Message(key=PONG_KEY, **pong(msg)), to=msg.sender)
+
+    def cb_pong(self, msg:Message):
+        """Add a pong reply to :meth:`.ping` to the patient's :class:`.Clock_Sync`"""
+        if msg.sender not in self.clocks:
+            self.clocks[msg.sender] = Clock_Sync(msg.sender)
+        self.clocks[msg.sender].add_pong(msg)
 
     def cb_connect(self, msg:Message):
         """
@@ -258,36 +400,94 @@ class Perceptivo_Clinician(QtWidgets.QMainWindow):
         """
         Receive data from the patient during an exam
 
-        Message that contains a :class:`.types.psychophys.Sample`
+        Message that contains a :class:`.types.psychophys.Sample` , if the model was updated,
+        a :class:`.types.psychophys.Posterior_Summary` , and the :class:`.types.pupil.Pupil_Calibration_State`
+        (stored in :attr:`.pupil_calibration` )
         """
         sample = msg.value['sample']
-        kernel = msg.value['kernel']
+        posterior = msg.value.get('posterior', None)
+        self.pupil_calibration = msg.value.get('calibration', self.pupil_calibration)
+        self.pupil_ts.addSample(sample)
+        self.audiogram.addSample(sample)
+        self.audiogram.updatePosterior(posterior)
 
+    def cb_metrics(self, msg:Message):
+        """
+        Store the metrics periodically sent by the patient in :attr:`.patient_metrics`
+        """
+        self.patient_metrics = msg.value['metrics']
+        self.logger.debug('Received %d metrics from patient', len(self.patient_metrics))
+
+    def cb_complete(self, msg:Message):
+        """
+        The patient has ended the exam because its :class:`.types.exam.Completion_Metric` was met.
+
+        Reset the start button without sending a ``STOP`` message back to the patient.
+
+        Message contains the ``status`` of the :class:`.psychophys.controller.Exam_Controller`
+        """
+        status = msg.value.get('status', {})
+        self.logger.info(f"Exam completed by patient after {status.get('n_trials')} trials, met: {status.get('reason')}")
+
+        self._started = False
+        # block signals so toggling the button doesn't try to stop the exam again
+        self.control_panel.blockSignals(True)
+        try:
+            self.control_panel.buttons['start'].setChecked(False)
+        finally:
+            self.control_panel.blockSignals(False)
 
 
     def closeEvent(self, event):
         self.quitting.emit()
-        self.frame_receiver.exit()
-        self.frame_receiver.quitting_evt.set()
-        self.msg_timer.stop()
-        self.frame_receiver.wait(5)
+        if self.ping_timer is not None:
+            self.ping_timer.stop()
+        if self.msg_notifier is not None:
+            self.msg_notifier.setEnabled(False)
+        if self.frame_receiver is not None:
+            self.frame_receiver.exit()
+            self.frame_receiver.quitting_evt.set()
+            self.frame_receiver.wait(5)
+        if self.node is not None:
+            self.logger.info(f'Message latency: {self.latency}')
+            for clock in self.clocks.values():
+                self.logger.info(f'Clock sync: {clock.summary()}')
+            self.node.release()
         event.accept()
 
 
     class Frame_Receiver(QThread):
         """
-        Thread to launch a networking node, receive threads, and emit new frames
+        Thread to launch a networking node, receive and decode frames, and signal when a new frame is ready.
+
+        Frames are JPEG-decoded in this thread rather than the GUI thread. Only the newest frame is kept:
+        each time the socket is readable all waiting frames are received and all but the last are dropped,
+        and a frame decoded while the previous one hasn't been drawn yet replaces it. The :attr:`.frame`
+        signal is only emitted when no frame is waiting to be drawn, so a slow GUI never falls behind
+        the camera. Get the frame with :meth:`.take` .
+
+        Args:
+            parent (:class:`.Perceptivo_Clinician`): Parent widget
+            socket_prefs (:class:`.types.networking.Socket`): Socket to receive frames from
+            poll_timeout (int): ms to wait for frames before checking if the thread should quit
         """
-        frame = Signal(Frame)
+        frame = Signal()
 
         def __init__(self,
                      parent,
-                     socket_prefs:Socket):
+                     socket_prefs:Socket,
+                     poll_timeout: int = 100):
             super(Perceptivo_Clinician.Frame_Receiver, self).__init__(parent)
             self.socket_prefs = socket_prefs
+            self.poll_timeout = poll_timeout
             self.logger = init_logger(self)
 
             self.quitting_evt = threading.Event()
+            self.n_received = 0
+            self.n_dropped = 0
+            self._latest = None # type: Optional[np.ndarray]
+            self._pending = False
+            self._lock = threading.Lock()
 
         def run(self):
 
@@ -299,15 +499,64 @@ class Perceptivo_Clinician(QtWidgets.QMainWindow):
             try:
                 while not self.quitting_evt.is_set():
                     try:
-                        frame = self.socket.socket.recv()
-                        self.frame.emit(frame)
+                        frame = self._recv_newest()
+                        if frame is None:
+                            continue
+                        self._put(cv2.imdecode(np.frombuffer(frame, dtype='uint8'), -1))
                     except Exception as e:
                         self.logger.debug(f'Exception getting frame, {e}')
 
             finally:
-                self.logger.debug('releasing socket')
+                self.logger.debug(f'releasing socket, received {self.n_received} frames and dropped {self.n_dropped}')
                 self.socket.release()
 
+        def _recv_newest(self) -> Optional[bytes]:
+            """
+            Wait for frames, then receive all of them that are waiting, returning only the newest
+
+            Returns:
+                bytes of the newest encoded frame, or ``None`` if none arrived within :attr:`.poll_timeout`
+            """
+            if not self.socket.socket.poll(self.poll_timeout):
+                return None
+            frame = None
+            while True:
+                try:
+                    newest = self.socket.socket.recv(zmq.NOBLOCK)
+                except zmq.Again:
+                    break
+                if frame is not None:
+                    self.n_dropped += 1
+                frame = newest
+                self.n_received += 1
+            return frame
+
+        def _put(self, frame: Optional[np.ndarray]):
+            """Replace the latest frame, and signal if the GUI isn't already going to draw one"""
+            if frame is None:
+                return
+            with self._lock:
+                if self._latest is not None:
+                    self.n_dropped += 1
+                self._latest = frame
+                emit = not self._pending
+                self._pending = True
+            if emit:
+                self.frame.emit()
+
+        def take(self) -> Optional[np.ndarray]:
+            """
+            Take the latest decoded frame, allowing the next one to be signaled
+
+            Returns:
+                :class:`numpy.ndarray` , or ``None`` if there is no new frame
+            """
+            with self._lock:
+                frame = self._latest
+                self._latest = None
+                self._pending = False
+            return frame
+
 
         @Slot()
         def quitting(self):
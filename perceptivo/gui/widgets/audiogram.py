@@ -9,15 +9,34 @@ from PySide6 import QtWidgets, QtCore
 import pyqtgraph as pg
 
 import numpy as np
+from perceptivo.data.buffer import Ring_Buffer
 from perceptivo.data.logging import init_logger
 
 from perceptivo.types.gui import GUI_Control
 
+if typing.TYPE_CHECKING:
+    from perceptivo.types.psychophys import Sample, Posterior_Summary
+
 
 class Audiogram(QtWidgets.QGroupBox):
+    """
+    Plot of the sounds that can be presented, the samples presented so far,
+    and the estimated probability of a response with its threshold contour.
+
+    Samples are appended to preallocated :class:`.data.buffer.Ring_Buffer` s as they arrive
+    (:meth:`.addSample` ), and the posterior is drawn from the :class:`.types.psychophys.Posterior_Summary`
+    computed by the patient's model (:meth:`.updatePosterior` ), so the GUI doesn't need to fit a model.
+
+    Args:
+        default_amplitudes (tuple): Amplitudes to draw the grid of possible sounds with
+        default_frequencies (tuple): Frequencies to draw the grid of possible sounds with
+        max_samples (int): Number of samples to keep and display
+    """
+
     def __init__(self,
                  default_amplitudes:Tuple[float]=tuple(),
-                 default_frequencies:Tuple[float]=tuple()):
+                 default_frequencies:Tuple[float]=tuple(),
+                 max_samples: int = 1000):
         super(Audiogram, self).__init__('Audiogram')
         self.logger = init_logger(self)
 
@@ -30,9 +49,36 @@ class Audiogram(QtWidgets.QGroupBox):
         self.plot.plotItem.getAxis('bottom').setLabel('Frequency (Hz)')
         self.plot.plotItem.getAxis('left').setLabel('Amplitude (0-1 AU)')
 
+        # posterior heatmap and threshold contour, below the points
+        self.posterior = pg.ImageItem()
+        self.posterior.setLookupTable(pg.colormap.get('viridis').getLookupTable(0, 1, 256))
+        self.posterior.setLevels((0, 1))
+        self.posterior.setOpacity(0.6)
+        self.posterior.setZValue(-10)
+        self.plot.addItem(self.posterior)
+        self.threshold = pg.IsocurveItem(level=0.5, pen=pg.mkPen('w', width=2))
+        self.threshold.setParentItem(self.posterior)
+        self.threshold_curve = pg.PlotDataItem(pen=pg.mkPen('w', width=2, style=QtCore.Qt.DashLine),
+                                               symbol='s', symbolSize=6, connect='finite')
+        self.plot.addItem(self.threshold_curve)
+        self._posterior_extent = None # type: Optional[Tuple[float, float, float, float]]
+        self.posterior_version = -1
+
         self.points = pg.ScatterPlotItem()
         self.plot.addItem(self.points)
 
+        # presented samples, by whether there was a response
+        self.sample_pos = {
+            True: Ring_Buffer(max_samples, shape=(2,)),
+            False: Ring_Buffer(max_samples, shape=(2,))
+        }
+        self.sample_points = {
+            True: pg.ScatterPlotItem(symbol='o', size=10, brush=pg.mkBrush(50, 200, 80)),
+            False: pg.ScatterPlotItem(symbol='x', size=10, brush=pg.mkBrush(200, 60, 60))
+        }
+        for item in self.sample_points.values():
+            self.plot.addItem(item)
+
         self.layout = QtWidgets.QGridLayout()
         self.layout.addWidget(self.plot)
         self.setLayout(self.layout)
@@ -63,6 +109,66 @@ class Audiogram(QtWidgets.QGroupBox):
             self.log = (self.log[0], value.value)
 
         self.plot.plotItem.setLogMode(*self.log)
+        self._placePosterior()
+
+    @QtCore.Slot(object)
+    def addSample(self, sample: 'Sample'):
+        """
+        Add a presented sample to the plot
+
+        Args:
+            sample (:class:`.types.psychophys.Sample`): Sample from a ``DATA`` message
+        """
+        if sample is None:
+            return
+        response = bool(sample.response)
+        self.sample_pos[response].append((sample.sound.frequency, sample.sound.amplitude))
+        self.sample_points[response].setData(pos=self.sample_pos[response].values())
+
+    @QtCore.Slot(object)
+    def updatePosterior(self, posterior: Optional['Posterior_Summary']):
+        """
+        Draw the probability of a response, its 0.5 contour, and the estimated thresholds.
+
+        Summaries older than the one already drawn are ignored.
+
+        Args:
+            posterior (:class:`.types.psychophys.Posterior_Summary`): Summary from a ``DATA`` message
+        """
+        if posterior is None or posterior.version <= self.posterior_version:
+            return
+        self.posterior_version = posterior.version
+
+        probability = posterior.probability_grid
+        self.posterior.setImage(probability, autoLevels=False)
+        self.threshold.setData(probability)
+        self._posterior_extent = (posterior.frequencies[0], posterior.frequencies[-1],
+                                  posterior.amplitudes[0], posterior.amplitudes[-1])
+        self._placePosterior()
+
+        self.threshold_curve.setData(posterior.threshold_frequencies, posterior.thresholds)
+
+    def _placePosterior(self):
+        """Scale the posterior image to the plot's coordinates, which are log10 when in log mode"""
+        if self._posterior_extent is None:
+            return
+        extent = list(self._posterior_extent)
+        if self.log[0]:
+            extent[0:2] = np.log10(extent[0:2])
+        if self.log[1]:
+            extent[2:4] = np.log10(extent[2:4])
+        self.posterior.setRect(QtCore.QRectF(extent[0], extent[2], extent[1] - extent[0], extent[3] - extent[2]))
+
+    def clear(self):
+        """Clear samples and the posterior, eg. when starting a new exam"""
+        for response, buffer in self.sample_pos.items():
+            buffer.clear()
+            self.sample_points[response].setData(pos=np.empty((0, 2)))
+        self.posterior.clear()
+        self.threshold.setData(None)
+        self.threshold_curve.setData([], [])
+        self._posterior_extent = None
+        self.posterior_version = -1
 
     def _drawGrid(self):
         if not all((self.frequencies, self.amplitudes)):
@@ -1,9 +1,164 @@
 """
 Timeseries of pupil diameter, audio/stimulus presentation info
 """
+import typing
+from typing import Optional
+
+import numpy as np
+import pyqtgraph as pg
+from PySide6 import QtWidgets, QtCore
+
+from perceptivo.clock import to_seconds
+from perceptivo.data.buffer import Ring_Buffer
+from perceptivo.data.logging import init_logger
+
+if typing.TYPE_CHECKING:
+    from perceptivo.types.psychophys import Sample
 
-from PySide6 import QtWidgets
 
 class Pupil(QtWidgets.QGroupBox):
-    def __init__(self):
+    """
+    Plots of pupil diameter during an exam:
+
+    * a rolling stream of all measured diameters over the last ``window`` seconds
+    * the dilation traces of the last ``n_traces`` trials, aligned to sound onset
+      and colored by whether they were a response or not
+
+    Both are backed by preallocated arrays -- a :class:`.data.buffer.Ring_Buffer` for the stream
+    and a fixed set of trace rows and curves that are reused oldest-first -- so memory use
+    doesn't grow over the course of long exams. The stream is downsampled and clipped to the
+    visible range when drawn.
+
+    Args:
+        window (float): Seconds of the live stream to show
+        stream_size (int): Number of diameter measurements to keep for the live stream
+        n_traces (int): Number of trial traces to show
+        trace_size (int): Maximum number of measurements in each trial trace
+    """
+
+    RESPONSE_COLORS = {True: (50, 200, 80), False: (200, 60, 60)}
+
+    def __init__(self,
+                 window: float = 120,
+                 stream_size: int = 20000,
+                 n_traces: int = 10,
+                 trace_size: int = 300):
         super(Pupil, self).__init__('Pupil Diameter')
+        self.logger = init_logger(self)
+
+        self.window = window
+        self.n_traces = n_traces
+        self.trace_size = trace_size
+
+        self._t0 = None # type: Optional[int]
+
+        # live stream buffers, and arrays to copy them into in order to draw
+        self.stream_times = Ring_Buffer(stream_size)
+        self.stream_diameters = Ring_Buffer(stream_size)
+        self._stream_x = np.empty(stream_size, dtype='float64')
+        self._stream_y = np.empty(stream_size, dtype='float64')
+
+        # trial traces, padded with nan
+        self.trace_times = np.full((n_traces, trace_size), np.nan, dtype='float64')
+        self.trace_diameters = np.full((n_traces, trace_size), np.nan, dtype='float64')
+        self.trace_responses = np.zeros(n_traces, dtype=bool)
+        self.trace_lengths = np.zeros(n_traces, dtype=int)
+        self._trace_index = 0
+        self.n_trials = 0
+
+        # plots!
+        self.stream_plot = pg.PlotWidget(self)
+        self.stream_plot.plotItem.getAxis('bottom').setLabel('Time (s)')
+        self.stream_plot.plotItem.getAxis('left').setLabel('Diameter (px)')
+        self.stream_curve = self.stream_plot.plot(pen=pg.mkPen(200, 200, 200))
+        self.stream_curve.setDownsampling(auto=True, method='peak')
+        self.stream_curve.setClipToView(True)
+
+        self.trial_plot = pg.PlotWidget(self)
+        self.trial_plot.plotItem.getAxis('bottom').setLabel('Time from onset (s)')
+        self.trial_plot.plotItem.getAxis('left').setLabel('Diameter (px)')
+        self.trial_plot.addItem(pg.InfiniteLine(pos=0, angle=90, pen=pg.mkPen(150, 150, 150, style=QtCore.Qt.DashLine)))
+        self.trace_curves = [self.trial_plot.plot() for _ in range(n_traces)] # type: typing.List[pg.PlotDataItem]
+
+        self.layout = QtWidgets.QGridLayout()
+        self.layout.addWidget(self.stream_plot, 0, 0)
+        self.layout.addWidget(self.trial_plot, 0, 1)
+        self.layout.setColumnStretch(0, 2)
+        self.layout.setColumnStretch(1, 1)
+        self.setLayout(self.layout)
+
+    @QtCore.Slot(object)
+    def addSample(self, sample: 'Sample'):
+        """
+        Add the dilation from a sample to the live stream and the trial traces, and redraw
+
+        Args:
+            sample (:class:`.types.psychophys.Sample`): Sample from a ``DATA`` message. Samples without
+                a :class:`.types.pupil.Dilation` (eg. manual responses) are ignored.
+        """
+        if sample is None or sample.dilation is None or len(sample.dilation.timestamps) == 0:
+            return
+
+        dilation = sample.dilation
+        diameters = np.asarray(dilation.diameters, dtype='float64')
+        if self._t0 is None:
+            self._t0 = dilation.timestamps[0]
+
+        self.stream_times.extend(to_seconds(dilation.timestamps, self._t0))
+        self.stream_diameters.extend(diameters)
+
+        onset = sample.sound.timestamp if sample.sound.timestamp is not None else dilation.timestamps[0]
+        times = to_seconds(dilation.timestamps, onset)
+        self._add_trace(times, diameters, bool(sample.response))
+
+        self._drawStream()
+        self._drawTraces()
+
+    def _add_trace(self, times: np.ndarray, diameters: np.ndarray, response: bool):
+        """Write a trial's trace over the oldest row"""
+        n = min(len(times), self.trace_size)
+        row = self._trace_index
+        self.trace_times[row] = np.nan
+        self.trace_diameters[row] = np.nan
+        self.trace_times[row, :n] = times[:n]
+        self.trace_diameters[row, :n] = diameters[:n]
+        self.trace_lengths[row] = n
+        self.trace_responses[row] = response
+
+        self._trace_index = (self._trace_index + 1) % self.n_traces
+        self.n_trials += 1
+
+    def _drawStream(self):
+        x = self.stream_times.values(out=self._stream_x)
+        y = self.stream_diameters.values(out=self._stream_y)
+        if len(x) == 0:
+            self.stream_curve.setData([], [])
+            return
+        self.stream_curve.setData(x, y, skipFiniteCheck=True)
+        self.stream_plot.setXRange(max(x[-1] - self.window, x[0]), x[-1], padding=0)
+
+    def _drawTraces(self):
+        n_drawn = min(self.n_trials, self.n_traces)
+        for age in range(n_drawn):
+            # newest first, oldest fading out
+            row = (self._trace_index - 1 - age) % self.n_traces
+            n = self.trace_lengths[row]
+            alpha = int(255 * (1 - age / self.n_traces))
+            pen = pg.mkPen(*self.RESPONSE_COLORS[bool(self.trace_responses[row])], alpha,
+                           width=2 if age == 0 else 1)
+            self.trace_curves[row].setData(self.trace_times[row, :n], self.trace_diameters[row, :n],
+                                           pen=pen, skipFiniteCheck=True)
+
+    def clear(self):
+        """Clear the stream and trial traces, eg. when starting a new exam"""
+        self._t0 = None
+        self.stream_times.clear()
+        self.stream_diameters.clear()
+        self.trace_times[:] = np.nan
+        self.trace_diameters[:] = np.nan
+        self.trace_lengths[:] = 0
+        self._trace_index = 0
+        self.n_trials = 0
+        self.stream_curve.setData([], [])
+        for curve in self.trace_curves:
+            curve.setData([], [])
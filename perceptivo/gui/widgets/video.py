@@ -1,17 +1,56 @@
 """
 https://stackoverflow.com/a/35316662/13113166
 """
+import typing
 
 import PySide6
+import numpy as np
 import pyqtgraph as pg
 from pyqtgraph.widgets.RawImageWidget import RawImageGLWidget
 
+from perceptivo.types.gui import VIDEO_WIDGETS
 
 
 class Video(pg.ImageView):
-# class Video(RawImageGLWidget):
+    """
+    Video display with pyqtgraph's full :class:`pyqtgraph.ImageView` .
+
+    Levels and the histogram are only computed for the first frame, rather than
+    recomputed for each frame.
+    """
     def __init__(self, *args, **kwargs):
         super(Video, self).__init__(*args, **kwargs)
+        self._first_frame = True
+
+    def setImage(self, img: np.ndarray, **kwargs):
+        if not self._first_frame:
+            kwargs.setdefault('autoRange', False)
+            kwargs.setdefault('autoLevels', False)
+            kwargs.setdefault('autoHistogramRange', False)
+        super(Video, self).setImage(img, **kwargs)
+        self._first_frame = False
+
+
+class GLVideo(RawImageGLWidget):
+    """
+    Lightweight video display that draws frames directly as OpenGL textures,
+    without :class:`.Video` 's histogram, levels, or view box.
+    """
+
+
+def get_video_widget(widget: VIDEO_WIDGETS = 'ImageView') -> typing.Type[typing.Union[Video, GLVideo]]:
+    """
+    Get the video widget class named in :attr:`.types.gui.GUI_Params.video_widget`
 
+    Args:
+        widget (str): One of :data:`.types.gui.VIDEO_WIDGETS`
 
-# class GLVideo(RawImageGLWidget):
+    Returns:
+        :class:`.Video` or :class:`.GLVideo`
+    """
+    if widget == 'ImageView':
+        return Video
+    elif widget == 'RawImageGL':
+        return GLVideo
+    else:
+        raise ValueError(f'Dont know what video widget you mean by {widget}, needs to be one of {VIDEO_WIDGETS}')
@@ -0,0 +1,215 @@
+"""
+Round-trip time and clock offset estimation between nodes, NTP-style.
+
+A node sends a ping (a message keyed :data:`.PING_KEY` ) with the time it was sent (``t0`` ), and the peer
+replies with a pong (keyed :data:`.PONG_KEY` ) carrying ``t0`` , the time it received the ping (``t1`` ), and the time it sent the pong (``t2`` ).
+With the time the pong is received (``t3`` ), the round trip time and the offset of the peer's clock
+from ours are::
+
+    rtt = (t3 - t0) - (t2 - t1)
+    offset = ((t1 - t0) + (t2 - t3)) / 2
+
+All times are monotonic ns from :func:`perceptivo.clock.now_ns` , so the offset converts a peer's
+:class:`.types.video.Frame` , :class:`.types.sound.Sound` , and :class:`.types.pupil.Dilation` timestamps
+into our own time base (see :meth:`.Clock_Sync.to_local` ).
+
+The offset is only exact when the network delay is the same in each direction, and queueing
+delays are rarely symmetric, so like NTP's clock filter :class:`.Clock_Sync` uses the offset from the
+sample with the smallest round trip time among the most recent ``window`` samples.
+
+:class:`.node.Async_Node` s answer pings automatically, and ping their peers with :meth:`.node.Async_Node.ping` .
+"""
+import typing
+from collections import deque
+
+from perceptivo.clock import now_ns
+from perceptivo.root import Perceptivo_Object
+
+if typing.TYPE_CHECKING:
+    from perceptivo.networking.messages import Message
+
+PING_KEY = '__PING__'
+"""Message key of clock pings, reserved so it doesn't collide with application messages"""
+PONG_KEY = '__PONG__'
+"""Message key of replies to clock pings"""
+
+
+class Clock_Sample(typing.NamedTuple):
+    """
+    One ping/pong exchange, times in ns
+    """
+    t0: int
+    """Ping sent, local clock"""
+    t1: int
+    """Ping received, peer's clock"""
+    t2: int
+    """Pong sent, peer's clock"""
+    t3: int
+    """Pong received, local clock"""
+
+    @property
+    def rtt(self) -> int:
+        """Round trip time, excluding the time the peer took to reply"""
+        return (self.t3 - self.t0) - (self.t2 - self.t1)
+
+    @property
+    def offset(self) -> float:
+        """Offset of the peer's clock from the local clock"""
+        return ((self.t1 - self.t0) + (self.t2 - self.t3)) / 2
+
+
+class Clock_Sync(Perceptivo_Object):
+    """
+    Filtered estimate of the round trip time to and clock offset of one peer
+
+    Args:
+        peer (str): ID of the peer, for logging
+        window (int): Number of recent samples to choose the offset from
+        history (int): Number of recent round trip times to compute :meth:`.percentiles` from
+    """
+
+    def __init__(self, peer: typing.Optional[str] = None, window: int = 8, history: int = 1000):
+        self.peer = peer
+        self.window = deque(maxlen=window) # type: typing.Deque[Clock_Sample]
+        self.rtts = deque(maxlen=history) # type: typing.Deque[int]
+        self.offset = None # type: typing.Optional[float]
+        """Current offset estimate (ns) of the peer's clock from the local clock, ``None`` until the first sample"""
+        self.rtt = None # type: typing.Optional[int]
+        """Round trip time (ns) of the sample the offset was taken from"""
+        self.n_samples = 0
+
+        self._rtt_hist = self.metrics.histogram('rtt_ms')
+        self._offset_gauge = self.metrics.gauge('offset_ms')
+
+    def add(self, sample: Clock_Sample) -> Clock_Sample:
+        """
+        Add a sample and update the estimate
+
+        Args:
+            sample (:class:`.Clock_Sample`): Times from one ping/pong exchange
+
+        Returns:
+            :class:`.Clock_Sample` that the offset estimate is now taken from
+        """
+        if sample.rtt < 0:
+            self.logger.warning(f'Discarding clock sample with negative round trip time: {sample}')
+            return min(self.window, key=lambda s: s.rtt) if len(self.window) > 0 else sample
+
+        self.window.append(sample)
+        self.rtts.append(sample.rtt)
+        self.n_samples += 1
+        self._rtt_hist.observe(sample.rtt / 1e6)
+
+        best = min(self.window, key=lambda s: s.rtt)
+        self.offset = best.offset
+        self.rtt = best.rtt
+        self._offset_gauge.set(self.offset / 1e6)
+        return best
+
+    def add_pong(self, msg: 'Message', received: typing.Optional[int] = None) -> Clock_Sample:
+        """
+        Add a sample from a pong message, see :func:`.pong`
+
+        Args:
+            msg (:class:`.Message`): The pong
+            received (int): When the pong was received, defaults to the message's ``received`` time
+                (set by the node that received it), or else now.
+        """
+        if received is None:
+            received = msg.received if msg.received is not None else now_ns()
+        return self.add(Clock_Sample(
+            t0=msg.value['t0'], t1=msg.value['t1'], t2=msg.value['t2'], t3=received
+        ))
+
+    def to_local(self, ns: typing.Any) -> typing.Any:
+        """
+        Convert a time (or array of times) from the peer's clock to the local clock
+
+        Args:
+            ns (int, :class:`numpy.ndarray`): peer's monotonic time in ns
+
+        Returns:
+            local monotonic time in ns, same type as ``ns``
+        """
+        if self.offset is None:
+            raise ValueError(f'No clock samples from {self.peer} yet, cannot convert times')
+        return ns - round(self.offset)
+
+    def latency_ms(self, sent: int, received: int) -> typing.Optional[float]:
+        """
+        Time (ms) a message took to arrive, eg. from a :attr:`.Message.sent` time to its :attr:`.Message.received` time
+
+        Args:
+            sent (int): when the message was sent, peer's monotonic time in ns
+            received (int): when it was received, local monotonic time in ns
+
+        Returns:
+            float, or ``None`` if there are no clock samples from the peer yet
+        """
+        if self.offset is None:
+            return None
+        return (received - self.to_local(sent)) / 1e6
+
+    def to_remote(self, ns: typing.Any) -> typing.Any:
+        """
+        Convert a time (or array of times) from the local clock to the peer's clock, see :meth:`.to_local`
+        """
+        if self.offset is None:
+            raise ValueError(f'No clock samples from {self.peer} yet, cannot convert times')
+        return ns + round(self.offset)
+
+    def percentiles(self, qs: typing.Tuple[float, ...] = (50, 90, 99)) -> typing.Dict[str, float]:
+        """
+        Percentiles of recent round trip times, in ms
+
+        Args:
+            qs (tuple): percentiles to compute, 0-100
+
+        Returns:
+            dict like ``{'n': 100, 'min': 0.2, 'p50': 0.4, 'p90': 0.8, 'p99': 1.2}`` , values are ``nan``
+            if there are no samples
+        """
+        rtts = sorted(self.rtts)
+        n = len(rtts)
+        summary = {'n': n, 'min': rtts[0] / 1e6 if n > 0 else float('nan')}
+        for q in qs:
+            if n == 0:
+                summary[f'p{q:g}'] = float('nan')
+            else:
+                summary[f'p{q:g}'] = rtts[min(n - 1, int(q / 100 * n))] / 1e6
+        return summary
+
+    def summary(self) -> dict:
+        """
+        Current estimate and round trip percentiles, eg. for logging
+        """
+        return {
+            'peer': self.peer,
+            'offset_ms': self.offset / 1e6 if self.offset is not None else None,
+            'rtt_ms': self.percentiles()
+        }
+
+
+def ping() -> dict:
+    """
+    Values for a :data:`.PING_KEY` message, sent now
+    """
+    return {'t0': now_ns()}
+
+
+def pong(msg: 'Message', received: typing.Optional[int] = None) -> dict:
+    """
+    Values for the :data:`.PONG_KEY` reply to a ping, sent now
+
+    Args:
+        msg (:class:`.Message`): The ping
+        received (int): When the ping was received, defaults to the message's ``received`` time
+    """
+    if received is None:
+        received = msg.received if msg.received is not None else now_ns()
+    return {
+        't0': msg.value['t0'],
+        't1': received,
+        't2': now_ns(),
+        'response_to': msg.message_number
+    }
@@ -5,6 +5,7 @@ import typing
 import msgpack
 from datetime import datetime
 from itertools import count
+from perceptivo.clock import now_ns
 from perceptivo.root import Perceptivo_Object
 from perceptivo.util import serialize, deserialize
 
@@ -13,6 +14,10 @@ class Message(Perceptivo_Object):
     """
     Message container implementing msgpack-based numpy array de/serialization.
 
+    Messages are serialized once, and the bytes reused if they are serialized again (eg. when
+    timing serialization separately from sending, see :meth:`.runtimes.patient.Patient.run_exam` ),
+    so values shouldn't be changed after a message is serialized.
+
     Subclass this to make specific message types!
     """
     counter = count()
@@ -21,6 +26,7 @@ class Message(Perceptivo_Object):
                  message_number:typing.Optional[int]=None,
                  timestamp:typing.Optional[datetime]=None,
                  key:str='',
+                 sent:typing.Optional[int]=None,
                  **kwargs):
         """
         Args:
@@ -28,6 +34,13 @@ class Message(Perceptivo_Object):
 
         Attrs:
             value (dict): (deserialized) dictionary of values passed from **kwargs
+            sent (int): Monotonic time (ns, see :mod:`perceptivo.clock` ) on the sender's clock when the
+                message was made. Unlike :attr:`.timestamp` , can be compared with times on another machine
+                once they're converted with a :class:`.clock_sync.Clock_Sync` .
+            sender (str): Identity of the socket that sent the message, if known. Set by
+                :class:`.node.Async_Node` when receiving with a ``ROUTER`` socket, not serialized.
+            received (int): Monotonic time (ns, see :mod:`perceptivo.clock` ) the message was received, if known.
+                Set by :class:`.node.Async_Node` , not serialized.
 
         """
         super(Message, self).__init__()
@@ -43,15 +56,29 @@ class Message(Perceptivo_Object):
         else:
             self.timestamp = timestamp
 
+        if sent is None:
+            self.sent = now_ns()
+        else:
+            self.sent = sent
+
         self.key = key
+        self.sender = None # type: typing.Optional[str]
+        self.received = None # type: typing.Optional[int]
+        self._serialized = None # type: typing.Optional[bytes]
 
     def serialize(self, msg:typing.Optional[dict]=None) -> bytes:
         if msg is None:
+            if self._serialized is not None:
+                return self._serialized
             msg = self.value
         msg['message_number'] = self.message_number
         msg['timestamp'] = self.timestamp
+        msg['sent'] = self.sent
         msg['key'] = self.key
-        return msgpack.packb(msg, default=serialize)
+        serialized = msgpack.packb(msg, default=serialize)
+        if msg is self.value:
+            self._serialized = serialized
+        return serialized
 
     @classmethod
     def _deserialize(cls, msg:bytes) -> dict:
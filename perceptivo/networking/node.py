@@ -1,19 +1,362 @@
 """
 Messenger objects for communication intra, interprocess and intercomputer
+
+* :class:`.Async_Node` - asyncio-native node using :mod:`zmq.asyncio` , with async send and receive,
+  send high-water marks, and request/reply with timeouts. Many nodes can share one event loop.
+* :class:`.Node` - synchronous wrapper kept for compatibility with its :class:`.Node.Poll_Mode` s. ``IOLOOP``
+  and ``DEQUE`` nodes are run as :class:`.Async_Node` s on the shared loop from :func:`.get_loop` ,
+  rather than with a thread per socket.
+
+Nodes answer clock pings (messages keyed :data:`.clock_sync.PING_KEY` ) with a pong, and can :meth:`~.Async_Node.ping` their peers to
+estimate round trip times and clock offsets, see :mod:`.networking.clock_sync` .
 """
 
+import asyncio
+import inspect
+import typing
 from typing import Dict, Callable, Optional
 from enum import Enum, auto
 from collections import deque
 import threading
 
 import zmq
-from zmq.eventloop.zmqstream import ZMQStream
-from tornado.ioloop import IOLoop
+import zmq.asyncio
 
+from perceptivo.clock import now_ns
 from perceptivo.root import Perceptivo_Object
 from perceptivo.types.networking import Socket
 from perceptivo.networking.messages import Message
+from perceptivo.networking.clock_sync import Clock_Sync, ping, pong, PING_KEY, PONG_KEY
+
+_LOOP = None # type: Optional[asyncio.AbstractEventLoop]
+_LOOP_LOCK = threading.Lock()
+
+
+def get_loop() -> asyncio.AbstractEventLoop:
+    """
+    Get the shared event loop that :class:`.Node` s run their :class:`.Async_Node` on,
+    starting it in a daemon thread the first time it is requested.
+
+    Returns:
+        :class:`asyncio.AbstractEventLoop`
+    """
+    global _LOOP
+    with _LOOP_LOCK:
+        if _LOOP is None or _LOOP.is_closed():
+            _LOOP = asyncio.new_event_loop()
+            threading.Thread(target=_LOOP.run_forever, name='perceptivo-node-loop', daemon=True).start()
+        return _LOOP
+
+
+def _address(socket: Socket) -> str:
+    if socket.protocol == 'tcp':
+        ip = socket.ip
+        if socket.mode == 'bind' and ip == '':
+            ip = '*'
+        return f"tcp://{ip}:{socket.port}"
+    elif socket.protocol == 'ipc':
+        return f"ipc:///tmp/{socket.port}"
+    else:
+        raise NotImplementedError('Only tcp and ipc modes are implemented!')
+
+
+class Async_Node(Perceptivo_Object):
+    """
+    asyncio-native wrapper around a :mod:`zmq.asyncio` socket
+
+    Once :meth:`.start` ed, one task receives every message. Replies to :meth:`.request` s are
+    matched with the request by its ``message_number`` (stored in the reply's ``response_to`` value),
+    and everything else is given to ``callback`` if there is one, or else queued for :meth:`.recv` .
+    Clock pings are answered before they reach the callback, and the results of :meth:`.ping` ing peers
+    are kept in :attr:`.clocks` .
+
+    Sends wait while the socket is at its send high-water mark, so a slow peer applies backpressure
+    rather than messages piling up in memory. ``ROUTER`` sockets are made mandatory, so sending to a
+    peer that isn't connected raises an error rather than the message being silently dropped.
+
+    Examples:
+
+        async def main():
+            server = Async_Node(Socket('server', 'ROUTER', 'tcp', 'bind', 5600), callback=echo)
+            client = Async_Node(Socket('client', 'DEALER', 'tcp', 'connect', 5600, 'localhost', to='server'))
+            await server.start()
+            await client.start()
+            reply = await client.request(Message(key='PING'), timeout=1)
+            await client.close()
+            await server.close()
+
+    Args:
+        socket (:class:`.types.networking.Socket`): Socket descriptor
+        callback (callable): Called with each received :class:`.Message` that isn't a reply to a request.
+            May be a coroutine function. If ``None`` , messages are queued for :meth:`.recv`
+        to (str): Default recipient for ``ROUTER`` / ``DEALER`` sockets, overrides ``socket.to``
+        sndhwm (int): Send high-water mark, the number of messages queued per peer before sends wait
+        rcvhwm (int): Receive high-water mark
+        queue_size (int): Maximum messages queued for :meth:`.recv` before the receiving task waits, 0 for unlimited
+    """
+
+    def __init__(self,
+                 socket: Socket,
+                 callback: Optional[Callable[[Message], typing.Any]] = None,
+                 to: Optional[str] = None,
+                 sndhwm: int = 1000,
+                 rcvhwm: int = 1000,
+                 queue_size: int = 0,
+                 **kwargs):
+        super(Async_Node, self).__init__(**kwargs)
+        self.id = socket.id
+        self.socket_type = socket.socket_type
+        self.mode = socket.mode
+        self.address = _address(socket)
+        self.callback = callback
+        self.to = socket.to if to is None else to
+        self.sndhwm = sndhwm
+        self.rcvhwm = rcvhwm
+        self.queue_size = queue_size
+
+        self.socket = None # type: Optional[zmq.asyncio.Socket]
+        self._queue = None # type: Optional[asyncio.Queue]
+        self._recv_task = None # type: Optional[asyncio.Task]
+        self._pending = {} # type: Dict[int, asyncio.Future]
+        self._latency = self.metrics.histogram('message_latency_ms')
+        """Latency of messages from peers that have been :meth:`.ping` ed, see :meth:`.Clock_Sync.latency_ms`"""
+        self._ping_task = None # type: Optional[asyncio.Task]
+        self.clocks = {} # type: Dict[str, Clock_Sync]
+        """Round trip time and clock offset estimates for each peer that has been :meth:`.ping` ed"""
+
+    @property
+    def running(self) -> bool:
+        return self._recv_task is not None and not self._recv_task.done()
+
+    async def start(self):
+        """
+        Open the socket and start receiving messages. Must be awaited from the loop the node will run in.
+        """
+        if self.running:
+            return
+
+        # share the global context with synchronous nodes
+        ctx = zmq.asyncio.Context.shadow(zmq.Context.instance().underlying)
+        socket = ctx.socket(getattr(zmq, self.socket_type))
+        socket.setsockopt_string(zmq.IDENTITY, self.id)
+        socket.setsockopt(zmq.SNDHWM, self.sndhwm)
+        socket.setsockopt(zmq.RCVHWM, self.rcvhwm)
+        if self.socket_type == 'ROUTER':
+            socket.setsockopt(zmq.ROUTER_MANDATORY, 1)
+
+        if self.mode == 'bind':
+            socket.bind(self.address)
+        elif self.mode == 'connect':
+            socket.connect(self.address)
+        else:
+            socket.close(linger=0)
+            raise ValueError(f'mode needs to be one of types.ZMQ_MODE, got {self.mode}')
+
+        self.socket = socket
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        if self.socket_type not in ('PUB', 'PUSH'):
+            self._recv_task = asyncio.ensure_future(self._recv_loop())
+        self.logger.info(f'Socket initialized - id: {self.id}')
+
+    def _frames(self, msg: Message, to: Optional[str]) -> typing.List[bytes]:
+        if self.socket_type in ('ROUTER', 'DEALER'):
+            if to is None and self.to is None:
+                raise ValueError('With Router/Dealer sockets, need to explicitly pass "to" in send or init')
+            elif to is None:
+                to = self.to
+            return [to.encode('utf-8'), msg.serialize()]
+        return [msg.serialize()]
+
+    async def send(self,
+                   msg: Optional[Message] = None,
+                   to: Optional[str] = None,
+                   timeout: Optional[float] = None,
+                   **kwargs):
+        """
+        Send a message, waiting while the socket is at its send high-water mark
+
+        Args:
+            msg (:class:`.Message`): Message to send, or else it is created from ``kwargs``
+            to (str): Recipient, for ``ROUTER`` / ``DEALER`` sockets
+            timeout (float): Seconds to wait to send before raising :class:`asyncio.TimeoutError` ,
+                ``None`` to wait forever
+        """
+        if msg is None:
+            if len(kwargs) == 0:
+                raise ValueError(f'Need a message or kwargs that can be used to create a message')
+            msg = Message(**kwargs)
+
+        await asyncio.wait_for(self.socket.send_multipart(self._frames(msg, to)), timeout)
+        self.logger.debug(f'Sent message number {msg.message_number}')
+
+    async def recv(self, timeout: Optional[float] = None) -> Message:
+        """
+        Receive the next message that wasn't a reply or given to the ``callback``
+
+        Args:
+            timeout (float): Seconds to wait before raising :class:`asyncio.TimeoutError` , ``None`` to wait forever
+
+        Returns:
+            :class:`.Message`
+        """
+        return await asyncio.wait_for(self._queue.get(), timeout)
+
+    async def request(self,
+                      msg: Optional[Message] = None,
+                      to: Optional[str] = None,
+                      timeout: Optional[float] = 5,
+                      **kwargs) -> Message:
+        """
+        Send a message and wait for the reply, see :meth:`.reply`
+
+        Args:
+            msg (:class:`.Message`): Message to send, or else it is created from ``kwargs``
+            to (str): Recipient, for ``ROUTER`` / ``DEALER`` sockets
+            timeout (float): Seconds to wait for the reply before raising :class:`asyncio.TimeoutError`
+
+        Returns:
+            :class:`.Message` the reply
+        """
+        if msg is None:
+            msg = Message(**kwargs)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[msg.message_number] = future
+        try:
+            await self.send(msg, to=to, timeout=timeout)
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            self._pending.pop(msg.message_number, None)
+
+    async def reply(self, request: Message, msg: Optional[Message] = None, **kwargs):
+        """
+        Reply to a message received from :meth:`.request`
+
+        Args:
+            request (:class:`.Message`): The request being replied to
+            msg (:class:`.Message`): Reply, or else it is created from ``kwargs``
+        """
+        if msg is None:
+            msg = Message(key=request.key, **kwargs)
+        msg.value['response_to'] = request.message_number
+        await self.send(msg, to=request.sender)
+
+    def clock(self, peer: Optional[str] = None) -> Clock_Sync:
+        """
+        The :class:`.Clock_Sync` for a peer, made if it doesn't exist yet
+
+        Args:
+            peer (str): ID of the peer, defaults to :attr:`.to`
+        """
+        peer = self.to if peer is None else peer
+        if peer not in self.clocks:
+            self.clocks[peer] = Clock_Sync(peer)
+        return self.clocks[peer]
+
+    async def ping(self, to: Optional[str] = None, timeout: Optional[float] = 1) -> Clock_Sync:
+        """
+        Ping a peer, adding the round trip time and clock offset to its :meth:`.clock`
+
+        Args:
+            to (str): Peer to ping, for ``ROUTER`` / ``DEALER`` sockets
+            timeout (float): Seconds to wait for the pong before raising :class:`asyncio.TimeoutError`
+
+        Returns:
+            :class:`.Clock_Sync` for the peer
+        """
+        reply = await self.request(key=PING_KEY, to=to, timeout=timeout, **ping())
+        clock = self.clock(to)
+        clock.add_pong(reply)
+        return clock
+
+    def start_pinging(self, interval: float = 1, to: Optional[str] = None, timeout: Optional[float] = 1):
+        """
+        Continuously :meth:`.ping` a peer every ``interval`` seconds until :meth:`.stop_pinging` or :meth:`.close` ,
+        logging rather than raising timeouts
+        """
+        if self._ping_task is not None and not self._ping_task.done():
+            return
+
+        async def _ping_loop():
+            # wait_for can swallow a cancellation that arrives just as the pong does (bpo-42130),
+            # so stop_pinging also clears the task for the loop to notice
+            while self._ping_task is not None:
+                try:
+                    await self.ping(to=to, timeout=timeout)
+                except asyncio.TimeoutError:
+                    self.logger.debug(f'Ping to {to if to is not None else self.to} timed out')
+                await asyncio.sleep(interval)
+
+        self._ping_task = asyncio.ensure_future(_ping_loop())
+
+    async def stop_pinging(self):
+        task, self._ping_task = self._ping_task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    async def _recv_loop(self):
+        while True:
+            frames = await self.socket.recv_multipart()
+            received = now_ns()
+            try:
+                msg = Message.from_serialized(frames[-1])
+            except Exception as e:
+                self.logger.exception(f'Could not deserialize message: {e}')
+                continue
+            msg.received = received
+            if self.socket_type == 'ROUTER' and len(frames) > 1:
+                msg.sender = frames[0].decode('utf-8')
+            # wall clocks on different machines can't be compared, so latency is only
+            # measured from peers whose clock offset is known from pinging them
+            clock = self.clocks.get(msg.sender if msg.sender is not None else self.to, None)
+            if clock is not None and clock.offset is not None:
+                self._latency.observe(clock.latency_ms(msg.sent, received))
+
+            if msg.key == PING_KEY:
+                try:
+                    await self.send(key=PONG_KEY, to=msg.sender, **pong(msg))
+                except Exception as e:
+                    self.logger.exception(f'Could not reply to ping: {e}')
+                continue
+
+            future = self._pending.get(msg.value.get('response_to', None), None)
+            if future is not None:
+                if not future.done():
+                    future.set_result(msg)
+            elif self.callback is not None:
+                try:
+                    result = self.callback(msg)
+                    if inspect.isawaitable(result):
+                        await result
+                except Exception as e:
+                    self.logger.exception(f'Exception in callback for message {msg.key}: {e}')
+            else:
+                await self._queue.put(msg)
+
+    async def close(self, linger: int = 0):
+        """
+        Stop receiving and pinging, cancel pending requests, and close the socket
+
+        Args:
+            linger (int): Milliseconds to keep trying to send queued messages after closing
+        """
+        await self.stop_pinging()
+        if self._recv_task is not None:
+            self._recv_task.cancel()
+            try:
+                await self._recv_task
+            except asyncio.CancelledError:
+                pass
+            self._recv_task = None
+        for future in self._pending.values():
+            future.cancel()
+        self._pending.clear()
+        if self.socket is not None:
+            self.socket.close(linger=linger)
+            self.socket = None
 
 
 class Node(Perceptivo_Object):
@@ -37,10 +380,11 @@ class Node(Perceptivo_Object):
             socket (:class:`.types.Socket`): Socket descriptor (see :class:`~.types.Socket`)
             poll_mode (:class:`.Poll_Mode`): Strategy for polling messages.
 
-                * ``IOLOOP`` - uses tornado's IOloop and ZMQStreams to poll for messages.
-                    Needs to be given ``callback`` as well, which will be called with the received message as the only argument
-                * ``DEQUE`` - a thread is spawned to poll the socket and add any message to ``deque``
-                * ``NONE`` - interact with the socket manually
+                * ``IOLOOP`` - messages are received by an :class:`.Async_Node` on the shared loop from :func:`.get_loop` .
+                    Needs to be given ``callback`` as well, which will be called with the received
+                    :class:`.Message` as the only argument
+                * ``DEQUE`` - messages are received by an :class:`.Async_Node` on the shared loop and added to ``deque``
+                * ``NONE`` - interact with the (synchronous) socket manually
 
             callback (typing.Callable): A callable object that will be called with a received
                 message as its only argument if ``poll_mode == IOLOOP``
@@ -62,37 +406,39 @@ class Node(Perceptivo_Object):
         super(Node, self).__init__()
 
         self._stopping = threading.Event()
+        self._async = None # type: Optional[Async_Node]
+        self._loop = None # type: Optional[asyncio.AbstractEventLoop]
 
-        self.socket: zmq.Socket = self._init_socket()
+        self.socket: typing.Union[zmq.Socket, zmq.asyncio.Socket] = self._init_socket(socket)
 
         self.logger.info(f'Socket initialized - id: {self.id}')
 
-    def _init_socket(self) -> zmq.Socket:
-        ctx = zmq.Context.instance()
-        socket = ctx.socket(getattr(zmq, self.socket_type))
-        socket.setsockopt_string(zmq.IDENTITY, self.id)
-
-        if self.mode == 'bind':
-            if self.ip == '':
-                self.ip = '*'
-            socket.bind(self.address)
-        elif self.mode == 'connect':
-            socket.connect(self.address)
-        else:
-            raise ValueError(f'mode needs to be one of types.ZMQ_MODE, got {self.mode}')
-
+    def _init_socket(self, socket_desc:Socket) -> typing.Union[zmq.Socket, zmq.asyncio.Socket]:
         if self.poll_mode == self.Poll_Mode.IOLOOP:
-            socket = ZMQStream(socket)
             if not callable(self.callback):
                 raise ValueError(f'Must provide a callback for poll_mode == IOLoop, got {self.callback}')
-            socket.on_recv(self.callback)
-            loop = IOLoop.current()
-            threading.Thread(target=self._start_ioloop, args=(loop,), daemon=True).start()
-
+            callback = self.callback
         elif self.poll_mode == self.Poll_Mode.DEQUE:
-            threading.Thread(target=self._start_polling, daemon=True).start()
+            callback = self.deque.append
+        else:
+            ctx = zmq.Context.instance()
+            socket = ctx.socket(getattr(zmq, self.socket_type))
+            socket.setsockopt_string(zmq.IDENTITY, self.id)
 
-        return socket
+            if self.mode == 'bind':
+                if self.ip == '':
+                    self.ip = '*'
+                socket.bind(self.address)
+            elif self.mode == 'connect':
+                socket.connect(self.address)
+            else:
+                raise ValueError(f'mode needs to be one of types.ZMQ_MODE, got {self.mode}')
+            return socket
+
+        self._loop = get_loop()
+        self._async = Async_Node(socket_desc, callback=callback, to=self.to)
+        asyncio.run_coroutine_threadsafe(self._async.start(), self._loop).result()
+        return self._async.socket
 
     @property
     def address(self) -> str:
@@ -110,13 +456,38 @@ class Node(Perceptivo_Object):
         else:
             raise NotImplementedError('Only tcp and ipc modes are implemented!')
 
+    def _on_loop(self) -> bool:
+        """Whether we are being called from the shared loop's thread, eg. from an ``IOLOOP`` callback"""
+        try:
+            return asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            return False
+
+    def _sent(self, future: asyncio.Future):
+        if not future.cancelled() and future.exception() is not None:
+            self.logger.error(f'Could not send message: {future.exception()}')
+
     def send(self, msg:Optional[Message] = None, to:Optional[str]=None, **kwargs):
-        """for now just wrapping the socket"""
+        """
+        Send a message.
+
+        ``IOLOOP`` and ``DEQUE`` nodes send from the shared loop, and block until the message is sent.
+        When called from the loop's own thread, eg. from an ``IOLOOP`` callback, waiting would deadlock the loop,
+        so the send is scheduled and this returns immediately, and errors are logged rather than raised.
+        """
         if msg is None:
             if len(kwargs) == 0:
                 raise ValueError(f'Need a message or kwargs that can be used to create a message')
             msg = Message(**kwargs)
 
+        if self._async is not None:
+            # sockets aren't threadsafe, so send from the loop that owns it
+            if self._on_loop():
+                self._loop.create_task(self._async.send(msg, to=to)).add_done_callback(self._sent)
+            else:
+                asyncio.run_coroutine_threadsafe(self._async.send(msg, to=to), self._loop).result()
+            return
+
         if self.socket_type in ('ROUTER','DEALER'):
             if to is None and self.to is None:
                 error_msg = 'With Router/Dealer sockets, need to explicitly pass "to" in send or init'
@@ -131,20 +502,42 @@ class Node(Perceptivo_Object):
             self.socket.send(msg.serialize())
         self.logger.debug(f'Sent message number {msg.message_number}')
 
-    def _start_ioloop(self, loop:IOLoop):
-        """spawn a tornado ioloop"""
-        try:
-            loop.start()
-        except RuntimeError:
-            # loop already started
-            pass
+    def ping(self, to: Optional[str] = None, timeout: float = 1) -> Clock_Sync:
+        """
+        Ping a peer and wait for the reply, see :meth:`.Async_Node.ping` .
+        Only for ``IOLOOP`` and ``DEQUE`` nodes, and not from the shared loop's thread (eg. an ``IOLOOP`` callback),
+        where waiting for the reply would deadlock the loop.
+        """
+        if self._async is None:
+            raise RuntimeError('Can only ping from IOLOOP and DEQUE nodes')
+        if self._on_loop():
+            raise RuntimeError('Cannot wait for a ping from the shared loop, use start_pinging instead')
+        return asyncio.run_coroutine_threadsafe(self._async.ping(to=to, timeout=timeout), self._loop).result()
+
+    def start_pinging(self, interval: float = 1, to: Optional[str] = None):
+        """
+        Continuously ping a peer in the background, see :meth:`.Async_Node.start_pinging` .
+        Only for ``IOLOOP`` and ``DEQUE`` nodes.
+        """
+        if self._async is None:
+            raise RuntimeError('Can only ping from IOLOOP and DEQUE nodes')
+        self._loop.call_soon_threadsafe(self._async.start_pinging, interval, to)
 
-    def _start_polling(self):
-        """spawn a thread to poll the socket and add incoming messages to the queue"""
-        while not self._stopping.is_set():
-            msg = Message.from_serialized(self.socket.recv())
-            self.deque.append(msg)
+    @property
+    def clocks(self) -> Dict[str, Clock_Sync]:
+        """
+        Clock estimates for each peer that has been pinged, see :attr:`.Async_Node.clocks`
+        """
+        if self._async is None:
+            return {}
+        return self._async.clocks
 
-    def release(self):
+    def release(self, timeout: float = 5):
         self._stopping.set()
-        self.socket.close()
+        if self._async is not None:
+            if self._on_loop():
+                self._loop.create_task(self._async.close())
+            else:
+                asyncio.run_coroutine_threadsafe(self._async.close(), self._loop).result(timeout)
+        else:
+            self.socket.close()
@@ -22,7 +22,7 @@ import json
 from perceptivo import Directories
 from perceptivo.types import sound, psychophys, video, patient
 from perceptivo.types.networking import Clinician_Networking, Patient_Networking
-from perceptivo.video.pupil import Pupil_Extractors, EllipseExtractor_Params
+from perceptivo.types.pupil import EllipseExtractor_Params, Starburst_Params, Blink_Gate_Params
 from perceptivo.types.gui import GUI_Params
 
 _LOCK = mp.Lock()
@@ -46,6 +46,10 @@ def json_dumps_pretty(v, *, default):
 class Prefs(BaseModel):
 
     loglevel:LOGLEVELS = 'DEBUG'
+    log_json: bool = False
+    """Write log files as JSON lines rather than text, see :class:`.data.logging.Json_Formatter`"""
+    log_rate_limit: float = 20
+    """Debug records per second allowed from loggers in hot paths, see :class:`.data.logging.Rate_Limit_Filter`"""
 
     class Config:
         json_dumps = json_dumps_pretty
@@ -77,10 +81,30 @@ class Patient_Prefs(Prefs):
     Run the picamera in a separate Process (using :class:`.cameras.Picamera_Process` . Only True supported for now!
     """
     picam_queue_size:int = 1024
+    sound_bank_bytes:int = 2**27
+    """
+    Memory budget (bytes) for pre-rendered sounds, see :class:`.sound.bank.Sound_Bank`
+    """
+    sound_bank_workers: typing.Optional[int] = None
+    """
+    Number of processes used to pre-render sounds when an exam starts. ``None`` for one per CPU
+    """
     pupil_extractor: str = 'simple'
-    pupil_extractor_params: typing.Union[EllipseExtractor_Params] = EllipseExtractor_Params()
+    pupil_extractor_params: typing.Union[EllipseExtractor_Params, Starburst_Params] = EllipseExtractor_Params()
+    blink_gate: typing.Optional[Blink_Gate_Params] = Blink_Gate_Params()
+    """
+    Skip pupil extraction for blinks and occluded frames with a :class:`.video.pupil.Blink_Gate` , ``None`` to extract from every frame
+    """
     collection_params : patient.Collection_Params = patient.Collection_Params()
     networking: Patient_Networking = Patient_Networking()
+    metrics_interval: typing.Optional[float] = 5
+    """
+    Seconds between sending metrics to the clinician, see :meth:`.runtimes.patient.Patient.send_metrics` . ``None`` to not send them
+    """
+    metrics_port: typing.Optional[int] = None
+    """
+    Port to serve metrics on locally with a :class:`.data.metrics.Metrics_Server` , ``None`` to not serve them
+    """
 
     class Config:
         use_enum_values = True
@@ -93,6 +117,11 @@ class Clinician_Prefs(Prefs):
     networking: Clinician_Networking = Clinician_Networking()
     gui: GUI_Params = GUI_Params()
     update_period:float = 0.05
+    ping_interval: typing.Optional[float] = 1
+    """
+    Seconds between pinging connected patients to estimate round trip times and clock offsets,
+    see :mod:`.networking.clock_sync` . ``None`` to not ping them
+    """
 
 
 def get(field:str, file:Path= Directories.prefs_file):
@@ -0,0 +1,310 @@
+"""
+Acquisition functions that choose which sound to present next with
+:class:`.model.Gaussian_Process`
+
+Each acquisition function scores a grid of candidate (frequency, amplitude) points
+using the mean and variance of the Laplace-approximated latent function
+(from :meth:`.gaussian.IterativeGPC.predict_latent` ), computed for the whole grid at once,
+and picks the highest scoring candidate(s).
+
+* :class:`.Uncertainty` - entropy of the predicted response. Unlike choosing the point
+  closest to ``p = 0.5`` , the latent variance moderates the predicted probability.
+* :class:`.BALD` - Bayesian Active Learning by Disagreement :cite:p:`houlsbyBayesianActiveLearning2011` ,
+  the expected information gain about the latent function from observing a response.
+* :class:`.Batch_BALD` - Selects a batch of points greedily. After each pick, the latent
+  variance of the other candidates is reduced as if that point had been observed, so the
+  batch spreads out over the grid instead of piling up on one spot.
+
+Acquisition functions are selected by name with :attr:`.types.exam.Exam_Params.acquisition` ,
+see :func:`.get_acquisition` .
+"""
+import typing
+from abc import abstractmethod
+
+import numpy as np
+from scipy.special import ndtr
+
+from perceptivo.root import Perceptivo_Object
+from perceptivo.types.exam import ACQUISITION_TYPES
+if typing.TYPE_CHECKING:
+    from perceptivo.psychophys.gaussian import IterativeGPC
+
+_PROBIT_SCALE = np.sqrt(np.pi / 8)
+"""
+Scale so that a probit function approximates the logistic sigmoid
+used by the GPC, ie. ``sigmoid(f) ~= ndtr(_PROBIT_SCALE * f)``
+"""
+
+_BALD_C = np.sqrt(np.pi * np.log(2) / 2)
+"""
+Constant from the gaussian approximation to the binary entropy of a probit,
+see :cite:p:`houlsbyBayesianActiveLearning2011`
+"""
+
+
+def binary_entropy(p: np.ndarray) -> np.ndarray:
+    """
+    Entropy (in bits) of a bernoulli variable with probability ``p``
+
+    Args:
+        p (:class:`numpy.ndarray`): probabilities
+
+    Returns:
+        :class:`numpy.ndarray` entropy of each probability
+    """
+    p = np.clip(p, 1e-12, 1-1e-12)
+    return -(p * np.log2(p) + (1-p) * np.log2(1-p))
+
+
+def predictive_probability(mean: np.ndarray, var: np.ndarray) -> np.ndarray:
+    """
+    Probability of a positive response, averaging the sigmoid over the latent distribution
+    with the probit approximation (see Rasmussen & Williams, section 3.4.2)
+
+    Args:
+        mean (:class:`numpy.ndarray`): latent mean
+        var (:class:`numpy.ndarray`): latent variance
+
+    Returns:
+        :class:`numpy.ndarray` of probabilities
+    """
+    return ndtr(_PROBIT_SCALE * mean / np.sqrt(1 + _PROBIT_SCALE**2 * var))
+
+
+class Acquisition(Perceptivo_Object):
+    """
+    Base class for acquisition functions.
+
+    Subclasses implement :meth:`.score` , and can override :meth:`.select` if they
+    need to do something more than take the highest scores (eg. :class:`.Batch_BALD` )
+
+    Args:
+        batch_size (int): Number of candidates to select at a time
+    """
+
+    def __init__(self, batch_size:int=1, **kwargs):
+        super(Acquisition, self).__init__(**kwargs)
+        if batch_size < 1:
+            raise ValueError(f'batch_size must be at least 1, got {batch_size}')
+        self.batch_size = int(batch_size)
+
+    @abstractmethod
+    def score(self, mean:np.ndarray, var:np.ndarray) -> np.ndarray:
+        """
+        Score candidate points, higher is better
+
+        Args:
+            mean (:class:`numpy.ndarray`): latent mean at each candidate
+            var (:class:`numpy.ndarray`): latent variance at each candidate
+
+        Returns:
+            :class:`numpy.ndarray` of scores the same shape as ``mean``
+        """
+
+    def select(self,
+               model: 'IterativeGPC',
+               candidates: np.ndarray,
+               exclude: typing.Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Select the :attr:`.batch_size` best candidates
+
+        Args:
+            model (:class:`.gaussian.IterativeGPC`): Fit model
+            candidates (:class:`numpy.ndarray`): (n_candidates, 2) array of frequencies and amplitudes
+            exclude (:class:`numpy.ndarray`): Optional boolean mask of candidates that can't be selected
+
+        Returns:
+            :class:`numpy.ndarray` of indices into ``candidates`` , best first
+        """
+        mean, var = model.predict_latent(candidates)
+        scores = self.score(mean, var)
+        if exclude is not None:
+            scores[exclude] = -np.inf
+
+        n = min(self.batch_size, np.sum(np.isfinite(scores)))
+        if n < 1:
+            raise ValueError('No candidates left to select from!')
+        best = np.argpartition(-scores, n-1)[:n]
+        return best[np.argsort(-scores[best])]
+
+
+class Uncertainty(Acquisition):
+    """
+    Uncertainty sampling: choose the candidate whose response is hardest to predict,
+    ie. the one with the highest :func:`.binary_entropy` of the :func:`.predictive_probability`
+    """
+
+    def score(self, mean:np.ndarray, var:np.ndarray) -> np.ndarray:
+        return binary_entropy(predictive_probability(mean, var))
+
+
+class BALD(Acquisition):
+    """
+    Bayesian Active Learning by Disagreement :cite:p:`houlsbyBayesianActiveLearning2011`
+
+    Scores each candidate by the mutual information between its response and the latent function:
+    the entropy of the predicted response minus the expected entropy given the latent value.
+    Points that are uncertain only because the responses there are noisy
+    score low, and points that are uncertain because we haven't learned much about them score high.
+    """
+
+    def score(self, mean:np.ndarray, var:np.ndarray) -> np.ndarray:
+        mean = _PROBIT_SCALE * mean
+        var = _PROBIT_SCALE**2 * var
+        marginal = binary_entropy(ndtr(mean / np.sqrt(1 + var)))
+        conditional = _BALD_C / np.sqrt(var + _BALD_C**2) * np.exp(-mean**2 / (2 * (var + _BALD_C**2)))
+        # the approximate conditional entropy can slightly exceed the marginal for confident predictions,
+        # but mutual information can't be negative
+        return np.maximum(marginal - conditional, 0)
+
+
+class Batch_BALD(BALD):
+    """
+    Greedy batch version of :class:`.BALD` .
+
+    After each candidate is picked, the latent covariance is conditioned on a noisy
+    observation at that point (a pivoted cholesky update of the posterior covariance)
+    and the remaining candidates are rescored. Nearby points lose their variance
+    and score, so the batch covers the grid rather than repeating near-duplicates.
+
+    Args:
+        batch_size (int): Number of candidates to select at a time
+        latent_noise (float): Variance of the pseudo-observation used to condition the latent
+            function on each pick. Defaults to the variance of the logistic distribution,
+            the noise implied by the GPC's likelihood.
+    """
+
+    def __init__(self, batch_size:int=4, latent_noise:float=np.pi**2/3, **kwargs):
+        super(Batch_BALD, self).__init__(batch_size=batch_size, **kwargs)
+        self.latent_noise = latent_noise
+
+    def select(self,
+               model: 'IterativeGPC',
+               candidates: np.ndarray,
+               exclude: typing.Optional[np.ndarray] = None) -> np.ndarray:
+        mean, var, v = model.predict_latent(candidates, return_factor=True)
+        kernel = model.kernel_
+
+        available = np.ones(candidates.shape[0], dtype=bool)
+        if exclude is not None:
+            available[exclude] = False
+
+        n = min(self.batch_size, np.sum(available))
+        if n < 1:
+            raise ValueError('No candidates left to select from!')
+
+        chosen = []
+        factors = np.zeros((n, candidates.shape[0]))
+        for i in range(n):
+            scores = self.score(mean, var)
+            scores[~available] = -np.inf
+            pick = int(np.argmax(scores))
+            chosen.append(pick)
+            available[pick] = False
+
+            # posterior covariance of all candidates with the pick,
+            # minus what has already been explained by previous picks
+            cov = kernel(candidates, candidates[pick:pick+1])[:, 0] - v.T.dot(v[:, pick])
+            cov -= factors[:i].T.dot(factors[:i, pick])
+            factors[i] = cov / np.sqrt(var[pick] + self.latent_noise)
+            var = np.clip(var - factors[i]**2, 0, None)
+
+        return np.array(chosen)
+
+
+def get_acquisition(name: ACQUISITION_TYPES) -> typing.Type[Acquisition]:
+    """
+    Get an acquisition class by name
+
+    Args:
+        name (str): One of :data:`.types.exam.ACQUISITION_TYPES`
+
+    Returns:
+        subclass of :class:`.Acquisition`
+    """
+    acq = globals().get(name, None)
+    if acq is None or not (isinstance(acq, type) and issubclass(acq, Acquisition)):
+        raise ValueError(f'Dont know what acquisition function you mean by {name}, needs to be one of {ACQUISITION_TYPES}')
+    return acq
+
+
+def benchmark_acquisition(
+        acquisitions: typing.Tuple[ACQUISITION_TYPES, ...] = ('Uncertainty', 'BALD', 'Batch_BALD'),
+        n_trials:int = 60,
+        n_repeats:int = 3,
+        tolerance:float = 5,
+        scale:float = 2,
+        frequencies: typing.Tuple[float, ...] = (500, 1000, 2000, 3000, 4000, 6000, 8000),
+        amplitudes: typing.Tuple[float, ...] = tuple(range(0, 45, 5)),
+        seed:int = 0) -> typing.Dict[str, typing.Dict[str, typing.Union[float, typing.List[int]]]]:
+    """
+    Compare how many trials each acquisition function takes to estimate the
+    :func:`.oracle.reference_audiogram` .
+
+    Each simulated exam runs a :class:`.model.Gaussian_Process` with the given acquisition function
+    against the oracle, and is considered converged at the first trial where the root-mean-square
+    error between :meth:`.model.Gaussian_Process.thresholds` and :func:`.oracle.reference_thresholds`
+    is within ``tolerance`` . Exams that don't converge are counted as ``n_trials + 1`` .
+
+    Examples:
+
+        >>> results = benchmark_acquisition(n_trials=40, n_repeats=2)
+        >>> {name: result['mean'] for name, result in results.items()}
+
+    Args:
+        acquisitions (tuple): names of acquisition functions to compare
+        n_trials (int): Maximum trials per simulated exam
+        n_repeats (int): Number of simulated exams per acquisition function
+        tolerance (float): RMS threshold error (dbSPL) to consider an exam converged
+        scale (float): Noise of the oracle, see :func:`.oracle.reference_audiogram`
+        frequencies (tuple): Frequencies to test
+        amplitudes (tuple): Amplitudes to test
+        seed (int): Seed for the random number generator, each acquisition function gets the
+            same sequence of seeds.
+
+    Returns:
+        dict like ``{'BALD': {'trials_to_convergence': [...], 'mean': float}, ...}``
+    """
+    # avoid circular import, model imports us
+    from perceptivo.psychophys.model import Gaussian_Process
+    from perceptivo.psychophys.oracle import reference_audiogram, reference_thresholds
+    from perceptivo.types.exam import Exam_Params
+    from perceptivo.types.psychophys import Sample
+
+    target = reference_thresholds(frequencies)
+
+    results = {}
+    for name in acquisitions:
+        trials = []
+        for repeat in range(n_repeats):
+            rng = np.random.default_rng(seed + repeat)
+            oracle = reference_audiogram(scale=scale, rng=rng)
+            params = Exam_Params(
+                frequencies=frequencies,
+                amplitudes=amplitudes,
+                iti=0,
+                acquisition=name
+            )
+            gp = Gaussian_Process(
+                freq_range=(min(frequencies), max(frequencies)),
+                amplitude_range=(min(amplitudes), max(amplitudes)),
+                exam_params=params,
+                rng=rng
+            )
+
+            converged = n_trials + 1
+            for trial in range(n_trials):
+                sound = gp.next()
+                gp.update(Sample(response=oracle(sound), sound=sound))
+                error = np.sqrt(np.nanmean((gp.thresholds(frequencies) - target)**2))
+                if error <= tolerance:
+                    converged = trial + 1
+                    break
+            trials.append(converged)
+
+        results[name] = {
+            'trials_to_convergence': trials,
+            'mean': float(np.mean(trials))
+        }
+
+    return results
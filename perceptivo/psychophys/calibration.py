@@ -0,0 +1,161 @@
+"""
+Per-patient calibration of the pupil dilation that counts as a response.
+
+Pupils differ in size and in how much they fluctuate on their own, so a fixed
+:attr:`.Collection_Params.threshold` is too strict for some patients and too lenient for others.
+:class:`.Pupil_Calibration` keeps streaming statistics (see :mod:`.data.stats` ) over every trial
+of an exam in constant memory:
+
+* the baseline diameter of each trial (the median diameter before the sound's onset),
+* the noise: each pre-onset diameter's deviation from its trial's baseline, relative to the baseline, and
+* the peak dilation after the onset, relative to the baseline.
+
+Once there have been :attr:`.Collection_Params.calibration_trials` trials, the threshold for a trial is the
+peak relative dilation that noise alone would exceed with probability :attr:`.Collection_Params.false_positive`
+over that trial's post-onset frames. For ``n`` draws of gaussian noise with mean ``mu`` and standard deviation
+``sigma`` , the maximum exceeds ``mu + z * sigma`` with probability ``alpha`` when
+``z = Phi^-1((1 - alpha) ** (1/n))`` , so longer collection windows get higher thresholds.
+Since the baseline is itself the median of only a few frames, ``sigma`` is widened by the median's
+sampling error, ``sigma * sqrt(pi / (2 * n_baseline))`` .
+
+The :class:`.runtimes.patient.Patient` calibrates with the filtered diameters from :class:`.psychophys.dilation.Dilation_Analyzer` ,
+whose neighboring samples are correlated, so they count as more independent draws than they are and
+the threshold errs on the side of fewer false positives.
+"""
+import math
+import statistics
+import typing
+
+from perceptivo.root import Perceptivo_Object
+from perceptivo.data.stats import Welford, P2_Quantile
+from perceptivo.types.pupil import Pupil_Params, Pupil_Calibration_State
+from perceptivo.types.patient import Collection_Params
+
+
+class Pupil_Calibration(Perceptivo_Object):
+    """
+    Streaming estimate of a patient's pupil noise that sets each trial's :class:`.types.pupil.Pupil_Params`
+
+    Use :meth:`.calibrate` once per trial, which makes the params for the trial from the
+    statistics of the previous trials and then adds the trial to them.
+
+    Args:
+        threshold (float): Threshold to use until calibrated, see :attr:`.Collection_Params.threshold`
+        trials (int): Number of trials with a baseline before the calibrated threshold is used
+        min_threshold (float): Lower bound of the calibrated threshold
+        false_positive (float): Probability that a trial with no dilation is counted as a response
+        enabled (bool): If ``False`` , keep the statistics but always use ``threshold``
+    """
+
+    def __init__(self,
+                 threshold: float = 0.05,
+                 trials: int = 5,
+                 min_threshold: float = 0.01,
+                 false_positive: float = 0.05,
+                 enabled: bool = True):
+        self.default_threshold = threshold
+        self.trials = trials
+        self.min_threshold = min_threshold
+        self.false_positive = false_positive
+        self.enabled = enabled
+
+        self.threshold = threshold
+        self.baselines = Welford()
+        self.baseline_median = P2_Quantile(0.5)
+        self.noise = Welford()
+        self.peaks = Welford()
+        self.peak_median = P2_Quantile(0.5)
+        self.peak_p90 = P2_Quantile(0.9)
+        self.n_trials = 0
+
+    @classmethod
+    def from_params(cls, params: Collection_Params) -> 'Pupil_Calibration':
+        """Make a calibration from :class:`.types.patient.Collection_Params`"""
+        return cls(
+            threshold=params.threshold,
+            trials=params.calibration_trials,
+            min_threshold=params.min_threshold,
+            false_positive=params.false_positive,
+            enabled=params.calibrate
+        )
+
+    @property
+    def calibrated(self) -> bool:
+        """Whether there are enough trials to estimate the threshold"""
+        return self.enabled and self.n_trials >= self.trials and self.noise.n >= 2
+
+    def null_threshold(self, n: int, n_baseline: int) -> float:
+        """
+        Peak relative dilation over ``n`` frames of noise alone that is exceeded with
+        probability :attr:`.false_positive` , see module docstring
+
+        Args:
+            n (int): Number of frames after the onset
+            n_baseline (int): Number of frames before the onset that the baseline is the median of
+        """
+        z = statistics.NormalDist().inv_cdf((1 - self.false_positive) ** (1 / max(n, 1)))
+        sigma = self.noise.std * math.sqrt(1 + math.pi / (2 * max(n_baseline, 1)))
+        return self.noise.mean + z * sigma
+
+    def calibrate(self,
+                  diameters: typing.Sequence[float],
+                  timestamps: typing.Sequence[int],
+                  onset: int) -> Pupil_Params:
+        """
+        Make the :class:`.types.pupil.Pupil_Params` for a trial, then update the statistics with it.
+
+        Args:
+            diameters (list): Pupil diameters in pixels
+            timestamps (list): Monotonic timestamps (ns) of the frames each diameter was measured from
+            onset (int): Monotonic time (ns) of the sound's onset
+
+        Returns:
+            :class:`.types.pupil.Pupil_Params` , with a ``baseline`` of ``None`` if there were no pupils
+            before the onset, in which case the statistics are not updated.
+        """
+        pre = [d for d, t in zip(diameters, timestamps) if t < onset]
+        post = [d for d, t in zip(diameters, timestamps) if t >= onset]
+        max_diameter = max(diameters) if len(diameters) > 0 else None
+
+        if len(pre) == 0:
+            self.logger.warning('No pupils before the sound onset to use as a baseline')
+            return Pupil_Params(threshold=self.threshold, max_diameter=max_diameter)
+
+        baseline = statistics.median(pre)
+        if self.calibrated:
+            self.threshold = max(self.min_threshold, self.null_threshold(len(post), len(pre)))
+        params = Pupil_Params(threshold=self.threshold, max_diameter=max_diameter, baseline=baseline)
+
+        # only trials with a baseline say anything about the patient's pupil
+        self.n_trials += 1
+        self.baselines.update(baseline)
+        self.baseline_median.update(baseline)
+        self.noise.update_many(d / baseline - 1 for d in pre)
+        if len(post) > 0:
+            peak = max(post) / baseline - 1
+            self.peaks.update(peak)
+            self.peak_median.update(peak)
+            self.peak_p90.update(peak)
+
+        self.logger.debug(f'Calibrated pupil params: {params}')
+        return params
+
+    def state(self) -> Pupil_Calibration_State:
+        """
+        Summarize the calibration for the clinician
+        """
+        def _or_none(value: float) -> typing.Optional[float]:
+            return None if math.isnan(value) else value
+
+        return Pupil_Calibration_State(
+            n_trials=self.n_trials,
+            calibrated=self.calibrated,
+            threshold=self.threshold,
+            baseline_mean=self.baselines.mean if self.baselines.n > 0 else None,
+            baseline_std=_or_none(self.baselines.std),
+            baseline_median=_or_none(self.baseline_median.value),
+            noise_std=_or_none(self.noise.std),
+            peak_mean=self.peaks.mean if self.peaks.n > 0 else None,
+            peak_median=_or_none(self.peak_median.value),
+            peak_p90=_or_none(self.peak_p90.value)
+        )
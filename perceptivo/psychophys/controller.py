@@ -0,0 +1,169 @@
+"""
+Decide when an exam is over.
+
+The :class:`.Exam_Controller` implements the criteria in :class:`.types.exam.Completion_Metric` ,
+and is checked by the :class:`.runtimes.patient.Patient` after each trial.
+"""
+import typing
+from collections import deque
+from time import monotonic
+
+import numpy as np
+
+from perceptivo.root import Perceptivo_Object
+from perceptivo.types.exam import Completion_Metric
+if typing.TYPE_CHECKING:
+    from perceptivo.psychophys.model import Audiogram_Model
+
+
+class Exam_Controller(Perceptivo_Object):
+    """
+    Check the :class:`.types.exam.Completion_Metric` after each model update.
+
+    Criteria that are ``None`` in the metric are not used:
+
+    * ``log_likelihood`` - the log likelihood of the model (:attr:`.Audiogram_Model.log_likelihood` )
+      is below the given value
+    * ``n_trials`` - at least this many trials have been run
+    * ``duration`` - at least this many minutes have elapsed since :meth:`.start`
+    * ``threshold_stability`` - the thresholds estimated by the model (eg. :meth:`.Gaussian_Process.thresholds` )
+      have each moved less than this many dbSPL over the last ``stability_window`` updates
+
+    ``metric.use`` selects whether ``any`` or ``all`` of the criteria need to be met, or else
+    names the single criterion to use.
+
+    Examples:
+
+        controller = Exam_Controller(params.completion_metric, frequencies=params.frequencies)
+        controller.start()
+        while True:
+            sample = patient.trial()
+            if controller.update(patient.model):
+                print(controller.reason)
+                break
+
+    Args:
+        metric (:class:`.types.exam.Completion_Metric`): Criteria for ending the exam
+        frequencies (tuple): Frequencies to estimate thresholds at for ``threshold_stability``
+    """
+
+    CRITERIA = ('log_likelihood', 'n_trials', 'duration', 'threshold_stability')
+
+    def __init__(self,
+                 metric: Completion_Metric,
+                 frequencies: typing.Optional[typing.Iterable[float]] = None,
+                 **kwargs):
+        super(Exam_Controller, self).__init__(**kwargs)
+        self.metric = metric
+        self.frequencies = None if frequencies is None else np.asarray(frequencies, dtype=float)
+
+        self.criteria = [c for c in self.CRITERIA if getattr(self.metric, c) is not None]
+        if self.metric.use not in ('any', 'all'):
+            if self.metric.use not in self.CRITERIA:
+                raise ValueError(f'Completion_Metric.use must be any, all, or one of {self.CRITERIA}, got {self.metric.use}')
+            if self.metric.use not in self.criteria:
+                raise ValueError(f'Completion_Metric.use is {self.metric.use}, but that criterion is None')
+            self.criteria = [self.metric.use]
+
+        if 'threshold_stability' in self.criteria and self.frequencies is None:
+            raise ValueError('Need frequencies to estimate thresholds to use threshold_stability')
+
+        self.n_trials = 0
+        self.log_likelihood = None # type: typing.Optional[float]
+        self.stability = None # type: typing.Optional[float]
+        self.reason = None # type: typing.Optional[str]
+        """Which criteria ended the exam, if it is complete"""
+        self._thresholds = deque(maxlen=self.metric.stability_window) # type: typing.Deque[np.ndarray]
+        self._start_time = None # type: typing.Optional[float]
+
+    def start(self):
+        """
+        Reset the trial count, threshold history, and start the clock
+        """
+        self.n_trials = 0
+        self.log_likelihood = None
+        self.stability = None
+        self.reason = None
+        self._thresholds.clear()
+        self._start_time = monotonic()
+
+    @property
+    def elapsed(self) -> float:
+        """
+        Minutes since :meth:`.start` , 0 if not started
+        """
+        if self._start_time is None:
+            return 0
+        return (monotonic() - self._start_time) / 60
+
+    @property
+    def complete(self) -> bool:
+        """
+        ``True`` if the exam met its :attr:`.metric` on the last :meth:`.update`
+        """
+        return self.reason is not None
+
+    def update(self, model: 'Audiogram_Model', updated:bool=True) -> bool:
+        """
+        Check the completion criteria after a trial.
+
+        Args:
+            model (:class:`.model.Audiogram_Model`): The model, after it was updated with the trial
+            updated (bool): Whether the model was actually updated (``False`` if the trial didn't
+                yield a sample, in which case the trial still counts but the thresholds aren't re-estimated)
+
+        Returns:
+            bool: ``True`` if the exam is complete
+        """
+        if self._start_time is None:
+            self.start()
+
+        self.n_trials += 1
+        self.log_likelihood = model.log_likelihood
+
+        if updated and 'threshold_stability' in self.criteria and hasattr(model, 'thresholds'):
+            self._thresholds.append(model.thresholds(self.frequencies))
+            if len(self._thresholds) == self._thresholds.maxlen:
+                thresholds = np.stack(self._thresholds)
+                # if any threshold is still undefined, we're not stable
+                self.stability = float(np.max(np.ptp(thresholds, axis=0)))
+
+        met = [c for c in self.criteria if self._met(c)]
+        if len(self.criteria) == 0:
+            done = False
+        elif self.metric.use == 'all':
+            done = len(met) == len(self.criteria)
+        else:
+            done = len(met) > 0
+
+        if done:
+            self.reason = ', '.join(met)
+            self.logger.info(f'Exam complete after {self.n_trials} trials and {self.elapsed:.2f} minutes, met: {self.reason}')
+        return done
+
+    def _met(self, criterion:str) -> bool:
+        if criterion == 'log_likelihood':
+            return self.log_likelihood is not None and self.log_likelihood < self.metric.log_likelihood
+        elif criterion == 'n_trials':
+            return self.n_trials >= self.metric.n_trials
+        elif criterion == 'duration':
+            return self.elapsed >= self.metric.duration
+        elif criterion == 'threshold_stability':
+            # nan comparisons are False, so undefined thresholds are never stable
+            return self.stability is not None and self.stability <= self.metric.threshold_stability
+        else:
+            raise ValueError(f'Unknown criterion {criterion}')
+
+    @property
+    def status(self) -> dict:
+        """
+        Current state of each criterion, eg. to send to the clinician
+        """
+        return {
+            'n_trials': self.n_trials,
+            'duration': self.elapsed,
+            'log_likelihood': self.log_likelihood,
+            'threshold_stability': self.stability,
+            'complete': self.complete,
+            'reason': self.reason
+        }
@@ -0,0 +1,245 @@
+"""
+Measure a pupil's response to a sound from its diameters over a trial.
+
+Pupil diameters from :mod:`.video.pupil` are noisy: blinks and partly closed eyelids make
+ellipses that are too small, a spurious ellipse can be much too large, and frames can be dropped.
+:class:`.Dilation_Analyzer` turns each trial's irregularly sampled diameters into a small set of
+:class:`.types.pupil.Dilation_Features` :
+
+* **Clean** - diameters that are far from the trial's median (:attr:`.Dilation_Analysis_Params.max_deviation` )
+  or that change faster than a pupil can (:attr:`.Dilation_Analysis_Params.max_velocity` ) are discarded,
+  along with :attr:`.Dilation_Analysis_Params.blink_margin` seconds around them and around
+  frames that a :class:`.video.pupil.Blink_Gate` skipped.
+* **Resample** - the remaining diameters are linearly interpolated, across the discarded gaps,
+  onto a uniform grid from the start of the baseline to the end of the collection window.
+  Trials with a gap longer than :attr:`.Dilation_Analysis_Params.max_gap` aren't analyzed.
+* **Filter** - a butterworth lowpass filter is run forwards and backwards, so the filtered
+  trace isn't delayed and the latencies aren't biased.
+* **Measure** - the baseline is the median before the onset, and the peak and its latency
+  are measured relative to it.
+
+Everything after cleaning is vectorized across trials, so whole sessions can be analyzed
+at once with :meth:`.Dilation_Analyzer.analyze_batch` . The grid, filter coefficients, and
+filter initial conditions are computed once when the analyzer is made.
+"""
+import typing
+
+import numpy as np
+from scipy.signal import butter, sosfilt, sosfilt_zi
+
+from perceptivo.clock import NS_PER_S
+from perceptivo.root import Perceptivo_Object
+from perceptivo.types.pupil import Dilation_Analysis_Params, Dilation_Features
+
+if typing.TYPE_CHECKING:
+    from perceptivo.types.pupil import Dilation
+
+
+class Dilation_Analyzer(Perceptivo_Object):
+    """
+    Clean, resample, filter, and measure pupil diameters, see module docstring.
+
+    Args:
+        params (:class:`.types.pupil.Dilation_Analysis_Params`): Analysis parameters
+        baseline (float): Seconds before the onset that trials include, see :attr:`.Collection_Params.baseline`
+        duration (float): Seconds after the onset that trials include, see :attr:`.Collection_Params.collection_wait`
+
+    Attributes:
+        grid (:class:`numpy.ndarray`): Times (s) relative to the onset that diameters are resampled to
+        trace (:class:`numpy.ndarray`): Filtered diameters (px) of the last trial passed to :meth:`.analyze` ,
+            at the :attr:`.grid` times
+    """
+
+    def __init__(self,
+                 params: typing.Optional[Dilation_Analysis_Params] = None,
+                 baseline: float = 1,
+                 duration: float = 5):
+        if params is None:
+            params = Dilation_Analysis_Params()
+        self.params = params
+
+        self.grid = np.arange(-round(baseline * params.fs), round(duration * params.fs) + 1) / params.fs
+        self._pre = self.grid < 0
+        if not self._pre.any():
+            # without a baseline window, use the diameter at the onset
+            self._pre = self.grid <= 0
+        self._post = self.grid >= 0
+        self._window = self.grid >= params.min_latency
+        if not self._window.any():
+            self._window = self._post
+
+        self.sos = butter(params.order, params.cutoff, btype='low', fs=params.fs, output='sos')
+        self._zi = sosfilt_zi(self.sos)[:, np.newaxis, :]
+
+        self._resampled = np.empty((1, len(self.grid)), dtype=float)
+        self.trace = np.full(len(self.grid), np.nan)
+
+    def times(self, onset: int) -> np.ndarray:
+        """
+        The :attr:`.grid` as monotonic ns timestamps (see :mod:`perceptivo.clock` ) for a given onset
+        """
+        return onset + np.round(self.grid * NS_PER_S).astype(np.int64)
+
+    def analyze(self, timestamps: np.ndarray, diameters: np.ndarray, onset: int,
+                blinks: typing.Optional[np.ndarray] = None) -> Dilation_Features:
+        """
+        Analyze one trial, storing its filtered diameters in :attr:`.trace`
+
+        Args:
+            timestamps (:class:`numpy.ndarray`): Monotonic timestamps (ns) of each diameter
+            diameters (:class:`numpy.ndarray`): Pupil diameters (px)
+            onset (int): Monotonic time (ns) of the sound's onset
+            blinks (:class:`numpy.ndarray`): Monotonic timestamps (ns) of frames without diameters because
+                they were blinks, see :attr:`.Dilation.blinks`
+
+        Returns:
+            :class:`.types.pupil.Dilation_Features`
+        """
+        blink_fraction, max_gap = self._resample(timestamps, diameters, onset, self._resampled[0], blinks)
+        features = self._measure(self._resampled, [blink_fraction], [max_gap], self.trace[np.newaxis, :])
+        return features[0]
+
+    def analyze_batch(self,
+                      timestamps: typing.Sequence[np.ndarray],
+                      diameters: typing.Sequence[np.ndarray],
+                      onsets: typing.Sequence[int],
+                      blinks: typing.Optional[typing.Sequence[typing.Optional[np.ndarray]]] = None
+                      ) -> typing.Tuple[typing.List[Dilation_Features], np.ndarray]:
+        """
+        Analyze many trials at once, eg. a whole session offline
+
+        Args:
+            timestamps (list): Timestamps (ns) of each trial, see :meth:`.analyze`
+            diameters (list): Diameters of each trial
+            onsets (list): Onset of each trial
+            blinks (list): Timestamps of blinks in each trial, if any
+
+        Returns:
+            tuple of a list of :class:`.types.pupil.Dilation_Features` and an (n_trials, len(grid)) array of filtered diameters
+        """
+        resampled = np.empty((len(onsets), len(self.grid)), dtype=float)
+        if blinks is None:
+            blinks = [None] * len(onsets)
+        blink_fractions, max_gaps = [], []
+        for row, (times, diams, onset, trial_blinks) in zip(resampled, zip(timestamps, diameters, onsets, blinks)):
+            blink_fraction, max_gap = self._resample(times, diams, onset, row, trial_blinks)
+            blink_fractions.append(blink_fraction)
+            max_gaps.append(max_gap)
+
+        traces = np.empty_like(resampled)
+        features = self._measure(resampled, blink_fractions, max_gaps, traces)
+        return features, traces
+
+    def analyze_dilations(self, dilations: typing.Sequence['Dilation']) -> typing.List[Dilation_Features]:
+        """
+        Analyze :class:`.types.pupil.Dilation` s with :meth:`.analyze_batch` , eg. from a saved session.
+        Dilations must have an :attr:`.Dilation.onset`
+        """
+        features, _ = self.analyze_batch(
+            [dilation.times for dilation in dilations],
+            [np.asarray(dilation.diameters, dtype=float) for dilation in dilations],
+            [dilation.onset for dilation in dilations],
+            [np.asarray(dilation.blinks, dtype=np.int64) if dilation.blinks else None for dilation in dilations]
+        )
+        return features
+
+    def _resample(self, timestamps: np.ndarray, diameters: np.ndarray, onset: int,
+                  out: np.ndarray, blinks: typing.Optional[np.ndarray] = None) -> typing.Tuple[float, float]:
+        """
+        Discard blinks and dropouts from one trial and interpolate the rest onto the :attr:`.grid`
+
+        Returns:
+            tuple of the fraction of diameters and ``blinks`` that were discarded, and the longest gap (s)
+            between the rest, which is ``nan`` if there were fewer than two.
+        """
+        n_blinks = 0 if blinks is None else len(blinks)
+        params = self.params
+        times = (np.asarray(timestamps, dtype=np.int64) - onset) / NS_PER_S
+        diameters = np.asarray(diameters, dtype=float)
+
+        valid = np.isfinite(diameters) & (diameters > 0)
+        if np.count_nonzero(valid) < 2:
+            return 1., np.nan
+
+        median = np.median(diameters[valid])
+        valid &= np.abs(diameters / median - 1) <= params.max_deviation
+
+        # discard both sides of changes that are too fast to be the pupil
+        idx = np.flatnonzero(valid)
+        if len(idx) >= 2:
+            velocity = np.abs(np.diff(diameters[idx])) / (median * np.maximum(np.diff(times[idx]), 1e-6))
+            fast = velocity > params.max_velocity
+            valid[idx[:-1][fast]] = False
+            valid[idx[1:][fast]] = False
+
+        if params.blink_margin > 0 and (n_blinks > 0 or not valid.all()):
+            bad = times[~valid]
+            if n_blinks > 0:
+                bad = np.sort(np.concatenate((bad, (np.asarray(blinks, dtype=np.int64) - onset) / NS_PER_S)))
+            pos = np.searchsorted(bad, times)
+            before = times - bad[np.clip(pos - 1, 0, len(bad) - 1)]
+            after = bad[np.clip(pos, 0, len(bad) - 1)] - times
+            valid &= np.minimum(np.abs(before), np.abs(after)) > params.blink_margin
+
+        blink_fraction = 1 - np.count_nonzero(valid) / (len(valid) + n_blinks)
+        if np.count_nonzero(valid) < 2:
+            return blink_fraction, np.nan
+
+        times, diameters = times[valid], diameters[valid]
+        edges = np.concatenate(([self.grid[0]], np.clip(times, self.grid[0], self.grid[-1]), [self.grid[-1]]))
+        out[:] = np.interp(self.grid, times, diameters)
+        return blink_fraction, float(np.max(np.diff(edges)))
+
+    def _filter(self, x: np.ndarray) -> np.ndarray:
+        """
+        Zero-phase lowpass filter along the last axis, starting each pass from the steady state
+        of its first value so the edges don't ring
+        """
+        y, _ = sosfilt(self.sos, x, axis=-1, zi=self._zi * x[np.newaxis, :, :1])
+        y = y[:, ::-1]
+        y, _ = sosfilt(self.sos, y, axis=-1, zi=self._zi * y[np.newaxis, :, :1])
+        return y[:, ::-1]
+
+    def _measure(self, resampled: np.ndarray, blink_fractions: typing.Sequence[float],
+                 max_gaps: typing.Sequence[float], out: np.ndarray) -> typing.List[Dilation_Features]:
+        """
+        Filter resampled trials and measure their features, storing the filtered diameters in ``out``
+        """
+        max_gaps = np.asarray(max_gaps, dtype=float)
+        usable = np.isfinite(max_gaps) & (max_gaps <= self.params.max_gap)
+        # unusable trials may be partly uninitialized, keep them from making nans and warnings
+        resampled[~usable] = 1
+
+        out[:] = self._filter(resampled)
+        baseline = np.median(out[:, self._pre], axis=1)
+        relative = out / baseline[:, np.newaxis] - 1
+
+        rows = np.arange(len(out))
+        window = relative[:, self._window]
+        peak_idx = np.argmax(window, axis=1)
+        peak = window[rows, peak_idx]
+        peak_latency = self.grid[self._window][peak_idx]
+
+        above = relative[:, self._post] >= (peak / 2)[:, np.newaxis]
+        latency = self.grid[self._post][np.argmax(above, axis=1)]
+
+        out[~usable] = np.nan
+        features = []
+        for i in rows:
+            if not usable[i]:
+                features.append(Dilation_Features(
+                    valid=False,
+                    blink_fraction=blink_fractions[i],
+                    max_gap=max_gaps[i] if np.isfinite(max_gaps[i]) else None
+                ))
+                continue
+            features.append(Dilation_Features(
+                valid=True,
+                baseline=baseline[i],
+                peak=peak[i],
+                peak_latency=peak_latency[i],
+                latency=latency[i] if peak[i] > 0 else None,
+                blink_fraction=blink_fractions[i],
+                max_gap=max_gaps[i]
+            ))
+        return features
@@ -13,8 +13,10 @@ from sklearn.multiclass import OneVsOneClassifier, OneVsRestClassifier
 from sklearn.base import clone
 
 from operator import itemgetter
+import typing
 
 import numpy as np
+from scipy.linalg import solve_triangular
 
 class _IterativeBinaryGPCLaplace(_BinaryGaussianProcessClassifierLaplace):
     """
@@ -119,6 +121,38 @@ class _IterativeBinaryGPCLaplace(_BinaryGaussianProcessClassifierLaplace):
 
         return self
 
+    def predict_latent(self, X, return_factor:bool=False) -> typing.Union[
+            typing.Tuple[np.ndarray, np.ndarray],
+            typing.Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """
+        Mean and variance of the Laplace-approximated latent function at ``X``
+        (Algorithm 3.2, lines 4-6 of Rasmussen & Williams, as in
+        :meth:`~sklearn.gaussian_process._gpc._BinaryGaussianProcessClassifierLaplace.predict_proba` ),
+        computed for all query points at once.
+
+        Args:
+            X (:class:`numpy.ndarray`): (n_queries, n_features) query points
+            return_factor (bool): If ``True``, also return ``v`` , the (n_train, n_queries)
+                factor such that the posterior covariance between queries ``i`` and ``j`` is
+                ``k(X_i, X_j) - v[:, i] @ v[:, j]``
+
+        Returns:
+            tuple of (latent mean, latent variance) arrays of shape (n_queries,), and ``v`` if ``return_factor``
+        """
+        check_is_fitted(self)
+
+        K_star = self.kernel_(self.X_train_, X)
+        f_star = K_star.T.dot(self.y_train_ - self.pi_)
+        v = solve_triangular(self.L_, self.W_sr_[:, np.newaxis] * K_star, lower=True)
+        var_f_star = self.kernel_.diag(X) - np.einsum("ij,ij->j", v, v)
+        # numerical error can make the variance very slightly negative
+        np.clip(var_f_star, 0, None, out=var_f_star)
+
+        if return_factor:
+            return f_star, var_f_star, v
+        else:
+            return f_star, var_f_star
+
 
 class IterativeGPC(GaussianProcessClassifier):
     """
@@ -193,6 +227,12 @@ class IterativeGPC(GaussianProcessClassifier):
 
         return self
 
+    def predict_latent(self, X, return_factor:bool=False):
+        """
+        See :meth:`._IterativeBinaryGPCLaplace.predict_latent`
+        """
+        return self.base_estimator_.predict_latent(X, return_factor=return_factor)
+
     def clone_kernel(self) -> Kernel:
         k = clone(self.kernel_) # type: Kernel
         return k
\ No newline at end of file
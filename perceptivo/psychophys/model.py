@@ -9,17 +9,12 @@ import warnings
 from perceptivo.types.psychophys import Kernel as Kernel_Type
 from perceptivo.types.exam import Exam_Params
 
-PLOTTING = False
-try:
-    import matplotlib.pyplot as plt
-    from matplotlib.cm import ScalarMappable
-    PLOTTING=True
-except ImportError:
-    pass
 
 
 from sklearn.gaussian_process.kernels import Kernel
 from perceptivo.psychophys.gaussian import IterativeGPC
+from perceptivo.psychophys.acquisition import Acquisition, get_acquisition, predictive_probability
+from perceptivo.types.exam import ACQUISITION_TYPES
 
 
 def f_to_bark(frequency: float) -> float:
@@ -103,6 +98,31 @@ class Audiogram_Model(Perceptivo_Object):
         As well as ``allow_repeats``
         """
 
+    @property
+    def log_likelihood(self) -> typing.Optional[float]:
+        """
+        Log likelihood of the model given the samples so far, if the model has one.
+
+        Returns:
+            float, or ``None`` if the model doesn't have a likelihood or hasn't been fit
+        """
+        return None
+
+    def summarize(self,
+                  version: int = 0,
+                  resolution: int = 50) -> typing.Optional[types.psychophys.Posterior_Summary]:
+        """
+        Summarize the model's current estimate for display, if the model can.
+
+        Args:
+            version (int): Version number of the summary, see :attr:`.Posterior_Summary.version`
+            resolution (int): Number of points along each axis of the probability grid
+
+        Returns:
+            :class:`.types.psychophys.Posterior_Summary` , or ``None`` if the model can't be summarized
+        """
+        return None
+
 class Gaussian_Process(Audiogram_Model):
     """
     Gaussian process model based on :cite:p:`coxBayesianBinaryClassification2016`
@@ -115,7 +135,7 @@ class Gaussian_Process(Audiogram_Model):
     **Process:**
     * Convert sampled frequency to bark with :func:`.f_to_bark`
     * Update model
-    * Generate next stimulus
+    * Generate next stimulus with an :class:`.acquisition.Acquisition` function
     * Convert back to freq
 
     Examples:
@@ -147,7 +167,19 @@ class Gaussian_Process(Audiogram_Model):
 
     def __init__(self,
                  kernel:typing.Optional[typing.Union[Kernel, Kernel_Type]]=None,
+                 acquisition:typing.Optional[typing.Union[ACQUISITION_TYPES, Acquisition]]=None,
+                 rng:typing.Optional[np.random.Generator]=None,
                  *args, **kwargs):
+        """
+        Args:
+            kernel (:class:`.types.psychophys.Kernel`, :class:`sklearn.gaussian_process.kernels.Kernel`):
+                Kernel to use, if ``None`` , use the default :class:`.types.psychophys.Kernel`
+            acquisition (str, :class:`.acquisition.Acquisition`): Acquisition function (or its name)
+                to choose sounds with. If ``None`` , use :attr:`.Exam_Params.acquisition` ,
+                or :class:`.acquisition.BALD` if no ``exam_params`` are given.
+            rng (:class:`numpy.random.Generator`): Random number generator for the first, random sounds
+                and the kernel optimizer's restarts. If ``None`` , use the global :mod:`numpy.random` state.
+        """
         super(Gaussian_Process, self).__init__(*args, **kwargs)
 
         if kernel is None:
@@ -155,9 +187,26 @@ class Gaussian_Process(Audiogram_Model):
         self._kernel = kernel
         self._samples = [] # type: typing.List[types.psychophys.Sample]
         self._started_fitting = False
+        self._queue = [] # type: typing.List[typing.Tuple[float, float]]
+        """
+        Sounds selected by a batch acquisition function that haven't been presented yet.
+        The acquisition function is only asked for a new batch once these have all been presented.
+        """
+        self._rng = rng
+
+        if acquisition is None:
+            if self.exam_params is not None:
+                acquisition = get_acquisition(self.exam_params.acquisition)(
+                    batch_size=self.exam_params.acquisition_batch)
+            else:
+                acquisition = 'BALD'
+        if isinstance(acquisition, str):
+            acquisition = get_acquisition(acquisition)()
+        self.acquisition = acquisition # type: Acquisition
 
         self.model: IterativeGPC = IterativeGPC(
-            kernel=self.kernel, warm_start=True, n_restarts_optimizer=5, max_iter_predict=100
+            kernel=self.kernel, warm_start=True, n_restarts_optimizer=5, max_iter_predict=100,
+            random_state=None if rng is None else int(rng.integers(2**31))
         )
 
         self._plotted = False
@@ -195,6 +244,19 @@ class Gaussian_Process(Audiogram_Model):
         """
         return types.psychophys.Samples(self._samples)
 
+    @property
+    def log_likelihood(self) -> typing.Optional[float]:
+        """
+        Log marginal likelihood of the model as of the last fit, already computed
+        by :meth:`.IterativeGPC.fit` .
+
+        Returns:
+            float, or ``None`` if the model hasn't been fit
+        """
+        if len(self._samples) == 0:
+            return None
+        return float(self.model.log_marginal_likelihood_value_)
+
     def update(self, sample:types.psychophys.Sample):
         """
         Update the model with a new sample!
@@ -211,7 +273,8 @@ class Gaussian_Process(Audiogram_Model):
         df = self.samples.to_df()
 
         x = np.column_stack([df.frequency, df.amplitude])
-        self.model.fit(x, df.response)
+        with self.metrics.histogram('fit_ms').time():
+            self.model.fit(x, df.response)
 
     def _get_params(self) -> typing.Tuple[float, float]:
         """
@@ -221,13 +284,14 @@ class Gaussian_Process(Audiogram_Model):
             a tuple of freq, amp
         """
         if len(self._samples) < 10:
+            rng = self._rng if self._rng is not None else np.random
             if self.exam_params is not None:
                 # select from one of the possible sounds
-                freq = np.random.choice(self.exam_params.frequencies)
-                amp = np.random.choice(self.exam_params.amplitudes)
+                freq = rng.choice(self.exam_params.frequencies)
+                amp = rng.choice(self.exam_params.amplitudes)
             else:
-                freq = np.random.rand() * (self.freq_range[1] - self.freq_range[0]) + self.freq_range[0]
-                amp = np.random.rand() * (self.amplitude_range[1] - self.amplitude_range[0]) + self.amplitude_range[0]
+                freq = rng.random() * (self.freq_range[1] - self.freq_range[0]) + self.freq_range[0]
+                amp = rng.random() * (self.amplitude_range[1] - self.amplitude_range[0]) + self.amplitude_range[0]
         else:
             if self.exam_params is not None:
                 _xx, _yy = np.meshgrid(
@@ -238,14 +302,104 @@ class Gaussian_Process(Audiogram_Model):
             else:
                 _y = self._y
 
-            Z = self.model.predict_proba(_y)
-            Z = Z[:, 1]
-            uncertain = np.argmin(np.abs(0.5 - Z))
-            freq = _y[uncertain,0] # type: float
-            amp = _y[uncertain,1] # type: float
+            if len(self._queue) == 0:
+                exclude = None
+                if self._last_sound is not None and \
+                        (self.exam_params is None or not self.exam_params.allow_repeats):
+                    exclude = (_y[:,0] == self._last_sound.frequency) & \
+                              (_y[:,1] == self._last_sound.amplitude)
+                    if np.all(exclude):
+                        exclude = None
+
+                picks = self.acquisition.select(self.model, _y, exclude=exclude)
+                self._queue = [(_y[i,0], _y[i,1]) for i in picks]
+
+            freq, amp = self._queue.pop(0) # type: float, float
 
         return freq, amp
 
+    def thresholds(self,
+                   frequencies: typing.Iterable[float],
+                   resolution: float = 0.5) -> np.ndarray:
+        """
+        Estimate the threshold at each frequency as the amplitude where the predicted
+        probability of a response crosses 0.5, linearly interpolated between
+        points on an amplitude grid of ``resolution`` dbSPL spanning :attr:`.amplitude_range` .
+
+        Args:
+            frequencies (iterable): frequencies (Hz) to estimate thresholds for
+            resolution (float): spacing of the amplitude grid in dbSPL
+
+        Returns:
+            :class:`numpy.ndarray` of thresholds in dbSPL, ``nan`` where the
+            probability doesn't cross 0.5 within :attr:`.amplitude_range` or if the model
+            hasn't been fit yet.
+        """
+        frequencies = np.asarray(frequencies, dtype=float)
+        thresholds = np.full(frequencies.shape, np.nan)
+        if len(self._samples) == 0:
+            return thresholds
+
+        amps = np.arange(self.amplitude_range[0], self.amplitude_range[1] + resolution, resolution)
+        grid = np.column_stack((np.repeat(frequencies, len(amps)), np.tile(amps, len(frequencies))))
+        mean, var = self.model.predict_latent(grid)
+        p = predictive_probability(mean, var).reshape(len(frequencies), len(amps))
+
+        above = p >= 0.5
+        crosses = above.any(axis=1)
+        idx = np.argmax(above, axis=1)
+        # interpolate between the points on either side of the crossing
+        lo = np.clip(idx-1, 0, None)
+        rows = np.arange(len(frequencies))
+        p_lo, p_hi = p[rows, lo], p[rows, idx]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            frac = np.where(p_hi > p_lo, (0.5 - p_lo) / (p_hi - p_lo), 0)
+        thresholds[crosses] = (amps[lo] + frac * (amps[idx] - amps[lo]))[crosses]
+        return thresholds
+
+    def summarize(self,
+                  version: int = 0,
+                  resolution: int = 50) -> typing.Optional[types.psychophys.Posterior_Summary]:
+        """
+        Summarize the posterior as the probability of a response on a ``resolution`` x ``resolution`` grid
+        spanning the range of the exam's frequencies and amplitudes (or :attr:`.freq_range` and
+        :attr:`.amplitude_range` if there are no :attr:`.exam_params` ), and :meth:`.thresholds` at
+        the exam's frequencies.
+
+        Args:
+            version (int): Version number of the summary, see :attr:`.Posterior_Summary.version`
+            resolution (int): Number of points along each axis of the probability grid
+
+        Returns:
+            :class:`.types.psychophys.Posterior_Summary` , or ``None`` if the model hasn't been fit
+        """
+        if len(self._samples) == 0:
+            return None
+
+        if self.exam_params is not None:
+            freq_range = (min(self.exam_params.frequencies), max(self.exam_params.frequencies))
+            amp_range = (min(self.exam_params.amplitudes), max(self.exam_params.amplitudes))
+            threshold_frequencies = np.asarray(self.exam_params.frequencies, dtype=float)
+        else:
+            freq_range, amp_range = self.freq_range, self.amplitude_range
+            threshold_frequencies = np.unique([sample.sound.frequency for sample in self._samples])
+
+        frequencies = np.linspace(*freq_range, resolution)
+        amplitudes = np.linspace(*amp_range, resolution)
+        grid = np.column_stack((np.repeat(frequencies, len(amplitudes)), np.tile(amplitudes, len(frequencies))))
+        mean, var = self.model.predict_latent(grid)
+        probability = predictive_probability(mean, var).reshape(len(frequencies), len(amplitudes))
+
+        return types.psychophys.Posterior_Summary.from_arrays(
+            version=version,
+            n_samples=len(self._samples),
+            frequencies=frequencies,
+            amplitudes=amplitudes,
+            probability=probability,
+            threshold_frequencies=threshold_frequencies,
+            thresholds=self.thresholds(threshold_frequencies)
+        )
+
     def next(self) -> types.sound.Sound:
         """
         Generate parameters for the next sound to present
@@ -281,7 +435,11 @@ class Gaussian_Process(Audiogram_Model):
             Returns:
 
             """
-            if not PLOTTING:
+            # matplotlib is slow to import and only needed here
+            try:
+                import matplotlib.pyplot as plt
+                from matplotlib.cm import ScalarMappable
+            except ImportError:
                 warnings.warn('matplotlib was not found')
                 return
             xx, yy = np.meshgrid(
@@ -9,7 +9,21 @@ from perceptivo import types
 from perceptivo.root import Perceptivo_Object
 from perceptivo import types
 
-def piecewise_probabilistic(points:np.ndarray, scale:float=5) -> callable:
+NHANES_MEDIAN = np.array(
+    ((500 ,      10),
+    (1000,      10),
+    (2000,      10),
+    (3000,      10),
+    (4000,      15),
+    (6000,      20),
+    (8000,      20))
+)
+"""
+Median (frequency, threshold) values from the NHANES dataset used by :func:`.reference_audiogram`
+"""
+
+def piecewise_probabilistic(points:np.ndarray, scale:float=5,
+                            rng:typing.Optional[np.random.Generator]=None) -> callable:
     """
     Make a piecewise function along a series of (frequency, amplitude) points
     with some gaussian error
@@ -17,10 +31,15 @@ def piecewise_probabilistic(points:np.ndarray, scale:float=5) -> callable:
     Args:
         points (np.ndarray): n x 2 array of x/y (frequency, amplitude) coordinates that make up an audiogram
         scale (float): Scale parameter of noise in amplitude domain to get answers "wrong"
+        rng (:class:`numpy.random.Generator`): Random number generator for the noise,
+            if ``None`` use the global :mod:`numpy.random` state
 
     Returns:
 
     """
+    if rng is None:
+        rng = np.random
+
     # resort points based on first column
     order = np.argsort(points[:,0])
     points = points[order,:]
@@ -44,7 +63,7 @@ def piecewise_probabilistic(points:np.ndarray, scale:float=5) -> callable:
             y = sample.frequency*slope + intercept
 
         # add noise to the threshold to simulate error
-        y += np.random.normal(loc=0, scale=scale)
+        y += rng.normal(loc=0, scale=scale)
 
         if isinstance(y, np.ndarray) and y.shape  == (1,):
             y = y[0]
@@ -55,7 +74,7 @@ def piecewise_probabilistic(points:np.ndarray, scale:float=5) -> callable:
 
 
 
-def reference_audiogram(scale:float=2) -> callable:
+def reference_audiogram(scale:float=2, rng:typing.Optional[np.random.Generator]=None) -> callable:
     """
     Generate fake audiometry samples using median threshold values obtained from the NHANES dataset:
     https://wwwn.cdc.gov/Nchs/Nhanes/2015-2016/AUX_I.htm
@@ -76,6 +95,8 @@ def reference_audiogram(scale:float=2) -> callable:
 
     Args:
         scale (float): amount of randomness to multiply the noise of the pseudo-response threshold by
+        rng (:class:`numpy.random.Generator`): Random number generator for the noise,
+            see :func:`.piecewise_probabilistic`
 
     Returns:
         callable made by :func:`.piecewise_probabilistic` that works as an oracle function
@@ -85,17 +106,21 @@ def reference_audiogram(scale:float=2) -> callable:
     Returns:
         A numpy piecewise function that returns Sample objects for a given input frequency and amplitude
     """
-    points = np.array(
-        ((500 ,      10),
-        (1000,      10),
-        (2000,      10),
-        (3000,      10),
-        (4000,      15),
-        (6000,      20),
-        (8000,      20))
-    )
-
-    return piecewise_probabilistic(points, scale=scale)
+    return piecewise_probabilistic(NHANES_MEDIAN, scale=scale, rng=rng)
+
+
+def reference_thresholds(frequencies:typing.Iterable[float]) -> np.ndarray:
+    """
+    Noiseless thresholds of :func:`.reference_audiogram` at the given frequencies,
+    eg. to score the thresholds estimated by a model against.
+
+    Args:
+        frequencies (iterable): frequencies (Hz) to get thresholds for
+
+    Returns:
+        :class:`numpy.ndarray` of thresholds (dbSPL)
+    """
+    return np.interp(np.asarray(frequencies, dtype=float), NHANES_MEDIAN[:,0], NHANES_MEDIAN[:,1])
 
 
 def generate_samples(n_samples:int, scale:float=2, freqs=None, amplitudes=None, randomize=False, freq_range=(500,8000), amplitude_range=(0,50),
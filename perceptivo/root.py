@@ -4,16 +4,33 @@ Root Perceptivo Object from which others inherit
 """
 from logging import Logger
 from perceptivo.data.logging import init_logger
+from perceptivo.data.metrics import get_registry, Metrics_Scope
 from abc import ABC
 
 
 
 class Perceptivo_Object(ABC):
+    _rate_limit_logs = False
+    """
+    If ``True`` , limit the rate of debug messages from :attr:`.logger` , for objects that log
+    in hot paths, see :class:`.data.logging.Rate_Limit_Filter`
+    """
+
     @property
     def logger(self) -> Logger:
         if not hasattr(self, '_logger') or self._logger is None:
-            self._logger = init_logger(self)
+            self._logger = init_logger(self, rate_limit=self._rate_limit_logs)
 
         return self._logger
 
+    @property
+    def metrics(self) -> Metrics_Scope:
+        """
+        Metrics named after this object's class, eg. ``self.metrics.counter('frames')`` in a
+        :class:`.Picamera_Process` is ``picamera_process.frames`` , see :mod:`.data.metrics`
+
+        Get metrics once rather than every time they're used in hot paths.
+        """
+        return get_registry().scope(type(self).__name__.lower())
+
 
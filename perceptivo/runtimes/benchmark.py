@@ -0,0 +1,369 @@
+"""
+Headless end-to-end benchmark of the :class:`.runtimes.patient.Patient` runtime.
+
+Boots a :class:`.Patient` with a fake camera (see :mod:`.video.sources` ), a :class:`.sound.latency.Dummy_Speaker` ,
+and an oracle (see :mod:`.psychophys.oracle` ) to respond to sounds, connected to a :class:`.Clinician_Standin`
+on localhost that starts an exam and receives its data, and reports
+
+* trials per minute, measured between ``DATA`` messages received by the stand-in
+* the time spent in each phase of each trial (see :attr:`.Patient.trial_timings` ) and the
+  overhead of each trial beyond its :attr:`.Collection_Params.collection_wait`
+* how much of each frame period pupil extraction uses
+* CPU utilization and peak RSS of the patient and picamera processes (Linux only)
+
+Run from the command line (results are printed as JSON, or written to ``--output`` )::
+
+    patient-benchmark --trials 50 --collection-wait 1 --output results.json
+
+Compare pupil extractors (see :class:`.video.pupil.Pupil_Extractors` ) with ``--extractor`` , eg. ``--extractor starburst`` .
+
+or from python with :func:`.benchmark_patient` .
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import typing
+from pathlib import Path
+from time import perf_counter, sleep
+from datetime import datetime
+
+import numpy as np
+import zmq
+
+from perceptivo.clock import now_ns, NS_PER_S
+from perceptivo.root import Perceptivo_Object
+from perceptivo.networking.node import Node
+from perceptivo.networking.messages import Message
+from perceptivo.types.networking import Socket, Patient_Networking
+from perceptivo.types.exam import Exam_Params, Completion_Metric
+from perceptivo.types.patient import Collection_Params
+from perceptivo.types.sound import Audio_Config
+from perceptivo.types.video import Picamera_Params, CAMERA_SOURCES
+from perceptivo.video.pupil import Pupil_Extractors, get_extractor
+
+PHASES = ('model.next', 'sound.render', 'play', 'collect', 'extract', 'analyze',
+          'model.update', 'summarize', 'serialize', 'send')
+"""Phases of each trial that are timed, in order, see :attr:`.Patient.trial_timings`"""
+
+
+class Clinician_Standin(Perceptivo_Object):
+    """
+    Stands in for the clinician's GUI: receives the patient's control messages and streamed frames,
+    starts exams, and records when ``DATA`` messages arrive.
+
+    Args:
+        control (:class:`.types.networking.Socket`): ``ROUTER`` socket the patient connects to
+        eyecam (:class:`.types.networking.Socket`): ``PULL`` socket the patient streams frames to
+    """
+
+    def __init__(self, control: Socket, eyecam: Socket, **kwargs):
+        super(Clinician_Standin, self).__init__(**kwargs)
+        self.control_socket = control
+        self.eyecam_socket = eyecam
+
+        self.connected = threading.Event()
+        self.complete = threading.Event()
+        self.patient = None # type: typing.Optional[str]
+        self.data_received = [] # type: typing.List[int]
+        """Monotonic ns that each ``DATA`` message was received"""
+        self.deliver_ms = [] # type: typing.List[float]
+        """ms from when each ``DATA`` message was created to when it was received"""
+        self.n_frames = 0
+        """Number of streamed frames received"""
+        self.status = None # type: typing.Optional[dict]
+
+        self.node = None # type: typing.Optional[Node]
+        self._stopping = threading.Event()
+        self._stream_thread = None # type: typing.Optional[threading.Thread]
+
+    def start(self):
+        self.node = Node(self.control_socket, poll_mode=Node.Poll_Mode.IOLOOP, callback=self._handle)
+        self._stream_thread = threading.Thread(target=self._drain_stream, daemon=True)
+        self._stream_thread.start()
+
+    def _handle(self, msg: Message):
+        if msg.key == 'CONNECT':
+            self.patient = msg.value['id']
+            self.connected.set()
+        elif msg.key == 'DATA':
+            self.data_received.append(msg.received if msg.received is not None else now_ns())
+            self.deliver_ms.append((datetime.now() - msg.timestamp).total_seconds() * 1000)
+        elif msg.key == 'COMPLETE':
+            self.status = msg.value.get('status', None)
+            self.complete.set()
+
+    def _drain_stream(self):
+        node = Node(self.eyecam_socket, poll_mode=Node.Poll_Mode.NONE)
+        try:
+            while not self._stopping.is_set():
+                if node.socket.poll(100):
+                    while True:
+                        try:
+                            node.socket.recv(flags=zmq.NOBLOCK)
+                        except zmq.Again:
+                            break
+                        self.n_frames += 1
+        finally:
+            node.release()
+
+    def start_exam(self, params: Exam_Params):
+        self.complete.clear()
+        self.node.send(Message(key='START', params=params), to=self.patient)
+
+    def stop_exam(self):
+        self.node.send(Message(key='STOP'), to=self.patient)
+
+    def release(self):
+        self._stopping.set()
+        if self._stream_thread is not None:
+            self._stream_thread.join(5)
+        if self.node is not None:
+            self.node.release()
+
+
+def process_usage(pid: int) -> typing.Dict[str, typing.Optional[float]]:
+    """
+    CPU time and peak resident memory of a process, read from ``/proc`` (Linux only)
+
+    Args:
+        pid (int): Process ID
+
+    Returns:
+        dict with ``cpu_s`` , user + system CPU seconds, and ``peak_rss_mb`` , or ``None`` s if they can't be read
+    """
+    usage = {'cpu_s': None, 'peak_rss_mb': None}
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            # the command name can contain spaces, so split after it.
+            # utime and stime are the 14th and 15th fields
+            fields = f.read().rsplit(')', 1)[1].split()
+        usage['cpu_s'] = (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    usage['peak_rss_mb'] = int(line.split()[1]) / 1024
+                    break
+    except (OSError, IndexError, ValueError):
+        pass
+    return usage
+
+
+def _summarize(values: typing.Sequence[float]) -> typing.Dict[str, typing.Optional[float]]:
+    if len(values) == 0:
+        return {'n': 0, 'mean': None, 'median': None, 'p95': None, 'max': None}
+    values = np.asarray(values, dtype=float)
+    return {
+        'n': len(values),
+        'mean': float(np.mean(values)),
+        'median': float(np.median(values)),
+        'p95': float(np.percentile(values, 95)),
+        'max': float(np.max(values))
+    }
+
+
+def _sockets(control_port: int, eyecam_port: int) -> typing.Tuple[Patient_Networking, Socket, Socket]:
+    networking = Patient_Networking(
+        ip='127.0.0.1',
+        clinician_ip='127.0.0.1',
+        eyecam=Socket(id='patient:eyecam', socket_type='PUSH', protocol='tcp', mode='connect',
+                      port=eyecam_port, ip='127.0.0.1'),
+        control=Socket(id='patient:control', socket_type='DEALER', protocol='tcp', mode='connect',
+                       port=control_port, ip='127.0.0.1', to='clinician:control')
+    )
+    control = Socket(id='clinician:control', socket_type='ROUTER', protocol='tcp', mode='bind', port=control_port)
+    eyecam = Socket(id='clinician:eyecam', socket_type='PULL', protocol='tcp', mode='bind', port=eyecam_port)
+    return networking, control, eyecam
+
+
+def benchmark_patient(n_trials: int = 20,
+                      collection_wait: float = 1,
+                      source: CAMERA_SOURCES = 'synthetic',
+                      source_file: typing.Optional[Path] = None,
+                      resolution: typing.Tuple[int, int] = (640, 480),
+                      fps: int = 30,
+                      extractor: str = 'simple',
+                      frequencies: typing.Tuple[float, ...] = (500, 1000, 2000, 4000, 8000),
+                      amplitudes: typing.Tuple[float, ...] = (0, 10, 20, 30, 40, 50),
+                      control_port: int = 5650,
+                      eyecam_port: int = 5550,
+                      timeout: typing.Optional[float] = None,
+                      directory: typing.Optional[Path] = None) -> dict:
+    """
+    Run an exam of ``n_trials`` with a headless :class:`.Patient` and a :class:`.Clinician_Standin`
+
+    Args:
+        n_trials (int): Number of trials to run
+        collection_wait (float): Seconds to collect frames after each sound, see :class:`.Collection_Params`
+        source (str): Camera source, see :attr:`.Picamera_Params.source` . ``'picamera'`` works too, on a Pi.
+        source_file (:class:`pathlib.Path`): File for ``'file'`` and ``'memmap'`` sources
+        resolution (tuple): Frame resolution (width, height)
+        fps (int): Frame rate of the camera source
+        extractor (str): Pupil extractor to compare, one of :class:`.video.pupil.Pupil_Extractors`
+        frequencies (tuple): Frequencies to test
+        amplitudes (tuple): Amplitudes to test
+        control_port (int): Port for the control sockets on localhost
+        eyecam_port (int): Port for the frame stream on localhost
+        timeout (float): Seconds to wait for the exam to finish, default
+            twice the time the trials should take plus a minute
+        directory (:class:`pathlib.Path`): Directory for the patient's prefs file, default a temporary directory
+
+    Returns:
+        dict of results, see module docstring
+    """
+    from perceptivo.runtimes.patient import Patient
+    from perceptivo.sound.latency import Dummy_Speaker
+    from perceptivo.psychophys.oracle import reference_audiogram
+
+    if directory is None:
+        directory = Path(tempfile.mkdtemp(prefix='perceptivo-benchmark-'))
+    if timeout is None:
+        timeout = n_trials * collection_wait * 2 + 60
+
+    networking, control, eyecam = _sockets(control_port, eyecam_port)
+    picamera_params = Picamera_Params(source=source, source_file=source_file, resolution=resolution, fps=fps)
+
+    standin = Clinician_Standin(control, eyecam)
+    standin.start()
+    patient = None
+    try:
+        patient = Patient(
+            audio_config=Audio_Config(),
+            picamera_params=picamera_params,
+            oracle=reference_audiogram(),
+            collection_params=Collection_Params(collection_wait=collection_wait),
+            pupil_extractor=extractor,
+            pupil_extractor_params=get_extractor(extractor).params_type(),
+            networking=networking,
+            speaker=Dummy_Speaker(),
+            prefs_file=directory / 'prefs.json'
+        )
+        if not standin.connected.wait(10):
+            raise TimeoutError('Patient did not connect to the clinician stand-in')
+
+        params = Exam_Params(
+            frequencies=frequencies,
+            amplitudes=amplitudes,
+            iti=0,
+            iti_jitter=0,
+            completion_metric=Completion_Metric(n_trials=n_trials, log_likelihood=None)
+        )
+
+        pids = {'patient': os.getpid(), 'picamera': patient.picam.pid}
+        usage_start = {name: process_usage(pid) for name, pid in pids.items()}
+        start = perf_counter()
+        standin.start_exam(params)
+        finished = standin.complete.wait(timeout)
+        elapsed = perf_counter() - start
+        usage_end = {name: process_usage(pid) for name, pid in pids.items()}
+        if not finished:
+            standin.stop_exam()
+            patient.logger.warning(f'Benchmark exam did not finish within {timeout}s')
+        # let the last DATA messages arrive
+        sleep(0.1)
+
+        timings = list(patient.trial_timings)
+    finally:
+        if patient is not None:
+            patient.release()
+        standin.release()
+
+    processes = {}
+    for name in pids:
+        cpu_start, cpu_end = usage_start[name]['cpu_s'], usage_end[name]['cpu_s']
+        processes[name] = {
+            'pid': pids[name],
+            'cpu_percent': (cpu_end - cpu_start) / elapsed * 100 if None not in (cpu_start, cpu_end) else None,
+            'peak_rss_mb': usage_end[name]['peak_rss_mb']
+        }
+
+    received = np.asarray(standin.data_received, dtype=np.int64)
+    trials_per_minute = None
+    if len(received) > 1:
+        trials_per_minute = (len(received) - 1) / ((received[-1] - received[0]) / NS_PER_S) * 60
+
+    n_frames = [t.get('n_frames', 0) for t in timings]
+    n_blinks = [t.get('n_blinks', 0) for t in timings]
+    # gated frames are timed in the extract phase too
+    extract_per_frame = [
+        t['extract'] / (t.get('n_frames', 0) + t.get('n_blinks', 0)) for t in timings
+        if t.get('n_frames', 0) + t.get('n_blinks', 0) > 0 and 'extract' in t
+    ]
+    overhead = [
+        t['trial'] + sum(t.get(phase, 0) for phase in ('summarize', 'serialize', 'send')) - collection_wait * 1000
+        for t in timings
+    ]
+
+    return {
+        'config': {
+            'n_trials': n_trials,
+            'collection_wait': collection_wait,
+            'source': source,
+            'resolution': list(resolution),
+            'fps': fps,
+            'extractor': extractor,
+            'n_cpus': os.cpu_count(),
+            'python': sys.version.split()[0]
+        },
+        'completed': finished,
+        'n_trials': len(timings),
+        'elapsed_s': elapsed,
+        'trials_per_minute': trials_per_minute,
+        'phases_ms': {phase: _summarize([t[phase] for t in timings if phase in t]) for phase in PHASES},
+        'trial_ms': _summarize([t['trial'] for t in timings]),
+        'overhead_ms': _summarize(overhead),
+        'frames': {
+            'per_trial': _summarize(n_frames),
+            'blinks_per_trial': _summarize(n_blinks),
+            'extract_ms_per_frame': _summarize(extract_per_frame),
+            'extract_budget_used': float(np.mean(extract_per_frame)) * fps / 1000 if len(extract_per_frame) > 0 else None,
+            'streamed_fps': standin.n_frames / elapsed
+        },
+        'deliver_ms': _summarize(standin.deliver_ms),
+        'processes': processes,
+        'trials': timings
+    }
+
+
+def benchmark_parser(manual_args: typing.Optional[typing.List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser('Perceptivo Patient Benchmark')
+    parser.add_argument('-n', '--trials', type=int, default=20, help='Number of trials to run')
+    parser.add_argument('-w', '--collection-wait', type=float, default=1,
+                        help='Seconds to collect frames after each sound')
+    parser.add_argument('--source', default='synthetic', choices=CAMERA_SOURCES.__args__,
+                        help='Camera source')
+    parser.add_argument('--source-file', type=Path, default=None,
+                        help='Video or .npy file for the file and memmap sources')
+    parser.add_argument('--resolution', type=int, nargs=2, default=(640, 480), metavar=('WIDTH', 'HEIGHT'))
+    parser.add_argument('--fps', type=int, default=30)
+    parser.add_argument('--extractor', default='simple', choices=list(Pupil_Extractors.__members__),
+                        help='Pupil extractor to use')
+    parser.add_argument('--port', type=int, default=5650, help='Port for the control sockets on localhost')
+    parser.add_argument('--eyecam-port', type=int, default=5550, help='Port for the frame stream on localhost')
+    parser.add_argument('-o', '--output', type=Path, default=None,
+                        help='File to write JSON results to, otherwise they are printed')
+    if manual_args is None:
+        return parser.parse_args()
+    return parser.parse_args(manual_args)
+
+
+def main():
+    args = benchmark_parser()
+    results = benchmark_patient(
+        n_trials=args.trials,
+        collection_wait=args.collection_wait,
+        source=args.source,
+        source_file=args.source_file,
+        resolution=tuple(args.resolution),
+        fps=args.fps,
+        extractor=args.extractor,
+        control_port=args.port,
+        eyecam_port=args.eyecam_port
+    )
+    output = json.dumps(results, indent=2)
+    if args.output is not None:
+        args.output.write_text(output)
+    else:
+        print(output)
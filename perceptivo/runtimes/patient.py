@@ -4,10 +4,11 @@ entrypoint for patient interface
 import sys
 import typing
 from typing import Optional, List
-from time import sleep
+from time import sleep, perf_counter_ns
 from pathlib import Path
 import threading
-from datetime import datetime, timedelta
+from collections import deque
+from contextlib import contextmanager
 from queue import Empty
 import numpy as np
 import argparse
@@ -16,18 +17,27 @@ import soundcard as sc
 
 from perceptivo.prefs import Patient_Prefs
 from perceptivo import Directories
+from perceptivo.clock import now_ns, NS_PER_S, get_anchor
 from perceptivo.runtimes.runtime import Runtime, base_args
+# import sounds before the server so autopilot's sound classes are created with the dummy audio server
+from perceptivo.sound.sounds import Table
+from perceptivo.sound.bank import Sound_Bank
+from perceptivo.sound.soundcard import Playback_Scheduler
 from perceptivo.sound import server
 from perceptivo.video.cameras import Picamera_Process
-from perceptivo.video.pupil import Pupil_Extractors, EllipseExtractor_Params, get_extractor
+from perceptivo.video.pupil import Pupil_Extractors, EllipseExtractor_Params, Starburst_Params, Blink_Gate, get_extractor
 from perceptivo.psychophys import model
+from perceptivo.psychophys.controller import Exam_Controller
+from perceptivo.psychophys.calibration import Pupil_Calibration
+from perceptivo.psychophys.dilation import Dilation_Analyzer
 from perceptivo.networking.node import Node
 from perceptivo.networking.messages import Message
+from perceptivo.data.metrics import get_registry, Metrics_Server
 
 from perceptivo.types.sound import Jackd_Config, Audio_Config, Sound
 from perceptivo.types.psychophys import Sample, Samples, Psychoacoustic_Model, Kernel
-from perceptivo.types.video import Picamera_Params, Frame
-from perceptivo.types.pupil import Pupil, Pupil_Params, Dilation
+from perceptivo.types.video import Picamera_Params, Frame, Raw_Frame
+from perceptivo.types.pupil import Pupil, Raw_Pupil, Pupil_Params, Dilation
 from perceptivo.types.patient import Collection_Params
 from perceptivo.types.networking import Patient_Networking, Socket
 from perceptivo.types.gui import GUI_Control
@@ -52,7 +62,8 @@ class Patient(Runtime):
     a ``prefs.json`` file (located at :attr:`perceptivo.prefs.Directories.prefs_file` ).
 
     The basic operation of the Patient runtime is encapsulated in the :meth:`.trial` method,
-    see that for further documentation.
+    see that for further documentation. The time spent in each phase of each trial is
+    kept in :attr:`.trial_timings` , see :func:`.runtimes.benchmark.benchmark_patient` .
 
 
     Args:
@@ -62,9 +73,14 @@ class Patient(Runtime):
         oracle (callable): Optional, if present use an oracle to generate responses to stimuli rather than
             getting them from the pupil extraction method. Mostly for testing, takes a function
             that accepts a :class:`~.types.sound.Sound` object and returns a boolean response,
-            typically generated by functions in :mod:`~.psychophys.oracle` like :func:`~.psychophys.oracle.reference_audiogram`
+            typically generated by functions in :mod:`~.psychophys.oracle` like :func:`~.psychophys.oracle.reference_audiogram` .
+            Frames are still collected and pupils extracted.
+        collection_params (:class:`~.types.patient.Collection_Params`): How to collect frames after each sound
+        speaker (:class:`soundcard.pulseaudio._Speaker`): Speaker to play sounds with when not using jack,
+            default :func:`soundcard.default_speaker` . Eg. a :class:`.sound.latency.Dummy_Speaker` to run without a soundcard.
     """
     prefs_class = Patient_Prefs
+    _rate_limit_logs = True
 
     def __init__(self,
                  audio_config: Audio_Config = Audio_Config(),
@@ -72,8 +88,10 @@ class Patient(Runtime):
                  picamera_params: Optional[Picamera_Params] = None,
                  oracle: typing.Optional[callable]=None,
                  pupil_extractor: typing.Optional[Pupil_Extractors] = None,
-                 pupil_extractor_params: typing.Optional[EllipseExtractor_Params] = None,
+                 pupil_extractor_params: typing.Union[EllipseExtractor_Params, Starburst_Params, None] = None,
                  networking: typing.Optional[Patient_Networking] = None,
+                 collection_params: typing.Optional[Collection_Params] = None,
+                 speaker: typing.Optional['sc._Speaker'] = None,
                  prefs_file: Path = Directories.prefs_file,
                  **kwargs):
 
@@ -112,7 +130,22 @@ class Patient(Runtime):
         else:
             self.networking_prefs = networking
 
+        if collection_params is None:
+            self.collection_params = self.prefs.collection_params
+        else:
+            self.collection_params = collection_params
+
+        self.calibration = Pupil_Calibration.from_params(self.collection_params)
+        """Estimates the patient's response threshold from their pupil noise over trials, see :meth:`._update_pupil_params`"""
+        self.analyzer = Dilation_Analyzer(
+            self.collection_params.analysis,
+            baseline=self.collection_params.baseline,
+            duration=self.collection_params.collection_wait
+        )
+        """Removes blinks from and filters each trial's pupil diameters, and measures the response, see :meth:`.await_response`"""
+
         self.oracle = oracle
+        self.speaker = speaker
 
         # --------------------------------------------------
         # Private Attrs
@@ -120,10 +153,12 @@ class Patient(Runtime):
         self._collecting = threading.Event()
         """Event that is set while the picam is collecting frames & they are being processed"""
         self._collecting_thread = None # type: typing.Optional[threading.Thread]
-        self._frames = [] # type: typing.List[Frame]
+        self._frames = [] # type: typing.List[Raw_Frame]
         """Frames for the current sample"""
-        self._pupils = [] # type: typing.List[Pupil]
+        self._pupils = [] # type: typing.List[Raw_Pupil]
         """Pupils for the current sample!"""
+        self._blinks = [] # type: typing.List[int]
+        """Timestamps of frames in the current sample that were skipped by the extractor's :class:`.Blink_Gate`"""
         self._trial_active = threading.Event()
         """Event that's set while a trial is running!"""
         self._exam_params = None # type: typing.Optional[Exam_Params]
@@ -132,6 +167,19 @@ class Patient(Runtime):
         """
         Event that's set while an exam is running
         """
+        self._exam_thread = None # type: typing.Optional[threading.Thread]
+        self.controller = None # type: typing.Optional[Exam_Controller]
+        """Checks whether the current exam is complete, see :meth:`.run_exam`"""
+        self.trial_timings = deque(maxlen=1000) # type: typing.Deque[typing.Dict[str, float]]
+        """
+        Time (ms) spent in each phase of recent trials, see :meth:`._phase` . Phases are
+        ``model.next`` , ``sound.render`` , ``play`` , ``collect`` (waiting for frames, including extracting pupils from them),
+        ``extract`` , ``analyze`` , ``model.update`` , ``summarize`` , ``serialize`` , and ``send`` , along with the
+        whole ``trial`` , the number of frames with pupils collected, ``n_frames`` , and the number of frames
+        skipped as blinks, ``n_blinks`` .
+        """
+        self._timing = {} # type: typing.Dict[str, float]
+        self._phase_metrics = self.metrics
 
         # --------------------------------------------------
         # Networking callbacks
@@ -147,17 +195,35 @@ class Patient(Runtime):
         # Init Hardware/resources
         # --------------------------------------------------
 
+        # anchor the monotonic clock before starting any processes so they share it
+        self.clock_anchor = get_anchor()
+        self.logger.info(f'Clock anchor: {self.clock_anchor}')
+
         self.samples = Samples() # type: Samples
 
-        self.server = self._init_audio() # type: typing.Union[server.jackclient.JackClient, sc.pulseaudio._Speaker]
+        self.server = self._init_audio() # type: typing.Union[server.jackclient.JackClient, Playback_Scheduler]
+        self.sound_bank = Sound_Bank(
+            fs=self.audio_config.fs,
+            max_bytes=self.prefs.sound_bank_bytes,
+            n_workers=self.prefs.sound_bank_workers
+        )
         self.model = self._init_model(self.audiogram_model) # type: model.Audiogram_Model
         self.picam = self._init_picam(self.picamera_params, self.networking_prefs.eyecam)
         self.pupil_extractor = self._init_pupil_extractor(self.pupil_extractor, self.pupil_extractor_params)
-        self.node = self._init_networking(self.prefs.networking.control)
+        self.node = self._init_networking(self.networking_prefs.control)
         self.picam.start()
         self.quitting = threading.Event()
         self.quitting.clear()
 
+        self.metrics_server = None # type: typing.Optional[Metrics_Server]
+        if self.prefs.metrics_port is not None:
+            self.metrics_server = Metrics_Server(port=self.prefs.metrics_port)
+            self.metrics_server.start()
+        self._metrics_thread = None # type: typing.Optional[threading.Thread]
+        if self.prefs.metrics_interval is not None:
+            self._metrics_thread = threading.Thread(target=self._send_metrics_loop, daemon=True)
+            self._metrics_thread.start()
+
 
 
 
@@ -172,14 +238,17 @@ class Patient(Runtime):
           output of the :meth:`.Audiogram_Model.next` method
         * :meth:`.probe` to deliver the sound and collect the response. Within the probe method:
 
-            * the :attr:`.Picamera_Process.collecting` flag is set to indicate that it should dump frames into its queue
+            * the :attr:`.Picamera_Process.collecting` flag is set to indicate that it should dump frames into its queue,
+              starting with the :attr:`.Collection_Params.baseline` seconds of frames from before the sound
             * the sound is played with :meth:`.play_sound`
             * the :meth:`.await_response` method spawns a :attr:`._collecting_thread`, which calls
               :meth:`._collect_frames` to pull frames from :attr:`.Picamera_Process.q` and process them with
               :attr:`.pupil_extractor` until the queue is empty. :class:`.types.video.Frame` s and
               :class:`.types.pupil.Pupil` s are appended to the :attr:`._frames` and :attr:`._pupils` collectors
-            * once the thread finishes, the picamera's collection event is cleared, and the :class:`.types.pupil.Pupil_Params`, which set the threshold of dilation that
-              constitutes a positive response to the sound is updated with :meth:`._update_pupil_params`
+            * once the thread finishes, the picamera's collection event is cleared, the pupil diameters are cleaned,
+              filtered, and measured by the :attr:`.analyzer` , and the :class:`.types.pupil.Pupil_Params`, which set the threshold of dilation that
+              constitutes a positive response to the sound is updated with :meth:`._update_pupil_params` , using
+              the pupils from before the sound as a baseline
             * The :class:`~.types.pupil.Pupil_Params`, :class:`~.types.sound.Sound`, and list of
               :class:`~.types.pupil.Pupil` objects are collected into a :class:`~.types.pupil.Dilation` object and returned
 
@@ -201,10 +270,14 @@ class Patient(Runtime):
         # clear trialwise collectors
         self._frames = []
         self._pupils = []
+        self._blinks = []
+        self._timing = {}
+        start = perf_counter_ns()
 
         self._trial_active.set()
 
-        sound = self.next_sound()
+        with self._phase('model.next'):
+            sound = self.next_sound()
         self.logger.debug('got next sound')
 
         sample = self.probe(sound)
@@ -212,12 +285,33 @@ class Patient(Runtime):
 
         if sample is not None:
             self.samples.append(sample)
-            self.model.update(sample)
-            self.logger.debug(f'Sample collected - {sample}')
-
+            with self._phase('model.update'):
+                self.model.update(sample)
+            self.logger.debug('Sample collected - %s', sample)
+
+        self._timing['trial'] = (perf_counter_ns() - start) / 1e6
+        self._timing['n_frames'] = len(self._pupils)
+        self._timing['n_blinks'] = len(self._blinks)
+        self.trial_timings.append(self._timing)
         self._trial_active.clear()
         return sample
 
+    @contextmanager
+    def _phase(self, name: str):
+        """
+        Time a phase of the current trial, adding it to the trial's :attr:`.trial_timings`
+        and the ``patient.{name}_ms`` histogram in the :mod:`.data.metrics` registry.
+
+        Phases that happen several times in a trial (eg. ``extract`` ) are summed.
+        """
+        start = perf_counter_ns()
+        try:
+            yield
+        finally:
+            elapsed = (perf_counter_ns() - start) / 1e6
+            self._timing[name] = self._timing.get(name, 0) + elapsed
+            self._phase_metrics.histogram(f'{name}_ms').observe(elapsed)
+
     def next_sound(self) -> Sound:
         """
         Generate the next sound using the psychoacoustic :attr:`.model`
@@ -248,8 +342,12 @@ class Patient(Runtime):
 
         sound = self.play_sound(sound)
         self.logger.debug(f'played sound {sound}, awaiting response')
-        dilation = self.await_response(sound)
-        if dilation is None:
+        with self._phase('collect'):
+            dilation = self.await_response(sound)
+
+        if self.oracle is not None:
+            return Sample(dilation=dilation, sound=sound, response=bool(self.oracle(sound)))
+        elif dilation is None:
             return None
         else:
             self.logger.debug(f'got dilation {dilation} for sound {sound}')
@@ -259,30 +357,36 @@ class Patient(Runtime):
         """
         Play a parameterized sound
 
+        The sound's table is taken from the :attr:`.sound_bank` (pre-rendered when the
+        exam starts in :meth:`.run_exam` ), so nothing is synthesized between choosing
+        the sound and stamping its time.
+
+        The sound is stamped with its onset rather than the time it was handed to the audio backend:
+
+        * jack - after the sound is buffered, plus the latency of jackd's buffer (:attr:`.Jackd_Config.latency` )
+        * soundcard - with the latency reported by the output stream when the table is written,
+          see :class:`.sound.soundcard.Playback_Scheduler`
+
+        Neither blocks for the duration of the sound, so frame collection in :meth:`.await_response`
+        starts at the sound's onset.
+
         Args:
             sound ():
 
         Returns:
             :class:`~.types.sound.Sound`
         """
-        # hydrate the sound, clean the kwargs
-        sound_kwargs = sound.sound_kwargs
-        # autopilot uses ms not seconds
-        if sound_kwargs['duration'] < 25:
-            sound_kwargs['duration'] *= 1000
-        if not isinstance(self.audio_config, Jackd_Config):
-            del sound_kwargs['jack_client']
-            sound_kwargs['fs'] = self.audio_config.fs
-
-        # instantiate sound from autopilot Gammatone class
-        _sound = sound.sound_class(**sound_kwargs)
+        with self._phase('sound.render'):
+            table = self.sound_bank.get(sound)
 
         # stamp time and play sound depending on method implied by audio_config
-        sound.stamp_time()
-        if isinstance(self.audio_config, Jackd_Config):
-            _sound.play()
-        else:
-            self.server.play(_sound.table, samplerate=self.audio_config.fs)
+        with self._phase('play'):
+            if isinstance(self.audio_config, Jackd_Config):
+                _sound = Table(table, jack_client=self.server)
+                _sound.play()
+                sound.stamp_time(self.audio_config.latency)
+            else:
+                self.server.play(table, sound)
         return sound
 
     def await_response(self, sound:Sound) -> typing.Union[Dilation, None]:
@@ -290,46 +394,69 @@ class Patient(Runtime):
         Wait until we are given a pupil from the picamera process
 
         Returns:
-            bool
+            :class:`.types.pupil.Dilation` , or ``None`` if no pupils were detected or the
+            :attr:`.analyzer` couldn't measure them, eg. because of a long blink
         """
-        if self.oracle is not None:
-            return self.oracle(sound)
-        else:
-            self._collecting.clear()
-            self._collecting_thread = threading.Thread(
-                target = self._collect_frames,
-                args= (sound.timestamp,)
-            )
-            self._collecting_thread.start()
-            self._collecting.wait()
+        self._collecting.clear()
+        self._collecting_thread = threading.Thread(
+            target = self._collect_frames,
+            args= (sound.timestamp,)
+        )
+        self._collecting_thread.start()
+        self._collecting.wait()
 
-            if len(self._pupils) == 0:
-                self.logger.warning('No pupil detected! check collection parameters')
-                return None
+        if len(self._pupils) == 0:
+            self.logger.warning('No pupil detected! check collection parameters')
+            return None
 
-            # update the pupil_params from collected samples
-            pupil_params = self._update_pupil_params(self._pupils)
-            # collect pupils and frames into a Dilation
-            dilation = Dilation(
-                params=pupil_params,
-                pupils = self._pupils.copy(),
-                timestamps = [t.timestamp for t in self._frames]
+        with self._phase('analyze'):
+            features = self.analyzer.analyze(
+                np.array([pupil.frame.timestamp for pupil in self._pupils], dtype=np.int64),
+                np.array([pupil.ellipse.a for pupil in self._pupils], dtype=float),
+                sound.timestamp,
+                blinks=np.array(self._blinks, dtype=np.int64)
             )
-            return dilation
+            if not features.valid:
+                self.logger.warning(
+                    f'Could not measure pupil response, discarded {features.blink_fraction*100:.0f}% of '
+                    f'diameters as blinks, longest gap {features.max_gap}s'
+                )
+                return None
+
+            # update the pupil_params from the filtered diameters
+            pupil_params = self._update_pupil_params(self.analyzer.trace, self.analyzer.times(sound.timestamp), sound.timestamp)
+
+        # collect pupils and frames into a Dilation
+        dilation = Dilation(
+            params=pupil_params,
+            pupils = [pupil.to_pupil() for pupil in self._pupils],
+            timestamps = [t.timestamp for t in self._frames],
+            onset = sound.timestamp,
+            features = features,
+            blinks = list(self._blinks)
+        )
+        return dilation
 
 
-    def _collect_frames(self, start_time:datetime):
+    def _collect_frames(self, start_time:int):
         """
         Collect frames from the picamera for one sample
+
+        Args:
+            start_time (int): Onset of the sound in monotonic ns, see :mod:`perceptivo.clock`
         """
         self._pupils = []
-        self._frame = []
-        end_time = start_time + timedelta(seconds=self._exam_params.collection_wait)
+        self._frames = []
+        self._blinks = []
+        # the patient may have moved since the last trial, look for their pupil in the whole frame
+        if self.pupil_extractor.gate is not None:
+            self.pupil_extractor.gate.reset()
+        end_time = start_time + round(self.collection_params.collection_wait * NS_PER_S)
         finished = False
         passed_wait_time = False
         try:
             while not finished:
-                if datetime.now() > end_time:
+                if now_ns() > end_time:
                     passed_wait_time = True
                     self.picam.collecting.clear()
 
@@ -345,30 +472,62 @@ class Patient(Runtime):
                         continue
 
                 # process frame
-                pupil = self.pupil_extractor.process(frame)
-                if pupil is None:
+                with self._phase('extract'):
+                    pupil = self.pupil_extractor.process(frame)
+                if pupil is None and self.pupil_extractor.gated:
+                    self._blinks.append(frame.timestamp)
+                elif pupil is None:
                     self.logger.debug('No pupil detected')
                 else:
                     self._frames.append(frame)
                     self._pupils.append(pupil)
-                    self.logger.debug(f'processed {len(self._pupils)} frames')
+                    self.logger.debug('processed %d frames', len(self._pupils))
 
         except Exception as e:
-            self.logger.exception(f'Got exception processing frames, {e}')
+            self.logger.exception('Got exception processing frames, %s', e)
 
         finally:
             self.logger.debug('Setting collection finished flag')
             self._collecting.set()
 
 
+    def send_metrics(self):
+        """
+        Send a ``METRICS`` message to the clinician with the metrics from this process and
+        the :class:`.Picamera_Process` , see :meth:`.data.metrics.Metrics_Registry.snapshot`
+        """
+        self.node.send(Message(key='METRICS', metrics=get_registry().snapshot()), to='clinician:control')
+
+    def _send_metrics_loop(self):
+        while not self.quitting.wait(self.prefs.metrics_interval):
+            try:
+                self.send_metrics()
+            except Exception as e:
+                self.logger.exception(f'Could not send metrics: {e}')
+
+    def release(self, timeout: float = 5):
+        """
+        Stop any running exam, the picamera process, audio, and networking
+        """
+        self.quitting.set()
+        self._exam_active.clear()
+        if self._exam_thread is not None:
+            self._exam_thread.join(timeout)
+        self.picam.release()
+        self.picam.join(timeout)
+        if isinstance(self.server, Playback_Scheduler):
+            self.server.stop(timeout)
+        if self.metrics_server is not None:
+            self.metrics_server.stop()
+        self.node.release(timeout)
+
     def handle_message(self, message):
         """
         Handle a message by calling some method according to its ``key`` attribute
 
         Args:
-            message (bytes): a serialized :class:`.networking.messages.Message` object
+            message (:class:`.networking.messages.Message`): received message
         """
-        message = Message.from_serialized(message)
         if message.key in self.callbacks.keys():
             self.logger.debug(f'Calling callback for {message.key} with {message.value}')
             self.callbacks[message.key](message.value)
@@ -399,7 +558,7 @@ class Patient(Runtime):
 
     def cb_start(self, params:typing.Union[Exam_Params, typing.Dict[str, Exam_Params]]):
         """
-        Start the exam!
+        Start the exam in a separate thread with :meth:`.run_exam` !
 
         Args:
             params (:class:`.types.exam.Exam_Params`): Parameters to run the exam!
@@ -412,27 +571,69 @@ class Patient(Runtime):
             return
         self._exam_active.set()
 
-        # make new model
-        self.model = self._init_model(self.audiogram_model, params)
+        # run in a thread so we can keep receiving messages (eg. STOP) while the exam runs
+        self._exam_thread = threading.Thread(target=self.run_exam, args=(params,), daemon=True)
+        self._exam_thread.start()
 
-        while self._exam_active.is_set():
-            kernel = None
-            if isinstance(self.model, model.Gaussian_Process):
-                kernel = self.model.model.clone_kernel()
+    def run_exam(self, params: Exam_Params):
+        """
+        Run trials until the exam is stopped by the clinician or the
+        :class:`.Exam_Controller` finds that the :attr:`.Exam_Params.completion_metric` is met,
+        in which case send a ``COMPLETE`` message to the clinician with the controller's status.
 
-            sample = self.trial()
-            msg = Message(
-                key='DATA',
-                sample=sample,
-                kernel=kernel
-            )
-            self.node.send(msg, to='clinician:control')
-            self.logger.info(f'Sent data from trial back to clinician')
+        Args:
+            params (:class:`.types.exam.Exam_Params`): Parameters to run the exam!
+        """
+        # make new model
+        self.model = self._init_model(self.audiogram_model, params)
+        self.controller = Exam_Controller(params.completion_metric, frequencies=params.frequencies)
 
-            waitfor = params.iti + ((np.random.rand()-0.5)*params.iti_jitter*params.iti)
-            self.logger.debug(f"Waiting for {waitfor} seconds")
-            sleep(waitfor)
+        # render all the sounds we could present before starting the clock
+        self.sound_bank.render(
+            frequencies=params.frequencies,
+            amplitudes=params.amplitudes,
+            durations=(Sound.__fields__['duration'].default,)
+        )
+        self.controller.start()
 
+        try:
+            version = 0
+            while self._exam_active.is_set():
+                sample = self.trial()
+
+                # send a fixed-size summary of the posterior rather than the model,
+                # only when the model has been updated
+                posterior = None
+                if sample is not None:
+                    version += 1
+                    with self._phase('summarize'):
+                        posterior = self.model.summarize(version=version)
+
+                msg = Message(
+                    key='DATA',
+                    sample=sample,
+                    posterior=posterior,
+                    calibration=self.calibration.state()
+                )
+                with self._phase('serialize'):
+                    msg.serialize()
+                with self._phase('send'):
+                    self.node.send(msg, to='clinician:control')
+                self.logger.info(f'Sent data from trial back to clinician')
+
+                if self.controller.update(self.model, updated=sample is not None):
+                    self.node.send(
+                        Message(key='COMPLETE', status=self.controller.status),
+                        to='clinician:control'
+                    )
+                    self.logger.info(f'Exam complete, notified clinician: {self.controller.reason}')
+                    break
+
+                waitfor = params.iti + ((np.random.rand()-0.5)*params.iti_jitter*params.iti)
+                self.logger.debug(f"Waiting for {waitfor} seconds")
+                sleep(waitfor)
+        finally:
+            self._exam_active.clear()
 
 
 
@@ -450,44 +651,52 @@ class Patient(Runtime):
         self._exam_active.clear()
 
 
-    def _update_pupil_params(self, pupils: typing.List[Pupil]) -> Pupil_Params:
+    def _update_pupil_params(self, diameters: np.ndarray, timestamps: np.ndarray, onset: int) -> Pupil_Params:
         """
-
-        .. todo::
-
-            How to update pupil parameters?
+        Make the :class:`.types.pupil.Pupil_Params` for a trial with :attr:`.calibration` , using the median diameter
+        from before the sound's onset (the :attr:`.Collection_Params.baseline` frames) as the baseline,
+        and a threshold estimated from the patient's pupil noise in previous trials.
 
         Args:
-            pupils ():
+            diameters (:class:`numpy.ndarray`): Filtered diameters of the trial, see :attr:`.Dilation_Analyzer.trace`
+            timestamps (:class:`numpy.ndarray`): Monotonic timestamps (ns) of each diameter
+            onset (int): Monotonic time (ns) of the sound's onset
 
         Returns:
-
+            :class:`.types.pupil.Pupil_Params` , with a ``baseline`` of ``None`` if there were no pupils before the onset
         """
-        params = Pupil_Params(threshold=10, max_diameter=20)
-        return params
+        return self.calibration.calibrate(diameters.tolist(), timestamps.tolist(), onset)
 
 
-    def _init_audio(self) -> typing.Union[server.jackclient.JackClient, sc.pulseaudio._Speaker]:
+    def _init_audio(self) -> typing.Union[server.jackclient.JackClient, Playback_Scheduler]:
         """
         Start the jackd process, connect a client to it!
 
+        If not using jack, start a :class:`.sound.soundcard.Playback_Scheduler` with :attr:`.speaker` ,
+        or the default speaker, instead.
+
         Returns:
             :class:`autopilot.stim.sound.jackclient.JackClient` - A booted jack client!
+            or :class:`.sound.soundcard.Playback_Scheduler` - a running playback scheduler
         """
         if isinstance(self.audio_config, Jackd_Config):
             self.logger.debug('Using jack audio server')
             proc = server.boot_jackd(self.audio_config)
             self.procs.append(proc)
             # prefs.set('OUTCHANNELS', [0])
-            # sleep(1)
             client = server.jackclient.JackClient(outchannels=self.audio_config.outchannels)
-            sleep(3)
             client.start()
+            server.wait_for_client(client.name, timeout=self.audio_config.startup_timeout)
             self.logger.info(f'Started jackd with pid: {proc.pid}, and also started jack client!')
         else:
             self.logger.debug('Using SoundCard-based audio system')
             prefs.set('AUDIOSERVER', 'dummy')
-            client = sc.default_speaker()
+            client = Playback_Scheduler(
+                self.speaker if self.speaker is not None else sc.default_speaker(),
+                fs=self.audio_config.fs,
+                blocksize=self.audio_config.blocksize
+            )
+            client.start()
 
         return client
 
@@ -501,17 +710,22 @@ class Patient(Runtime):
         picam_proc = Picamera_Process(
             picam_params,
             networking,
-            queue_size=self.prefs.picam_queue_size
+            queue_size=self.prefs.picam_queue_size,
+            pretrigger=self.collection_params.baseline
         )
         return picam_proc
 
     def _init_pupil_extractor(
             self,
             pupil_extractor: Pupil_Extractors,
-            pupil_extractor_params: typing.Union[EllipseExtractor_Params]):
+            pupil_extractor_params: typing.Union[EllipseExtractor_Params, Starburst_Params]):
 
         extractor = get_extractor(pupil_extractor)
-        return extractor(**pupil_extractor_params.dict())
+        if not isinstance(pupil_extractor_params, extractor.params_type):
+            self.logger.warning(f'Extractor params {pupil_extractor_params} are not for the {pupil_extractor} extractor, using its defaults')
+            pupil_extractor_params = extractor.params_type()
+        gate = Blink_Gate(self.prefs.blink_gate) if self.prefs.blink_gate is not None else None
+        return extractor(**pupil_extractor_params.dict(), gate=gate)
 
     def _init_networking(self, socket:Socket) -> Node:
         node = Node(
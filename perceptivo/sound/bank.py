@@ -0,0 +1,186 @@
+"""
+Pre-rendered sounds, so that synthesizing the waveform doesn't happen on the
+critical path between choosing a sound and playing it.
+
+An exam only presents a fixed set of frequencies and amplitudes (see :class:`.types.exam.Exam_Params` ),
+so when the exam starts the :class:`.Sound_Bank` renders every (frequency, amplitude, duration)
+combination in parallel worker processes. At play time, the table is looked up from a dictionary.
+
+.. note::
+
+    Gammatones are filtered noise, so a banked sound is the same noise token every time
+    it is played ("frozen" noise) rather than a fresh sample of noise per trial.
+
+"""
+import typing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product
+from threading import Lock
+import multiprocessing as mp
+
+import numpy as np
+
+from perceptivo.root import Perceptivo_Object
+from perceptivo.types.sound import Sound, SOUND_TYPES
+
+BANK_KEY = typing.Tuple[str, float, float, float]
+"""
+Key for a sound in the bank: (sound_type, frequency, amplitude, duration)
+"""
+
+
+def _render(sound_type:SOUND_TYPES, frequency:float, amplitude:float, duration:float, fs:int) -> np.ndarray:
+    """
+    Render one sound's table. Module-level so that it can be called in a worker process.
+
+    Args:
+        sound_type (str): name of sound class in :mod:`.sound.sounds`
+        frequency (float): Frequency in Hz
+        amplitude (float): Amplitude
+        duration (float): Duration in seconds
+        fs (int): Sampling rate
+
+    Returns:
+        :class:`numpy.ndarray` : contiguous float32 table
+    """
+    from perceptivo.sound import sounds
+    sound_class = getattr(sounds, sound_type)
+    # autopilot uses ms not seconds
+    sound = sound_class(frequency=frequency, amplitude=amplitude, duration=duration*1000, fs=fs)
+    return np.ascontiguousarray(sound.table, dtype=np.float32)
+
+
+class Sound_Bank(Perceptivo_Object):
+    """
+    Cache of rendered sound tables, evicted least-recently-used past a memory budget.
+
+    Examples:
+
+        bank = Sound_Bank(fs=44100)
+        bank.render(frequencies=(1000, 2000), amplitudes=(0.1, 0.2), durations=(0.5,))
+        table = bank.get(Sound(frequency=1000, amplitude=0.1))
+
+    Args:
+        fs (int): Sampling rate to render sounds at
+        max_bytes (int): Memory budget for all tables. When exceeded, the least recently
+            used tables are evicted.
+        n_workers (int): Number of worker processes to render with. If ``None`` , use :func:`os.cpu_count`
+    """
+
+    def __init__(self,
+                 fs: int = 44100,
+                 max_bytes: int = 2**27,
+                 n_workers: typing.Optional[int] = None,
+                 **kwargs):
+        super(Sound_Bank, self).__init__(**kwargs)
+        self.fs = fs
+        self.max_bytes = max_bytes
+        self.n_workers = n_workers
+
+        self._tables = OrderedDict() # type: typing.OrderedDict[BANK_KEY, np.ndarray]
+        self._lock = Lock()
+        self.nbytes = 0
+        """Total size of all tables in the bank"""
+
+    @staticmethod
+    def key(sound: Sound) -> BANK_KEY:
+        """
+        Key in the bank for a sound
+
+        Args:
+            sound (:class:`.types.sound.Sound`): Sound to get the key of
+
+        Returns:
+            tuple of (sound_type, frequency, amplitude, duration)
+        """
+        return (sound.sound_type, float(sound.frequency), float(sound.amplitude), float(sound.duration))
+
+    def render(self,
+               frequencies: typing.Iterable[float],
+               amplitudes: typing.Iterable[float],
+               durations: typing.Iterable[float] = (0.5,),
+               sound_type: SOUND_TYPES = 'Gammatone'):
+        """
+        Render every combination of frequencies, amplitudes and durations that isn't
+        already in the bank in parallel worker processes.
+
+        Workers are spawned rather than forked so they start from a clean audio server
+        configuration, see :mod:`perceptivo.sound`
+
+        Args:
+            frequencies (iterable): Frequencies in Hz
+            amplitudes (iterable): Amplitudes
+            durations (iterable): Durations in seconds
+            sound_type (str): name of the sound class in :mod:`.sound.sounds`
+        """
+        keys = [(sound_type, float(f), float(a), float(d))
+                for f, a, d in product(frequencies, amplitudes, durations)]
+        with self._lock:
+            keys = [k for k in keys if k not in self._tables]
+        if len(keys) == 0:
+            return
+
+        self.logger.debug(f'Rendering {len(keys)} sounds')
+        with ProcessPoolExecutor(max_workers=self.n_workers, mp_context=mp.get_context('spawn')) as pool:
+            tables = pool.map(
+                _render,
+                *zip(*keys),
+                [self.fs] * len(keys)
+            )
+            for key, table in zip(keys, tables):
+                self._store(key, table)
+
+        n_kept = sum([k in self._tables for k in keys])
+        if n_kept < len(keys):
+            self.logger.warning(f'Rendered {len(keys)} sounds, but only {n_kept} fit in the sound bank. Increase max_bytes to avoid rendering sounds during trials')
+        else:
+            self.logger.info(f'Rendered {len(keys)} sounds, sound bank is using {self.nbytes / 2**20:.1f}MB')
+
+    def get(self, sound: Sound) -> np.ndarray:
+        """
+        Get the table for a sound, rendering it (in this process) if it isn't in the bank.
+
+        Args:
+            sound (:class:`.types.sound.Sound`): Sound to get
+
+        Returns:
+            :class:`numpy.ndarray` : float32 table
+        """
+        key = self.key(sound)
+        with self._lock:
+            table = self._tables.get(key, None)
+            if table is not None:
+                self._tables.move_to_end(key)
+                return table
+
+        self.logger.warning(f'Sound {key} was not in the sound bank, rendering it')
+        table = _render(*key, self.fs)
+        self._store(key, table)
+        return table
+
+    def _store(self, key: BANK_KEY, table: np.ndarray):
+        with self._lock:
+            if key in self._tables:
+                self.nbytes -= self._tables.pop(key).nbytes
+            self._tables[key] = table
+            self.nbytes += table.nbytes
+
+            # evict least recently used, but always keep the newest
+            while self.nbytes > self.max_bytes and len(self._tables) > 1:
+                _, evicted = self._tables.popitem(last=False)
+                self.nbytes -= evicted.nbytes
+
+    def clear(self):
+        """
+        Remove all tables from the bank
+        """
+        with self._lock:
+            self._tables.clear()
+            self.nbytes = 0
+
+    def __contains__(self, sound: Sound) -> bool:
+        return self.key(sound) in self._tables
+
+    def __len__(self) -> int:
+        return len(self._tables)
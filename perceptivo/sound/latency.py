@@ -0,0 +1,263 @@
+"""
+Measure how accurately sound onsets are timestamped.
+
+The :class:`.Dummy_Speaker` is a loopback audio sink with the same interface as a
+:mod:`soundcard` speaker. Its output stream consumes one block of samples per period
+in a background thread, like a sound card pulling from its buffer, and records the time
+that the first sample of each played table would reach the speaker. Comparing those
+onsets to the :attr:`.types.sound.Sound.timestamp` s recorded by the playback path
+(:func:`.sound.soundcard.play_table` or :class:`.sound.soundcard.Playback_Scheduler` ) gives the distribution of timestamping error,
+see :func:`.measure_onset_jitter` and :func:`.jitter_report` .
+
+The error has two parts:
+
+* systematic - latency the stream doesn't report, like the ``device_latency`` of the sink
+* jitter - variable delays in scheduling the playback and the stream's thread
+
+"""
+import threading
+import typing
+from collections import deque
+from perceptivo.clock import now_ns, NS_PER_S
+from time import perf_counter, sleep
+
+import numpy as np
+
+from perceptivo.types.sound import Sound
+from perceptivo.sound.soundcard import play_table, Playback_Scheduler
+
+
+class Dummy_Player:
+    """
+    Output stream of a :class:`.Dummy_Speaker` , use with :meth:`.Dummy_Speaker.player`
+
+    Samples are only counted, not stored. Every ``blocksize / samplerate`` seconds, the stream thread
+    consumes one block, and any table that starts in the block is recorded in :attr:`.Dummy_Speaker.onsets`
+    as reaching the speaker after the ``nperiods`` blocks already in the device's buffer and the ``device_latency`` .
+
+    Args:
+        speaker (:class:`.Dummy_Speaker`): Speaker that owns this stream
+        samplerate (int): Sampling rate
+        blocksize (int): Samples consumed per period
+        nperiods (int): Number of periods buffered by the device
+        device_latency (float): Additional latency (s) of the device that isn't reported by :attr:`.latency`
+    """
+
+    def __init__(self,
+                 speaker: 'Dummy_Speaker',
+                 samplerate: int,
+                 blocksize: int,
+                 nperiods: int,
+                 device_latency: float):
+        self.speaker = speaker
+        self.samplerate = samplerate
+        self.blocksize = blocksize
+        self.nperiods = nperiods
+        self.device_latency = device_latency
+
+        self._queued = 0
+        self._written = 0
+        self._consumed = 0
+        self._starts = deque() # type: typing.Deque[int]
+        self._next_tick = 0.
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._thread = None # type: typing.Optional[threading.Thread]
+
+    @property
+    def period(self) -> float:
+        """
+        Duration of one block in seconds
+        """
+        return self.blocksize / self.samplerate
+
+    @property
+    def latency(self) -> float:
+        """
+        Seconds until a sample written now would reach the speaker, not including
+        the ``device_latency``: the time until the next block is consumed, the samples queued
+        ahead of it, and the periods buffered by the device.
+        """
+        with self._cond:
+            return max(self._next_tick - perf_counter(), 0) + \
+                   self._queued / self.samplerate + \
+                   self.nperiods * self.period
+
+    def play(self, data: np.ndarray):
+        """
+        Write a table to the stream, blocking until all but one block of it
+        has been consumed, like :meth:`soundcard.pulseaudio._Player.play`
+        """
+        with self._cond:
+            self._starts.append(self._written)
+            self._written += data.shape[0]
+            self._queued += data.shape[0]
+            self._cond.wait_for(lambda: self._queued <= self.blocksize or self._stop.is_set())
+
+    def _run(self):
+        while not self._stop.is_set():
+            sleep(max(self._next_tick - perf_counter(), 0))
+            now = now_ns()
+            with self._cond:
+                first = self._consumed
+                n = min(self.blocksize, self._queued)
+                self._consumed += n
+                self._queued -= n
+                self._next_tick += self.period
+                while len(self._starts) > 0 and self._starts[0] < first + self.blocksize:
+                    offset = (self._starts.popleft() - first) / self.samplerate
+                    self.speaker.onsets.append(
+                        now + round((offset + self.nperiods * self.period + self.device_latency) * NS_PER_S))
+                self._cond.notify_all()
+
+    def __enter__(self) -> 'Dummy_Player':
+        self._stop.clear()
+        self._next_tick = perf_counter()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args):
+        # drain the stream before closing it
+        with self._cond:
+            self._cond.wait_for(lambda: self._queued == 0, timeout=self._written / self.samplerate + 1)
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+        self._thread.join()
+
+
+class Dummy_Speaker:
+    """
+    Loopback audio sink with the interface of a :mod:`soundcard` speaker.
+
+    Args:
+        blocksize (int): Default samples per period, if not given to :meth:`.player`
+        nperiods (int): Number of periods buffered by the device
+        device_latency (float): Latency (s) of the device that isn't reported by the stream
+
+    Attributes:
+        onsets (list): Monotonic ns (see :mod:`perceptivo.clock` ) that each played table reached the speaker
+    """
+
+    def __init__(self, blocksize:int=1024, nperiods:int=2, device_latency:float=0):
+        self.blocksize = blocksize
+        self.nperiods = nperiods
+        self.device_latency = device_latency
+        self.onsets = [] # type: typing.List[int]
+
+    def player(self, samplerate:int, channels:typing.Optional[int]=None, blocksize:typing.Optional[int]=None) -> Dummy_Player:
+        """
+        Open an output stream, to be used as a context manager like :meth:`soundcard.pulseaudio._Speaker.player`
+        """
+        if blocksize is None:
+            blocksize = self.blocksize
+        return Dummy_Player(self, samplerate, blocksize, self.nperiods, self.device_latency)
+
+    def play(self, data:np.ndarray, samplerate:int, channels:typing.Optional[int]=None, blocksize:typing.Optional[int]=None):
+        """
+        Play a table in a new output stream, like :meth:`soundcard.pulseaudio._Speaker.play`
+        """
+        with self.player(samplerate, channels, blocksize) as player:
+            player.play(data)
+
+
+def _summarize(errors: np.ndarray) -> typing.Dict[str, float]:
+    return {
+        'mean': float(np.mean(errors)),
+        'std': float(np.std(errors)),
+        'p5': float(np.percentile(errors, 5)),
+        'median': float(np.median(errors)),
+        'p95': float(np.percentile(errors, 95)),
+        'max_abs': float(np.max(np.abs(errors)))
+    }
+
+
+def measure_onset_jitter(fs:int = 44100,
+                         blocksize:int = 1024,
+                         nperiods:int = 2,
+                         device_latency:float = 0,
+                         n_sounds:int = 50,
+                         duration:float = 0.02,
+                         iti:float = 0.01,
+                         persistent:bool = False) -> typing.Dict[str, typing.Union[int, typing.Dict[str, float]]]:
+    """
+    Play silent tables through a :class:`.Dummy_Speaker` with :func:`.sound.soundcard.play_table` ,
+    or with a :class:`.sound.soundcard.Playback_Scheduler` if ``persistent`` , and measure the error between each sound's stamped onset and the onset recorded by the speaker.
+
+    For comparison, the time just before the table was played (how sounds used to be stamped) is also measured.
+
+    Examples:
+
+        >>> measure_onset_jitter(blocksize=512, n_sounds=20)['stamped']['median']
+
+    Args:
+        fs (int): Sampling rate
+        blocksize (int): Samples per period
+        nperiods (int): Periods buffered by the device
+        device_latency (float): Unreported latency of the device (s)
+        n_sounds (int): Number of sounds to play
+        duration (float): Duration of each sound (s)
+        iti (float): Time between sounds (s)
+        persistent (bool): If ``True`` , play with a :class:`.sound.soundcard.Playback_Scheduler` 's
+            persistent output stream, otherwise open a stream for each sound
+
+    Returns:
+        dict of ``{'n': n_sounds, 'stamped': {...}, 'naive': {...}}`` , where ``stamped`` and ``naive``
+        summarize the errors (ms, recorded onset minus stamped onset) with their ``mean, std, p5, median, p95, max_abs``
+    """
+    speaker = Dummy_Speaker(blocksize=blocksize, nperiods=nperiods, device_latency=device_latency)
+    table = np.zeros(int(duration * fs), dtype=np.float32)
+
+    scheduler = None
+    if persistent:
+        scheduler = Playback_Scheduler(speaker, fs=fs, blocksize=blocksize)
+        scheduler.start()
+
+    stamped = []
+    naive = []
+    for i in range(n_sounds):
+        sound = Sound(frequency=1000, amplitude=0, duration=duration)
+        naive.append(now_ns())
+        if persistent:
+            scheduler.play(table, sound).wait()
+        else:
+            play_table(speaker, table, sound, fs=fs, blocksize=blocksize)
+        stamped.append(sound.timestamp)
+        sleep(iti)
+
+    if persistent:
+        scheduler.stop()
+
+    def _errors(times: typing.List[int]) -> np.ndarray:
+        return np.array([onset - time for onset, time in zip(speaker.onsets, times)], dtype=np.int64) / 1e6
+
+    return {
+        'n': n_sounds,
+        'stamped': _summarize(_errors(stamped)),
+        'naive': _summarize(_errors(naive))
+    }
+
+
+def jitter_report(configs: typing.Iterable[dict], **kwargs) -> typing.List[dict]:
+    """
+    :func:`.measure_onset_jitter` for several output configurations
+
+    Examples:
+
+        >>> for result in jitter_report([{'blocksize': 256}, {'blocksize': 1024, 'nperiods': 3}]):
+        ...     print(result['blocksize'], result['nperiods'], result['stamped']['std'])
+
+    Args:
+        configs (iterable): dicts of ``fs``, ``blocksize``, ``nperiods``, ``device_latency`` , ``persistent`` to test
+        **kwargs: passed to :func:`.measure_onset_jitter` for every configuration
+
+    Returns:
+        list of dicts, the complete configuration and its results for each config
+    """
+    results = []
+    for config in configs:
+        config = {'fs': 44100, 'blocksize': 1024, 'nperiods': 2, 'device_latency': 0, **config}
+        result = measure_onset_jitter(**config, **kwargs)
+        results.append({**config, **result})
+    return results
@@ -2,23 +2,149 @@
 Wrapper around autopilot's :class:`~autopilot.stim.sound.jackclient.JackClient`
 
 * boot and kill the jackd daemon
+* wait until jackd and the jack client are ready
 * references to jackclient module
 """
 import subprocess
 import os
+import re
 import typing
 import signal
 import atexit
-from time import sleep
+import threading
+from collections import deque
+from time import monotonic, sleep
 
 from autopilot import prefs
 prefs.set('AUDIOSERVER', 'jack')
 from autopilot.stim.sound import jackclient
 from perceptivo.types.sound import Jackd_Config
+from perceptivo.data.logging import init_logger
 
 _jackd_proc: typing.Optional[subprocess.Popen] = None
 
-def boot_jackd(config: Jackd_Config) -> subprocess.Popen:
+JACKD_READY_PATTERN = r'configuring for \d+Hz'
+"""
+Pattern in jackd's output that means its driver has started, printed by the
+alsa drivers of both jack1 and jack2 like ``configuring for 44100Hz, period = 1024 frames (23.2 ms), buffer = 3 periods``
+"""
+
+
+def probe_jackd() -> bool:
+    """
+    Check if a jackd server is running by connecting a client to it (without starting a server if there isn't one)
+
+    Returns:
+        bool: ``True`` if a client could connect, ``False`` if not or if the jack python package isn't installed
+    """
+    try:
+        import jack
+    except ImportError:
+        return False
+
+    try:
+        client = jack.Client('perceptivo_probe', no_start_server=True)
+    except jack.JackError:
+        return False
+    client.close()
+    return True
+
+
+def poll(condition: typing.Callable[[], bool],
+         timeout: float,
+         interval: float = 0.01,
+         max_interval: float = 0.5,
+         check: typing.Optional[typing.Callable[[], None]] = None) -> bool:
+    """
+    Poll ``condition`` with exponential backoff until it is ``True`` or ``timeout`` elapses
+
+    Args:
+        condition (callable): Returns ``True`` when done waiting
+        timeout (float): Seconds to wait
+        interval (float): Seconds to wait after the first poll, doubled after each poll
+        max_interval (float): Longest wait between polls
+        check (callable): Optional, called before each poll to raise an exception if
+            waiting is pointless (eg. the process being waited for has died)
+
+    Returns:
+        bool: ``True`` if the condition was met, ``False`` if timed out
+    """
+    deadline = monotonic() + timeout
+    while True:
+        if check is not None:
+            check()
+        if condition():
+            return True
+        remaining = deadline - monotonic()
+        if remaining <= 0:
+            return False
+        sleep(min(interval, remaining))
+        interval = min(interval * 2, max_interval)
+
+
+def _read_output(proc: subprocess.Popen, lines: typing.Deque[str], ready: threading.Event, pattern: str):
+    """
+    Read jackd's output line by line, keeping the most recent lines for error messages
+    and setting ``ready`` when ``pattern`` is found. Keeps reading after jackd is ready
+    so its output pipe never fills up and blocks it.
+    """
+    logger = init_logger(module_name='sound.server')
+    regex = re.compile(pattern)
+    for line in iter(proc.stdout.readline, b''):
+        line = line.decode('utf-8', errors='replace').rstrip()
+        lines.append(line)
+        logger.debug(f'jackd: {line}')
+        if not ready.is_set() and regex.search(line):
+            ready.set()
+    proc.stdout.close()
+
+
+def wait_for_jackd(proc: subprocess.Popen,
+                   timeout: float = 10,
+                   pattern: str = JACKD_READY_PATTERN,
+                   probe: typing.Optional[typing.Callable[[], bool]] = probe_jackd) -> float:
+    """
+    Wait until a jackd process is ready, either by printing a line that matches ``pattern`` ,
+    or by ``probe`` succeeding in connecting to it, polling with :func:`.poll` .
+
+    Args:
+        proc (:class:`subprocess.Popen`): The jackd process, launched with its stdout piped
+        timeout (float): Seconds to wait before giving up
+        pattern (str): regex that matches jackd's ready line, default :data:`.JACKD_READY_PATTERN`
+        probe (callable): Returns ``True`` if jackd is accepting clients, default :func:`.probe_jackd` .
+            If ``None`` , only wait for the ready line.
+
+    Returns:
+        float: Seconds it took jackd to be ready
+
+    Raises:
+        RuntimeError: if jackd exits before it is ready
+        TimeoutError: if jackd isn't ready within ``timeout``
+    """
+    start = monotonic()
+    lines = deque(maxlen=20) # type: typing.Deque[str]
+    ready = threading.Event()
+    reader = threading.Thread(target=_read_output, args=(proc, lines, ready, pattern), daemon=True)
+    reader.start()
+
+    def _check():
+        if proc.poll() is not None and not ready.is_set():
+            reader.join(1)
+            output = '\n'.join(lines)
+            raise RuntimeError(f'jackd exited with code {proc.returncode} before it was ready. Output:\n{output}')
+
+    def _ready() -> bool:
+        return ready.is_set() or (probe is not None and probe())
+
+    if not poll(_ready, timeout, check=_check):
+        output = '\n'.join(lines)
+        raise TimeoutError(f'jackd was not ready after {timeout}s. Output:\n{output}')
+
+    return monotonic() - start
+
+
+def boot_jackd(config: Jackd_Config, timeout: typing.Optional[float] = None,
+               probe: typing.Optional[typing.Callable[[], bool]] = probe_jackd) -> subprocess.Popen:
     """
     Boot the jacked server given the configuration given by :class:`.types.Jackd_Config`
 
@@ -26,26 +152,62 @@ def boot_jackd(config: Jackd_Config) -> subprocess.Popen:
 
     Registers the jackd sound server to be killed at exit.
 
+    Returns once jackd is ready, see :func:`.wait_for_jackd` . If jackd fails to start, it is killed
+    and the error is raised.
+
     Thanks to https://stackoverflow.com/a/4791612/13113166 for information about how to kill a process with ``shell = True``
 
+    Args:
+        config (:class:`.types.sound.Jackd_Config`): jackd configuration
+        timeout (float): Seconds to wait for jackd to be ready, if ``None`` use ``config.startup_timeout``
+        probe (callable): Passed to :func:`.wait_for_jackd`
+
     Returns:
         :class:`subprocess.Popen` - opened subprocess
     """
     global _jackd_proc
 
-    proc = subprocess.Popen(config.launch_str, stdout=subprocess.PIPE, shell=True,
-                            preexec_fn=os.setsid)
+    if timeout is None:
+        timeout = config.startup_timeout
+
+    proc = subprocess.Popen(config.launch_str, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                            shell=True, preexec_fn=os.setsid)
     _jackd_proc = proc
 
     # register the process to be killed at exit
     atexit.register(lambda: kill_jackd(proc))
 
-    # sleep to let the process start
-    sleep(3)
+    try:
+        elapsed = wait_for_jackd(proc, timeout=timeout, probe=probe)
+    except (RuntimeError, TimeoutError):
+        kill_jackd(proc)
+        raise
 
+    init_logger(module_name='sound.server').debug(f'jackd ready after {elapsed:.3f}s')
     return proc
 
 
+def wait_for_client(name: str = 'jack_client', timeout: float = 10):
+    """
+    Wait until a jack client has registered its ports with the server,
+    eg. after :meth:`~autopilot.stim.sound.jackclient.JackClient.start` boots it in its own process
+
+    Args:
+        name (str): Name of the client
+        timeout (float): Seconds to wait
+
+    Raises:
+        TimeoutError: if the client's ports don't appear within ``timeout``
+    """
+    import jack
+    probe = jack.Client('perceptivo_probe', no_start_server=True)
+    try:
+        if not poll(lambda: len(probe.get_ports(f'{name}:')) > 0, timeout):
+            raise TimeoutError(f'jack client {name} did not register its ports within {timeout}s')
+    finally:
+        probe.close()
+
+
 def kill_jackd(proc: typing.Optional[subprocess.Popen] = None):
     if proc is None:
         proc = globals()['_jackd_proc']
@@ -54,4 +216,8 @@ def kill_jackd(proc: typing.Optional[subprocess.Popen] = None):
         if proc is None:
             raise RuntimeError(f'jackd was not booted, cant kill the process without first booting it!')
 
-    os.killpg(os.getpgid(proc.pid), signal.SIGTERM)
\ No newline at end of file
+    try:
+        os.killpg(os.getpgid(proc.pid), signal.SIGTERM)
+    except ProcessLookupError:
+        # already dead
+        pass
@@ -7,3 +7,159 @@ apt install pulseaudio
 pulseaudio --start
 
 """
+import threading
+import typing
+from queue import Queue
+
+import numpy as np
+
+from perceptivo.root import Perceptivo_Object
+from perceptivo.types.sound import Sound
+if typing.TYPE_CHECKING:
+    from soundcard.pulseaudio import _Speaker
+
+
+def play_table(speaker: '_Speaker',
+               table: np.ndarray,
+               sound: Sound,
+               fs: int = 44100,
+               blocksize: typing.Optional[int] = None) -> Sound:
+    """
+    Play a rendered table with a soundcard speaker, stamping the sound with its onset.
+
+    ``speaker.play()`` returns only after the sound has (mostly) been written to the output
+    stream, so stamping the time before or after it is off by the stream's latency or the
+    sound's duration, respectively. Instead the output stream is opened first, and the
+    sound is stamped with the stream's reported latency immediately before the table is written,
+    ie. when the first sample will reach the speaker.
+
+    Args:
+        speaker (:class:`soundcard.pulseaudio._Speaker`): Speaker to play with, eg. from :func:`soundcard.default_speaker`
+        table (:class:`numpy.ndarray`): Table to play
+        sound (:class:`.types.sound.Sound`): Sound that is being played, stamped with :meth:`.Sound.stamp_time`
+        fs (int): Sampling rate
+        blocksize (int): Size of the output stream's buffer, ``None`` for the default
+
+    Returns:
+        :class:`.types.sound.Sound` , the stamped sound
+    """
+    with speaker.player(samplerate=fs, blocksize=blocksize) as player:
+        sound.stamp_time(player.latency)
+        player.play(table)
+    return sound
+
+
+class Playback_Scheduler(Perceptivo_Object):
+    """
+    Play sounds from a thread with one persistent output stream.
+
+    :func:`.play_table` opens an output stream per sound and blocks for its whole duration.
+    Instead, the scheduler's thread opens the stream once in :meth:`.start` and
+    plays tables as they are given to :meth:`.play` , which returns as soon as the sound
+    has been stamped with its onset, so that the caller (eg. the :class:`.runtimes.patient.Patient` 's
+    frame collection) can start while the sound is playing.
+
+    Sounds given while another is playing are played after it, in order.
+
+    Examples:
+
+        scheduler = Playback_Scheduler(soundcard.default_speaker(), fs=44100)
+        scheduler.start()
+        finished = scheduler.play(table, sound)
+        print(sound.timestamp)
+        finished.wait()
+        scheduler.stop()
+
+    Args:
+        speaker (:class:`soundcard.pulseaudio._Speaker`): Speaker to play with, eg. from :func:`soundcard.default_speaker`
+        fs (int): Sampling rate
+        blocksize (int): Size of the output stream's buffer, ``None`` for the default
+    """
+
+    def __init__(self,
+                 speaker: '_Speaker',
+                 fs: int = 44100,
+                 blocksize: typing.Optional[int] = None,
+                 **kwargs):
+        super(Playback_Scheduler, self).__init__(**kwargs)
+        self.speaker = speaker
+        self.fs = fs
+        self.blocksize = blocksize
+
+        self._queue = Queue() # type: Queue[typing.Optional[typing.Tuple[np.ndarray, Sound, threading.Event, threading.Event]]]
+        self._thread = None # type: typing.Optional[threading.Thread]
+        self._ready = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        """
+        Whether the playback thread is running
+        """
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, timeout: float = 5):
+        """
+        Start the playback thread and wait for it to open the output stream
+
+        Args:
+            timeout (float): Seconds to wait for the stream to open
+        """
+        if self.running:
+            return
+        self._ready.clear()
+        self._thread = threading.Thread(target=self._play_loop, daemon=True)
+        self._thread.start()
+        if not self._ready.wait(timeout):
+            raise TimeoutError(f'Output stream was not opened within {timeout}s')
+
+    def play(self, table: np.ndarray, sound: Sound, timeout: float = 5) -> threading.Event:
+        """
+        Queue a table to be played, returning once it has been stamped with its onset.
+
+        Args:
+            table (:class:`numpy.ndarray`): Table to play
+            sound (:class:`.types.sound.Sound`): Sound that is being played, stamped with :meth:`.Sound.stamp_time`
+            timeout (float): Seconds to wait for the sound to be stamped, eg. if other sounds are queued ahead of it
+
+        Returns:
+            :class:`threading.Event` that is set when the sound has finished being written to the stream
+        """
+        if not self.running:
+            raise RuntimeError('Playback thread is not running, call start() first')
+
+        stamped = threading.Event()
+        finished = threading.Event()
+        self._queue.put((table, sound, stamped, finished))
+        if not stamped.wait(timeout):
+            self.logger.warning(f'Sound {sound} was not played within {timeout}s, its timestamp is missing')
+        return finished
+
+    def stop(self, timeout: float = 5):
+        """
+        Finish playing queued sounds, close the output stream, and stop the playback thread
+
+        Args:
+            timeout (float): Seconds to wait for the thread to stop
+        """
+        if not self.running:
+            return
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def _play_loop(self):
+        with self.speaker.player(samplerate=self.fs, blocksize=self.blocksize) as player:
+            self._ready.set()
+            while True:
+                item = self._queue.get()
+                if item is None:
+                    break
+                table, sound, stamped, finished = item
+                try:
+                    sound.stamp_time(player.latency)
+                    stamped.set()
+                    player.play(table)
+                except Exception as e:
+                    self.logger.exception(f'Error playing sound {sound}: {e}')
+                finally:
+                    stamped.set()
+                    finished.set()
@@ -1,7 +1,34 @@
 """
 Sound synthesis
 """
+import typing
 
+import numpy as np
 
 from autopilot.stim.sound.sounds import Gammatone
+from autopilot.stim.sound.base import Jack_Sound
+if typing.TYPE_CHECKING:
+    from autopilot.stim.sound.jackclient import JackClient
 
+
+class Table(Jack_Sound):
+    """
+    A jack sound whose waveform is already rendered, eg. by a :class:`.bank.Sound_Bank` ,
+    so creating it only splits the table into chunks rather than synthesizing anything.
+
+    Args:
+        table (:class:`numpy.ndarray`): float32 waveform to play
+        jack_client (:class:`~autopilot.stim.sound.jackclient.JackClient`): client to play the sound with
+    """
+    type = 'Table'
+
+    def __init__(self, table:np.ndarray, jack_client:typing.Optional['JackClient']=None, **kwargs):
+        super(Table, self).__init__(jack_client=jack_client, **kwargs)
+        self.table = table
+        self.nsamples = table.shape[0]
+        self.duration = (self.nsamples / self.fs) * 1000.
+        self.init_sound()
+
+    def init_sound(self):
+        self.chunk()
+        self.initialized = True
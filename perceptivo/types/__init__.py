@@ -1,5 +1,19 @@
 """
 Data types to keep inter-module communication consistent
+
+Submodules are imported when they are first accessed (eg. ``types.psychophys`` )
+rather than all at once, so importing one type doesn't import the dependencies of all the others.
 """
+import importlib
+
+_SUBMODULES = ('exam', 'gui', 'networking', 'patient', 'psychophys', 'pupil', 'root', 'sound', 'units', 'video')
+
+
+def __getattr__(name: str):
+    if name in _SUBMODULES:
+        return importlib.import_module(f'{__name__}.{name}')
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
 
-from perceptivo.types import gui, networking, sound, psychophys
\ No newline at end of file
+def __dir__():
+    return sorted(list(globals().keys()) + list(_SUBMODULES))
@@ -6,6 +6,11 @@ from typing import Tuple, Dict, List, Union, Optional
 
 from perceptivo.types.root import PerceptivoType
 
+ACQUISITION_TYPES = typing.Literal['Uncertainty', 'BALD', 'Batch_BALD']
+"""
+Acquisition functions that can be used to select the next sound, see :mod:`.psychophys.acquisition`
+"""
+
 class Completion_Metric(PerceptivoType):
     """
     A means of deciding whether the exam is completed or not
@@ -22,18 +27,27 @@ class Completion_Metric(PerceptivoType):
     """
     End exam after n minutes
     """
+    threshold_stability: Optional[float] = None
+    """
+    End exam when no threshold estimate has moved more than this many dbSPL
+    over the last :attr:`.stability_window` model updates
+    """
+    stability_window: int = 5
+    """
+    Number of model updates that thresholds need to be stable over for :attr:`.threshold_stability`
+    """
 
     use: str = 'any'
     """
     Name of which (non-None) metric to use. Default ``any`` for ending exam if any
-    of the criteria are met
+    of the criteria are met, or ``all`` to end when all of them are.
     """
 
 
 class Exam_Params(PerceptivoType):
-    frequencies: Tuple[float]
+    frequencies: Tuple[float, ...]
     """Frequencies (Hz) to test in exam"""
-    amplitudes: Tuple[float]
+    amplitudes: Tuple[float, ...]
     """Amplitudes (dbSPL) to test in exam"""
     iti: float
     """Seconds between each trial"""
@@ -49,5 +63,15 @@ class Exam_Params(PerceptivoType):
     """
     Allow repeated sounds
     """
+    acquisition: ACQUISITION_TYPES = 'BALD'
+    """
+    Acquisition function used to pick the next sound, see :mod:`.psychophys.acquisition`
+    """
+    acquisition_batch: int = 1
+    """
+    Number of sounds to select at a time with the acquisition function.
+    Only :class:`.acquisition.Batch_BALD` selects batches jointly, others take the top n.
+    The whole batch is presented before selecting another one.
+    """
 
 
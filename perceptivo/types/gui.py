@@ -126,11 +126,25 @@ class Control_Panel_Params(PerceptivoType):
 
 
 
+VIDEO_WIDGETS = typing.Literal['ImageView', 'RawImageGL']
+"""
+Widgets that can display video in the GUI, see :func:`.gui.widgets.video.get_video_widget`
+
+* ``ImageView`` - :class:`pyqtgraph.ImageView` , with a histogram and level controls
+* ``RawImageGL`` - :class:`pyqtgraph.widgets.RawImageWidget.RawImageGLWidget` , which just draws the image
+"""
+
+
 class GUI_Params(PerceptivoType):
     """
     Container for all parameters to be given to the GUI on init
+
+    Attributes:
+        control_panel (:class:`.Control_Panel_Params`): Parameters for the control panel
+        video_widget (str): Which widget to display video with, one of :data:`.VIDEO_WIDGETS`
     """
     control_panel: Control_Panel_Params = Control_Panel_Params()
+    video_widget: VIDEO_WIDGETS = 'ImageView'
 
 
 
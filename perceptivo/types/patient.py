@@ -4,6 +4,7 @@ from datetime import date
 from pydantic import BaseModel
 
 from perceptivo.types.psychophys import Samples, Audiogram
+from perceptivo.types.pupil import Dilation_Analysis_Params
 
 @dataclass
 class Biography:
@@ -27,4 +28,34 @@ class Collection_Params(BaseModel):
     collection_wait: float = 5
     """
     Total duration to wait to collect pupil frames, starting when the sound does.
-    """
\ No newline at end of file
+    """
+    baseline: float = 1
+    """
+    Seconds of frames from before the sound to include in each :class:`.types.pupil.Dilation` as a baseline,
+    kept in a rolling buffer by the :class:`.video.cameras.Picamera_Process` while it isn't collecting.
+    """
+    threshold: float = 0.05
+    """
+    Dilation relative to the baseline diameter that counts as a response, see :class:`.types.pupil.Pupil_Params`
+    """
+    calibrate: bool = True
+    """
+    Estimate the threshold from each patient's own pupil noise with a :class:`.psychophys.calibration.Pupil_Calibration` ,
+    using :attr:`.threshold` only until there are :attr:`.calibration_trials` trials.
+    """
+    calibration_trials: int = 5
+    """
+    Number of trials with a baseline before the calibrated threshold is used
+    """
+    min_threshold: float = 0.01
+    """
+    Lower bound of the calibrated threshold, so a very steady pupil doesn't make every flicker a response
+    """
+    false_positive: float = 0.05
+    """
+    Probability that the calibrated threshold counts a trial without any dilation as a response
+    """
+    analysis: Dilation_Analysis_Params = Dilation_Analysis_Params()
+    """
+    How to clean, filter, and measure each trial's pupil diameters, see :mod:`.psychophys.dilation`
+    """
@@ -3,15 +3,12 @@ from dataclasses import field, InitVar
 from pydantic.dataclasses import dataclass
 from pydantic import Field, BaseModel, PrivateAttr
 from datetime import datetime
-from sklearn.gaussian_process.kernels import RBF
-import pandas as pd
-MATPLOTLIB = False
-try:
-    import matplotlib.pyplot as plt
-    MATPLOTLIB = True
-except ImportError:
-    pass
+import numpy as np
+if typing.TYPE_CHECKING:
+    import pandas as pd
+    from sklearn.gaussian_process.kernels import RBF
 
+from perceptivo.types.root import PerceptivoType
 from perceptivo.types.sound import Sound
 from perceptivo.types.pupil import Dilation
 
@@ -116,8 +113,9 @@ class Samples:
         self.frequencies.append(sample.sound.frequency)
         self.frequencies.append(sample.sound.amplitude)
 
-    def to_df(self) -> pd.DataFrame:
+    def to_df(self) -> 'pd.DataFrame':
         """Make a dataframe with sound parameterization flattened out"""
+        import pandas as pd
         return pd.DataFrame({
             'response': self.responses,
             'frequency': self.frequencies,
@@ -143,7 +141,9 @@ class Samples:
             show (bool): If ``True`` (default), call plt.show()
 
         """
-        if not MATPLOTLIB:
+        try:
+            import matplotlib.pyplot as plt
+        except ImportError:
             raise ImportError("matplotlib was not found!")
 
         df = self.to_df()
@@ -234,6 +234,64 @@ class Audiogram:
 # Model types
 # --------------------------------------------------
 
+class Posterior_Summary(PerceptivoType):
+    """
+    Compact summary of an audiogram model's posterior that can be displayed without the model,
+    sent by the patient after each update instead of the model itself.
+
+    Its size depends only on the display resolution and number of frequencies, not the number of samples.
+
+    The probability grid is stored as the raw bytes of a ``float16`` array so it serializes
+    losslessly and compactly, use :attr:`.probability_grid` to get it as an array.
+    Make a summary from arrays with :meth:`.from_arrays`
+
+    Attributes:
+        version (int): Incremented with each update of the model, so stale summaries can be ignored
+        n_samples (int): Number of samples the model had been updated with
+        frequencies (list): Frequencies (Hz) of the probability grid
+        amplitudes (list): Amplitudes (dbSPL) of the probability grid
+        probability (bytes): float16 probability of a response, shape ``(len(frequencies), len(amplitudes))``
+        threshold_frequencies (list): Frequencies (Hz) that thresholds were estimated at
+        thresholds (list): Estimated thresholds (dbSPL) at each of ``threshold_frequencies`` , ``nan`` if unknown
+    """
+    version: int
+    n_samples: int
+    frequencies: typing.List[float]
+    amplitudes: typing.List[float]
+    probability: bytes
+    threshold_frequencies: typing.List[float]
+    thresholds: typing.List[float]
+
+    @classmethod
+    def from_arrays(cls, version: int, n_samples: int,
+                    frequencies: np.ndarray, amplitudes: np.ndarray, probability: np.ndarray,
+                    threshold_frequencies: np.ndarray, thresholds: np.ndarray) -> 'Posterior_Summary':
+        """
+        Args:
+            probability (:class:`numpy.ndarray`): probability grid, shape ``(len(frequencies), len(amplitudes))``
+        """
+        probability = np.asarray(probability)
+        if probability.shape != (len(frequencies), len(amplitudes)):
+            raise ValueError(f'probability needs shape {(len(frequencies), len(amplitudes))}, got {probability.shape}')
+        return cls(
+            version=version,
+            n_samples=n_samples,
+            frequencies=[float(f) for f in frequencies],
+            amplitudes=[float(a) for a in amplitudes],
+            probability=probability.astype('<f2').tobytes(),
+            threshold_frequencies=[float(f) for f in threshold_frequencies],
+            thresholds=[float(t) for t in thresholds]
+        )
+
+    @property
+    def probability_grid(self) -> np.ndarray:
+        """
+        Probability grid as a float32 array with shape ``(len(frequencies), len(amplitudes))``
+        """
+        return np.frombuffer(self.probability, dtype='<f2').reshape(
+            len(self.frequencies), len(self.amplitudes)).astype(np.float32)
+
+
 class Kernel(BaseModel):
     """
     Default kernel to use with :class:`.psychophys.model.Gaussian_Process`
@@ -243,15 +301,16 @@ class Kernel(BaseModel):
     """
     length_scale: typing.Tuple[float, float] = (100.0, 200.0)
     length_scale_bounds: typing.Tuple[float, float] = (1, 1e5)
-    _kernel: typing.Optional[RBF] = PrivateAttr()
+    _kernel: typing.Optional['RBF'] = PrivateAttr()
 
     def __init__(self, **data):
         super().__init__(**data)
         self._kernel = None
 
     @property
-    def kernel(self) -> RBF:
+    def kernel(self) -> 'RBF':
         if self._kernel is None:
+            from sklearn.gaussian_process.kernels import RBF
             self._kernel = RBF(length_scale=self.length_scale,
                                length_scale_bounds=self.length_scale_bounds)
         return self._kernel
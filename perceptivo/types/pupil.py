@@ -2,17 +2,19 @@
 Types specifically for carrying and manipulating pupil measurements
 """
 import typing
+import timeit
 # from dataclasses import dataclass
-from datetime import datetime
 
 from pydantic.dataclasses import dataclass
 from pydantic import BaseModel
 
 import numpy as np
 
+from perceptivo.clock import to_seconds, now_ns
+from perceptivo.types.root import PerceptivoType
 from perceptivo.types.sound import Sound
-from perceptivo.types.units import Ellipse
-from perceptivo.types.video import Frame
+from perceptivo.types.units import Ellipse, Raw_Ellipse
+from perceptivo.types.video import Frame, Raw_Frame
 
 
 @dataclass
@@ -28,19 +30,188 @@ class Pupil:
     frame: Frame
 
 
+class Raw_Pupil:
+    """
+    Unvalidated, ``__slots__`` -based version of :class:`.Pupil` made by pupil extractors
+    for each frame. Convert to a :class:`.Pupil` with :meth:`.to_pupil` , eg. when making a :class:`.Dilation`
+
+    Args:
+        ellipse (:class:`.Raw_Ellipse`): Fit ellipse given frame
+        frame (:class:`.Raw_Frame`): Frame the pupil was extracted from
+    """
+    __slots__ = ('ellipse', 'frame')
+
+    def __init__(self, ellipse: typing.Union[Raw_Ellipse, Ellipse], frame: typing.Union[Raw_Frame, Frame]):
+        self.ellipse = ellipse
+        self.frame = frame
+
+    def to_pupil(self) -> Pupil:
+        """Validated :class:`.Pupil` , converting the ellipse and frame if they are raw"""
+        ellipse = self.ellipse.to_ellipse() if isinstance(self.ellipse, Raw_Ellipse) else self.ellipse
+        frame = self.frame.to_frame() if isinstance(self.frame, Raw_Frame) else self.frame
+        return Pupil(ellipse=ellipse, frame=frame)
+
+
+class EllipseExtractor_Params(BaseModel):
+    """
+    Parameters for :class:`.video.pupil.EllipseExtractor` .
+
+    Kept here rather than with the extractor so that prefs can use them
+    without importing the image processing libraries the extractor needs.
+
+    Attributes:
+        footprint_size (int): Size of the footprint used in morphological operations
+        search_scale (float): Scale of the previous pupil's ellipse to search for edges within
+    """
+    footprint_size:int = 5
+    search_scale:float = 1.5
+
+    class Config:
+        # so a union of extractor params in prefs can tell them apart
+        extra = 'forbid'
+
+
+class Starburst_Params(BaseModel):
+    """
+    Parameters for :class:`.video.pupil.Starburst_Extractor` .
+
+    Attributes:
+        n_rays (int): Number of rays cast outwards from the seed point
+        n_back (int): Number of rays cast back across the pupil from each edge point found by the outward rays
+        back_spread (float): Angle (radians) either side of the direction back to the seed to spread the back rays over
+        edge_threshold (float): Increase in intensity (0-255) over ``gradient_width`` pixels along a ray that is an edge
+        gradient_width (int): Distance (px) along a ray to take intensity differences over
+        min_radius (float): Smallest pupil radius (px), rays skip this far from where they start
+        max_radius (float): Largest pupil radius (px), rays are this long
+        iterations (int): Maximum number of times to move the seed to the center of the edge points and recast
+        tolerance (float): Stop iterating once the seed moves less than this (px)
+        ransac_iterations (int): Number of random 5-point ellipses to try
+        inlier_distance (float): Edge points closer than this (px) to an ellipse support it
+        min_inliers (float): Fraction of edge points that must support the best ellipse
+        coarse_stride (int): Stride (px) of the coarse search for the darkest region, when there's no previous pupil
+    """
+    n_rays: int = 32
+    n_back: int = 2
+    back_spread: float = 0.87
+    edge_threshold: float = 20
+    gradient_width: int = 2
+    min_radius: float = 3
+    max_radius: float = 80
+    iterations: int = 3
+    tolerance: float = 1
+    ransac_iterations: int = 50
+    inlier_distance: float = 1.5
+    min_inliers: float = 0.5
+    coarse_stride: int = 8
+
+    class Config:
+        extra = 'forbid'
+
+
+class Blink_Gate_Params(BaseModel):
+    """
+    Parameters for :class:`.video.pupil.Blink_Gate` , which skips pupil extraction for frames
+    where the eye is closed or covered.
+
+    Attributes:
+        dark_threshold (int): Pixels darker than this (0-255) are counted as pupil
+        min_ratio (float): Once a pupil has been found, frames whose dark fraction around it is less than this
+            fraction of its recent average are blinks
+        min_dark (float): Frames with a smaller dark fraction than this are blinks, eg. before any pupil has been found
+        max_dark (float): Frames with a larger dark fraction than this are occluded, eg. the camera is covered
+        search_scale (float): Scale of the last pupil's radius to check around
+        stride (int): Check every ``stride`` th pixel in each dimension around the last pupil
+        full_stride (int): Check every ``full_stride`` th pixel in each dimension of the whole frame,
+            when there is no recent pupil to check around
+        smoothing (float): Weight of each new frame in the running average dark fraction, 0-1
+        max_gated (int): After this many gated frames in a row, forget the last pupil and check the whole frame,
+            in case the pupil moved out of the box around it rather than the eye being closed
+    """
+    dark_threshold: int = 64
+    min_ratio: float = 0.5
+    min_dark: float = 0.001
+    max_dark: float = 0.9
+    search_scale: float = 1.5
+    stride: int = 2
+    full_stride: int = 8
+    smoothing: float = 0.1
+    max_gated: int = 15
+
+
 @dataclass
 class Pupil_Params:
     """
     Parameters to use with :class:`.video.pupil.PupilExtractor` classes to
     parameterize
 
+    A :class:`.Dilation` is a response if its peak diameter after the sound's onset is more
+    than ``threshold`` larger than the ``baseline`` diameter before it. Without a baseline
+    there is nothing to compare the peak to, so it isn't a response.
+
     Attributes:
-        threshold (float): Diameter threshold as a fraction of maximum diameter to consider
+        threshold (float): Diameter threshold, as a fraction of the baseline diameter, to consider
             a positive response to a stimulus
-        max_diameter (float): Maximum diameter of pupil in pixels
+        max_diameter (float): Maximum diameter of the pupil in pixels over the trial
+        baseline (float): Diameter of the pupil in pixels before the stimulus, eg. from
+            the frames before the sound's onset (see :attr:`.Collection_Params.baseline` )
     """
-    threshold: float
-    max_diameter: float
+    threshold: float = 0.05
+    max_diameter: typing.Optional[float] = None
+    baseline: typing.Optional[float] = None
+
+
+class Dilation_Analysis_Params(BaseModel):
+    """
+    Parameters for :class:`.psychophys.dilation.Dilation_Analyzer`
+
+    Attributes:
+        fs (float): Rate (Hz) to resample diameters to before filtering
+        cutoff (float): Cutoff frequency (Hz) of the lowpass filter
+        order (int): Order of the butterworth lowpass filter, applied forwards and backwards
+        max_deviation (float): Diameters more than this fraction away from the trial's median diameter are
+            treated as dropouts, eg. a spurious ellipse or a partly closed eyelid
+        max_velocity (float): Diameters that change by more than this fraction of the median diameter
+            per second are treated as blinks
+        blink_margin (float): Seconds around a blink or dropout to also discard, as the pupil is partly
+            covered while the eyelid opens and closes
+        max_gap (float): Longest gap (s) between usable diameters to interpolate over, a trial with a longer
+            gap is not analyzed
+        min_latency (float): Earliest time (s) after the onset to look for the peak dilation,
+            as the pupil can't respond faster than this
+    """
+    fs: float = 30
+    cutoff: float = 4
+    order: int = 2
+    max_deviation: float = 0.5
+    max_velocity: float = 5
+    blink_margin: float = 0.1
+    max_gap: float = 0.5
+    min_latency: float = 0.2
+
+
+class Dilation_Features(PerceptivoType):
+    """
+    Features of a pupil's response to a sound, from :class:`.psychophys.dilation.Dilation_Analyzer`
+
+    Features are ``None`` if the trial couldn't be analyzed, eg. because
+    a blink was longer than :attr:`.Dilation_Analysis_Params.max_gap`
+
+    Attributes:
+        valid (bool): Whether the trial could be analyzed
+        baseline (float): Median filtered diameter (px) before the onset
+        peak (float): Peak dilation after :attr:`.Dilation_Analysis_Params.min_latency` , relative to the baseline
+        peak_latency (float): Seconds from the onset to the peak
+        latency (float): Seconds from the onset until the dilation first reaches half of the peak
+        blink_fraction (float): Fraction of diameters that were discarded as blinks or dropouts
+        max_gap (float): Longest gap (s) between usable diameters
+    """
+    valid: bool
+    baseline: typing.Optional[float] = None
+    peak: typing.Optional[float] = None
+    peak_latency: typing.Optional[float] = None
+    latency: typing.Optional[float] = None
+    blink_fraction: float = 0
+    max_gap: typing.Optional[float] = None
 
 
 @dataclass
@@ -50,24 +221,52 @@ class Dilation:
 
     Attributes:
         ellipses (typing.List[Pupil]): List of ellipses from a pupil measurement
-        timestamps (typing.List[datetime.datetime]): List of timestamps of equal length to ``ellipses``
+        timestamps (typing.List[int]): List of monotonic timestamps (ns, see :mod:`perceptivo.clock` ) of equal length to ``ellipses``
+        onset (int): Monotonic time (ns) of the sound's onset, if known. Pupils before it are the
+            baseline, see :meth:`.baseline_diameters`
         sound (:class:`.types.sound.Sound`): Sound that was presented for this pupil response
+        blinks (typing.List[int]): Monotonic timestamps (ns) of frames skipped as blinks or occlusions by a
+            :class:`.video.pupil.Blink_Gate`
+        features (:class:`.Dilation_Features`): Features from a :class:`.psychophys.dilation.Dilation_Analyzer` , if analyzed
 
     Properties:
-        max_diameter (float): maximum diameter reached during a given sample
+        max_diameter (float): maximum diameter reached after the onset during a given sample,
+            ``None`` if there are no pupils after the onset
         diameters (typing.List[float]): List of diameters in pixels of equal length to ``timestamps``
-        response (bool): True/False whether the sound was heard, calculated by dividing
-            the maximum measured pupil dilation in pixels / maximum possible dilation in pixels
-            and comparing to the detection threshold. Aka
-            ( :attr:`.Dilation.max_diameter` / :attr:`.Pupil_Params.max_diameter` ) >
-            :attr:`.Pupil_Params.threshold`
+        response (bool): True/False whether the sound was heard. With valid :attr:`.features` , whether
+            the :attr:`.Dilation_Features.peak` is greater than the :attr:`.Pupil_Params.threshold` , otherwise with a :attr:`.Pupil_Params.baseline` ,
+            whether the peak dilation relative to the baseline is greater than the threshold, aka
+            ( :attr:`.Dilation.max_diameter` - :attr:`.Pupil_Params.baseline` ) / :attr:`.Pupil_Params.baseline` >
+            :attr:`.Pupil_Params.threshold` . ``False`` without either, or without any pupils after the onset.
 
 
     """
 
     params: Pupil_Params
     pupils: typing.List[Pupil]
-    timestamps: typing.List[datetime]
+    timestamps: typing.List[int]
+    onset: typing.Optional[int] = None
+    features: typing.Optional[Dilation_Features] = None
+    blinks: typing.Optional[typing.List[int]] = None
+
+    @property
+    def times(self) -> np.ndarray:
+        """
+        :attr:`.timestamps` as an int64 array of ns
+        """
+        return np.asarray(self.timestamps, dtype=np.int64)
+
+    def since(self, onset: int) -> np.ndarray:
+        """
+        Seconds from an onset (eg. the sound's :attr:`.Sound.timestamp` ) to each timestamp
+
+        Args:
+            onset (int): monotonic time in ns
+
+        Returns:
+            :class:`numpy.ndarray` of float seconds
+        """
+        return to_seconds(self.times, onset)
 
     @property
     def diameters(self) -> typing.List[float]:
@@ -80,10 +279,108 @@ class Dilation:
         return [pupil.ellipse.a for pupil in self.pupils]
 
     @property
-    def max_diameter(self) -> float:
-        return np.max(self.diameters)
+    def baseline_diameters(self) -> np.ndarray:
+        """
+        Diameters before the :attr:`.onset` , empty if the onset isn't known
+        """
+        if self.onset is None:
+            return np.array([], dtype=float)
+        return np.asarray(self.diameters, dtype=float)[self.times < self.onset]
+
+    @property
+    def max_diameter(self) -> typing.Optional[float]:
+        diameters = np.asarray(self.diameters, dtype=float)
+        if self.onset is not None:
+            diameters = diameters[self.times >= self.onset]
+        if len(diameters) == 0:
+            return None
+        return float(np.max(diameters))
 
     @property
     def response(self) -> bool:
-        return (self.max_diameter / self.params.max_diameter) > self.params.threshold
+        if self.features is not None and self.features.valid:
+            return self.features.peak > self.params.threshold
+        if self.params.baseline is None:
+            return False
+        max_diameter = self.max_diameter
+        if max_diameter is None:
+            return False
+        return ((max_diameter - self.params.baseline) / self.params.baseline) > self.params.threshold
+
+
+
+class Pupil_Calibration_State(PerceptivoType):
+    """
+    Summary of a :class:`.psychophys.calibration.Pupil_Calibration` , sent to the clinician
+    with each trial's data. Statistics are ``None`` until there are enough trials to compute them.
+
+    Attributes:
+        n_trials (int): Number of trials with a baseline the calibration has been updated with
+        calibrated (bool): Whether the threshold is estimated from the patient's noise (``True``) or is still the
+            default :attr:`.Collection_Params.threshold` (``False``)
+        threshold (float): Current threshold, as a fraction of the baseline diameter
+        baseline_mean (float): Mean of trials' baseline diameters, in pixels
+        baseline_std (float): Standard deviation of trials' baseline diameters, in pixels
+        baseline_median (float): Median of trials' baseline diameters, in pixels
+        noise_std (float): Standard deviation of pupil diameters before the onset, relative to their trial's baseline
+        peak_mean (float): Mean peak dilation after the onset, relative to the baseline
+        peak_median (float): Median peak dilation after the onset, relative to the baseline
+        peak_p90 (float): 90th percentile of peak dilation after the onset, relative to the baseline
+    """
+    n_trials: int = 0
+    calibrated: bool = False
+    threshold: float
+    baseline_mean: typing.Optional[float] = None
+    baseline_std: typing.Optional[float] = None
+    baseline_median: typing.Optional[float] = None
+    noise_std: typing.Optional[float] = None
+    peak_mean: typing.Optional[float] = None
+    peak_median: typing.Optional[float] = None
+    peak_p90: typing.Optional[float] = None
+
+
+def benchmark_raw_types(n: int = 2000, repeats: int = 5) -> typing.Dict[str, typing.Dict[str, float]]:
+    """
+    Measure the time (μs) to build each hot-path type, validated and raw:
+
+    * ``frame`` - :class:`.Frame` and :class:`.Raw_Frame` for a 640x480 grayscale frame
+    * ``ellipse`` - :class:`.Ellipse` and :class:`.Raw_Ellipse`
+    * ``pupil`` - the whole frame -> ellipse -> pupil chain built for every frame,
+      :class:`.Pupil` and :class:`.Raw_Pupil`
+
+    Args:
+        n (int): Number of times to build each type per run
+        repeats (int): Number of runs, the fastest is used
+
+    Returns:
+        dict like ``{'frame': {'validated': float, 'raw': float}, ...}``
+    """
+    array = np.zeros((480, 640), dtype=np.uint8)
+    timestamp = now_ns()
+
+    factories = {
+        'frame': (
+            lambda: Frame(frame=array, timestamp=timestamp, color=False),
+            lambda: Raw_Frame(frame=array, timestamp=timestamp, color=False)
+        ),
+        'ellipse': (
+            lambda: Ellipse(x=1, y=2, a=3., b=4., t=0.5),
+            lambda: Raw_Ellipse(x=1, y=2, a=3., b=4., t=0.5)
+        ),
+        'pupil': (
+            lambda: Pupil(
+                ellipse=Ellipse(x=1, y=2, a=3., b=4., t=0.5),
+                frame=Frame(frame=array, timestamp=timestamp, color=False)),
+            lambda: Raw_Pupil(
+                ellipse=Raw_Ellipse(x=1, y=2, a=3., b=4., t=0.5),
+                frame=Raw_Frame(frame=array, timestamp=timestamp, color=False))
+        )
+    }
 
+    results = {}
+    for name, (validated, raw) in factories.items():
+        results[name] = {
+            'validated': min(timeit.repeat(validated, number=n, repeat=repeats)) / n * 1e6,
+            'raw': min(timeit.repeat(raw, number=n, repeat=repeats)) / n * 1e6
+        }
+    return results
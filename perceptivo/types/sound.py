@@ -6,12 +6,12 @@ from pydantic import BaseModel
 from pathlib import Path
 import typing
 import uuid
-from datetime import datetime
 
-from perceptivo.sound import sounds
+from perceptivo.clock import now_ns, NS_PER_S
+
 if typing.TYPE_CHECKING:
     from autopilot.stim.sound.jackclient import JackClient
-from autopilot.stim.sound.base import Sound
+    from autopilot.stim.sound.base import Sound as Autopilot_Sound
 
 
 def _find_jackd() -> Path:
@@ -29,8 +29,23 @@ class Audio_Config:
 
     Params:
         fs (int): Sampling rate in Hz, default 44100
+        blocksize (int): Size of the output stream's buffer in samples, or ``None`` to use the
+            audio backend's default. :class:`.Jackd_Config` uses ``period`` instead.
     """
     fs: int = 44100
+    blocksize: typing.Optional[int] = None
+
+    @property
+    def latency(self) -> float:
+        """
+        Configured output latency in seconds, added to the time a sound is
+        handed to the audio backend to get its onset (see :meth:`.Sound.stamp_time` ).
+
+        Without a fixed buffer we can't know it ahead of time, so 0, and the
+        latency is read from the output stream when the sound is played instead
+        (see :func:`.sound.soundcard.play_table` ).
+        """
+        return 0
 
 
 @dataclass
@@ -46,6 +61,8 @@ class Jackd_Config(Audio_Config):
             Also accepts ints for use with coreaudio
         nperiods (int): Number of periods per buffer cycle, default 3
         period (int): size of period, default 1024 samples.
+        startup_timeout (float): Seconds to wait for jackd to be ready before raising an error,
+            see :func:`.sound.server.boot_jackd`
         launch_str (str): launch string with arguments compiled from the other arguments
     """
     bin: Path = field(default_factory= _find_jackd)
@@ -56,6 +73,15 @@ class Jackd_Config(Audio_Config):
     period: int = 1024
     playback_only: bool = True
     outchannels: list = field(default_factory=lambda: [0,1])
+    startup_timeout: float = 10
+
+    @property
+    def latency(self) -> float:
+        """
+        Playback latency of jackd in seconds: a sound buffered now starts playing
+        after the ``nperiods`` periods already queued for the device, ie. ``period * nperiods / fs``
+        """
+        return (self.period * self.nperiods) / self.fs
 
     @property
     def launch_str(self) -> str:
@@ -74,12 +100,12 @@ class Jackd_Config(Audio_Config):
                     f'-r{self.fs}',
                     f'-n{self.nperiods}',
                     f'-p{self.period}',
-                    '-s &'
+                    '-s'
                 ])
         elif self.driver == "coreaudio":
             launch_str = ' '.join([
                 base_str,
-                f'-P1 -C0 -r{self.fs} -p{self.period} -I{self.device_name} -s &'
+                f'-P1 -C0 -r{self.fs} -p{self.period} -I{self.device_name} -s'
                 ])
         else:
             raise ValueError(f'dont know what to do with driver type {self.driver}')
@@ -102,23 +128,34 @@ class Sound(BaseModel):
 
     Attributes:
         uuid (str): Unique UUID to identify sounds
+        timestamp (int): Estimated onset time of the sound in monotonic ns (see :mod:`perceptivo.clock` ), see :meth:`.stamp_time`
+        latency (float): Output latency (s) that was added to the time the sound was played to get :attr:`.timestamp`
     """
     frequency: float
     amplitude: float
     duration: float = 0.5
     sound_type: SOUND_TYPES = "Gammatone"
-    timestamp: typing.Optional[datetime] = None
-    jack_client: typing.Optional['JackClient'] = None
-    uuid: str = Field(default_factory=uuid.uuid4)
+    timestamp: typing.Optional[int] = None
+    latency: float = 0
+    # not sent with the sound, and only resolvable where jack is installed
+    jack_client: typing.Optional['JackClient'] = Field(None, exclude=True)
+    uuid: str = Field(default_factory=lambda: str(uuid.uuid4()))
 
     class Config:
         arbitrary_types_allowed:bool = True
 
-    def stamp_time(self):
+    def stamp_time(self, latency:float=0):
         """
         Record the time that the sound is played in :attr:`.Sound.timestamp`
+
+        Should be called right after the sound is handed to the audio backend,
+        and given the latency between then and when the sound reaches the speaker
+
+        Args:
+            latency (float): Seconds between now and the sound's onset, stored in :attr:`.Sound.latency`
         """
-        self.timestamp = datetime.now()
+        self.latency = latency
+        self.timestamp = now_ns() + round(latency * NS_PER_S)
 
     @property
     def sound_kwargs(self) -> dict:
@@ -141,7 +178,7 @@ class Sound(BaseModel):
         }
 
     @property
-    def sound_class(self) -> Sound:
+    def sound_class(self) -> typing.Type['Autopilot_Sound']:
         """
         The sound class that corresponds to the :attr:`.sound_type` retrieved from
         the :mod:`perceptivo.sound.sounds` module.
@@ -149,6 +186,8 @@ class Sound(BaseModel):
         Returns:
             :class:`autopilot.stim.sound.sounds.Jack_Sound` - The sound class!
         """
+        # imported here so the sound types don't need autopilot until a sound is synthesized
+        from perceptivo.sound import sounds
         return getattr(sounds, self.sound_type)
 
 
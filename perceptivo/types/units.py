@@ -4,7 +4,6 @@ Very basic units or unit-like things
 # from dataclasses import dataclass
 from pydantic.dataclasses import dataclass
 import typing
-from skimage.draw import ellipse
 import numpy as np
 
 
@@ -46,6 +45,38 @@ class Ellipse:
         Returns:
             tuple of two ndarrays, coordinates in the 0th and 1st axis of the mask points
         """
+        from skimage.draw import ellipse
         return ellipse(self.y, self.x, self.b*scale, self.a*scale, rotation=self.t)
 
 
+class Raw_Ellipse:
+    """
+    Unvalidated, ``__slots__`` -based version of :class:`.Ellipse` for hot paths,
+    eg. one for every frame a pupil is extracted from. Convert with :meth:`.to_ellipse`
+
+    Args:
+        x (int): Ellipse center in pixels
+        y (int): Ellipse center in pixels
+        a (float): Major axis in pixels
+        b (float): Minor axis in pixels
+        t (float): Orientation in radians, clockwise from vertical
+    """
+    __slots__ = ('x', 'y', 'a', 'b', 't')
+
+    def __init__(self, x: int, y: int, a: float, b: float, t: float):
+        self.x = x
+        self.y = y
+        self.a = a
+        self.b = b
+        self.t = t
+
+    mask = Ellipse.mask
+
+    def to_ellipse(self) -> Ellipse:
+        """Validated :class:`.Ellipse` with the same parameters"""
+        return Ellipse(x=self.x, y=self.y, a=self.a, b=self.b, t=self.t)
+
+    def __repr__(self) -> str:
+        return f'Raw_Ellipse(x={self.x}, y={self.y}, a={self.a}, b={self.b}, t={self.t})'
+
+
@@ -2,14 +2,13 @@ from dataclasses import field
 from enum import Enum
 from pydantic.dataclasses import dataclass
 from pydantic import BaseModel, Field, PrivateAttr
-from datetime import datetime
 import typing
 from pathlib import Path
 
 
 import numpy as np
-import cv2
 
+from perceptivo.clock import now_ns
 from perceptivo.types.root import PerceptivoType
 
 class Frame(PerceptivoType):
@@ -18,12 +17,12 @@ class Frame(PerceptivoType):
 
     Attributes:
         frame (:class:`numpy.ndarray`): Frame!
-        timestamp (:class:`datetime.datetime`): Time of acquisition
+        timestamp (int): Time of acquisition in monotonic ns, see :mod:`perceptivo.clock`
         color (bool): If ``False`` , grayscale (frame should be 2 dimensional or 3rd axis should be len  == 1 ).
             if ``True``, RGB Color.
     """
     frame: np.ndarray
-    timestamp: datetime = Field(default_factory=datetime.now)
+    timestamp: int = Field(default_factory=now_ns)
     color: typing.Optional[bool] = None
     cropped: typing.Optional['Frame'] = None
     _color: typing.Optional[np.ndarray] = None
@@ -77,6 +76,7 @@ class Frame(PerceptivoType):
         """
         if self._gray is None:
             if self.color:
+                import cv2
                 self._gray = cv2.cvtColor(self.frame, cv2.COLOR_BGR2GRAY)
             else:
                 self._gray = self.frame
@@ -105,18 +105,156 @@ class Frame(PerceptivoType):
         arbitrary_types_allowed:bool = True
 
 
+class Raw_Frame:
+    """
+    Unvalidated, ``__slots__`` -based version of :class:`.Frame` for hot paths, like
+    capturing and processing every frame from the camera, with the same attributes and methods.
+
+    Building a :class:`.Frame` validates its fields and sets up its private attributes,
+    which is measurable at camera frame rates. Convert to a :class:`.Frame` with :meth:`.to_frame`
+    at serialization boundaries.
+
+    Args:
+        frame (:class:`numpy.ndarray`): Frame!
+        timestamp (int): Time of acquisition in monotonic ns, default now
+        color (bool): If ``None`` , inferred from the shape of the frame, see :class:`.Frame`
+    """
+    __slots__ = ('frame', 'timestamp', 'color', 'cropped', 'dtype', '_color', '_gray', '_norm')
+
+    def __init__(self, frame: np.ndarray,
+                 timestamp: typing.Optional[int] = None,
+                 color: typing.Optional[bool] = None):
+        self.frame = frame
+        self.timestamp = now_ns() if timestamp is None else timestamp
+        if color is None:
+            color = frame.ndim == 3 and frame.shape[2] == 3
+        self.color = color
+        self.cropped = None # type: typing.Optional[Raw_Frame]
+        self.dtype = frame.dtype
+        self._norm = None
+        if color:
+            self._color = frame
+            self._gray = None
+        else:
+            self._gray = frame
+            self._color = None
+
+    def set_color(self, color):
+        if color and not self.color:
+            raise ValueError('Cant colorize grayscale images!')
+        elif not color and self.color:
+            self._color = self.frame.copy()
+            gray = self.gray
+            self.frame = gray
+            self.color = color
+
+    def norm(self):
+        """make frame 0-1"""
+        if self._norm is None:
+            if self.frame.dtype == 'uint8':
+                self._norm = self.frame.astype(float) / 255
+                self.frame = self._norm
+                self.dtype = 'float'
+
+    @property
+    def gray(self) -> np.ndarray:
+        """
+        Grayscale version of the frame, if color
+        """
+        if self._gray is None:
+            if self.color:
+                import cv2
+                self._gray = cv2.cvtColor(self.frame, cv2.COLOR_BGR2GRAY)
+            else:
+                self._gray = self.frame
+        return self._gray
+
+    def crop(self, bbox:typing.List[int]) -> 'Raw_Frame':
+        """
+        Crop with a bounding box (top, bottom, left, right), see :meth:`.Frame.crop`
+        """
+        self.cropped = Raw_Frame(
+            frame=self.frame[bbox[0]:bbox[1], bbox[2]:bbox[3]],
+            timestamp=self.timestamp,
+            color=self.color)
+        return self.cropped
+
+    def to_frame(self) -> Frame:
+        """
+        Validated :class:`.Frame` with the same frame, timestamp, and color
+        """
+        return Frame(frame=self.frame, timestamp=self.timestamp, color=self.color)
+
+
 Color_Mode = typing.Literal['rgb', 'grayscale']
 
+CAMERA_SOURCES = typing.Literal['picamera', 'file', 'synthetic', 'memmap']
+"""
+Where a :class:`perceptivo.video.cameras.Picamera_Process` gets frames from, see :mod:`perceptivo.video.sources`
+"""
+
+
+class Synthetic_Eye_Params(BaseModel):
+    """
+    Parameters for a :class:`perceptivo.video.sources.Synthetic_Eye_Source` , which draws
+    an IR-lit eye whose pupil dilates on a script.
+
+    Each dilation follows the pupil response function of Hoeks & Levelt (1993),
+    ``h(t) = t^n * exp(-n * t / t_max)`` , scaled to peak at ``amplitude`` pixels ``t_max`` seconds after its onset.
+
+    Attributes:
+        diameter (float): Baseline pupil diameter in pixels
+        dilations (list): ``(onset, amplitude)`` pairs, seconds from the start of the script and pixels
+        period (float): Seconds after which the script repeats, ``None`` to play it once
+        t_max (float): Seconds from onset to peak dilation
+        n (float): Shape of the pupil response function
+        iris_diameter (float): Iris diameter in pixels
+        wander (float): Amplitude (pixels) of slow movement of the eye
+        noise (float): Standard deviation of pixel noise, in gray levels
+        seed (int): Seed for the noise
+    """
+    diameter: float = 60
+    dilations: typing.List[typing.Tuple[float, float]] = [(1, 15)]
+    period: typing.Optional[float] = 4
+    t_max: float = 0.93
+    n: float = 10.1
+    iris_diameter: float = 220
+    wander: float = 5
+    noise: float = 4
+    seed: int = 0
+
 
 class Picamera_Params(BaseModel):
     """
-    Configuration for a :class:`perceptivo.video.cameras.PiCamera`
+    Configuration for a :class:`perceptivo.video.cameras.Picamera_Process`
+
+    Frames come from a PiCamera by default, or another ``source`` to run the
+    capture pipeline without one, eg. to load test it, see :mod:`perceptivo.video.sources`
+
+    Attributes:
+        source (:data:`.CAMERA_SOURCES`): One of
+
+            * ``'picamera'`` - an :class:`autopilot.hardware.cameras.PiCamera`
+            * ``'file'`` - a video file in ``source_file`` read with :class:`cv2.VideoCapture`
+            * ``'synthetic'`` - an eye drawn with ``synthetic``
+            * ``'memmap'`` - a ``.npy`` array of frames in ``source_file`` , read as a memmap
+
+        source_file (:class:`pathlib.Path`): File for ``'file'`` and ``'memmap'`` sources
+        realtime (bool): If ``True`` (default), sources other than the picamera produce frames at ``fps`` ,
+            otherwise as fast as they can
+        loop (bool): Whether ``'file'`` and ``'memmap'`` sources start over when they reach the end
+        synthetic (:class:`.Synthetic_Eye_Params`): Parameters for the ``'synthetic'`` source
     """
     sensor_mode: int = 0
     resolution: typing.Tuple[int, int] = (1280, 720)
     fps: int = 30
     format: Color_Mode = 'grayscale'
     output_file: typing.Optional[Path] = None
+    source: CAMERA_SOURCES = 'picamera'
+    source_file: typing.Optional[Path] = None
+    realtime: bool = True
+    loop: bool = True
+    synthetic: Synthetic_Eye_Params = Synthetic_Eye_Params()
 
 
 
@@ -7,16 +7,11 @@ from typing import Union
 from pathlib import Path
 from datetime import datetime
 import importlib
-import pdb
-import cv2
 
 import numpy as np
-from tqdm import tqdm
 import msgpack
 from pydantic.main import ModelMetaclass
 
-import requests
-
 def download(url:str, file_name:typing.Union[Path,str]) -> bool:
     """
     Download a file with a progress bar
@@ -27,6 +22,8 @@ def download(url:str, file_name:typing.Union[Path,str]) -> bool:
     References:
         https://gist.github.com/yanqd0/c13ed29e29432e3cf3e7c38467f42f51
     """
+    import requests
+    from tqdm import tqdm
 
     response = requests.get(url, stream=True)
     size = int(response.headers.get('content-length', 0))
@@ -76,8 +73,10 @@ def serialize(array: typing.Union[np.ndarray, typing.Any]) -> typing.Union[dict,
     if isinstance(array, np.ndarray):
         # return pack_array(array)
         # return {'__numpy__':blosc2.pack(array, 5)}
+        import cv2
         _, jpg_buf = cv2.imencode('.jpg', array)
-        return {'__numpy__':jpg_buf}
+        # as bytes, otherwise msgpack hands the encoded array back to us to encode again
+        return {'__numpy__':jpg_buf.tobytes()}
     elif isinstance(array, np.dtype):
         return {
             '__dtype__': str(array)
@@ -90,6 +89,14 @@ def serialize(array: typing.Union[np.ndarray, typing.Any]) -> typing.Union[dict,
             'type': type(array).__name__,
             'value':array.dict()
         }
+    elif hasattr(type(array), '__pydantic_model__'):
+        # pydantic dataclasses, including their InitVars (eg. :class:`.types.psychophys.Sample` 's response)
+        return {
+            '__perceptivo_type__': True,
+            'module': type(array).__module__,
+            'type': type(array).__name__,
+            'value': {name: getattr(array, name) for name in array.__dataclass_fields__}
+        }
     elif isinstance(array, datetime):
         return {
             '__datetime__': True,
@@ -116,6 +123,7 @@ def deserialize(obj):
         #     obj['array']
         # )
         # return blosc2.unpack(obj['__numpy__'])
+        import cv2
         arr = np.frombuffer(obj['__numpy__'], dtype='uint8')
         return cv2.imdecode(arr, -1)
     elif '__dtype__' in obj:
@@ -1,36 +1,60 @@
 """
 Picamera capture. Easy enough with Autopilot
+
+Frames can also come from a video file, a synthetic eye, or a memmapped recording to run
+the capture pipeline without a picamera, see :mod:`.video.sources`
 """
+import math
 import typing
+import time
 from typing import Optional
-from queue import Empty, Full
+from queue import Full
 
 import cv2
-from autopilot.hardware.cameras import PiCamera
 import multiprocessing as mp
-from perceptivo.types.video import Picamera_Params, Frame
+from perceptivo.types.video import Picamera_Params, Raw_Frame
 from perceptivo.types.networking import Socket
 from perceptivo.root import Perceptivo_Object
 from perceptivo.networking.node import Node
 from perceptivo.networking.messages import Message
-from perceptivo.data.logging import init_logger
-from datetime import datetime
+from perceptivo.data.logging import init_logger, get_log_queue, set_log_queue
+from perceptivo.data.metrics import get_metrics_queue, set_metrics_queue
+from perceptivo.data.buffer import Ring_Buffer
+from perceptivo.video.sources import Camera_Source, get_source
 
 class Picamera_Process(mp.Process, Perceptivo_Object):
     """
-    Separate process for the picamera
+    Separate process for the picamera, or another :class:`.sources.Camera_Source` chosen
+    by :attr:`.Picamera_Params.source`
+
+    While not :attr:`.collecting` , the last ``pretrigger`` seconds of frames are kept in
+    a :class:`.data.buffer.Ring_Buffer` , and when collection starts they are put in the queue
+    before any new frames, so the frames collected for a trial include a baseline from before its
+    sound without capturing any more frames.
+
+    Args:
+        params (:class:`.types.video.Picamera_Params`): Camera parameters
+        networking (:class:`.types.networking.Socket`): Socket to stream frames to, if any
+        queue_size (int): Maximum number of frames in :attr:`.q`
+        pretrigger (float): Seconds of frames to keep from before collection starts
     """
 
     def __init__(self,
                  params:Picamera_Params = Picamera_Params(),
                  networking: Optional[Socket] = None,
                  queue_size:int = 1024,
+                 pretrigger: float = 0,
                  **kwargs):
         super(Picamera_Process, self).__init__(daemon=True,**kwargs)
         self.params = params
         self.networking = networking
 
         self.queue_size = queue_size
+        self.pretrigger = pretrigger
+        self.pretrigger_size = math.ceil(pretrigger * params.fps)
+        """Number of frames kept in the pretrigger buffer"""
+        self._pre_frames = None # type: Optional[Ring_Buffer]
+        self._pre_times = None # type: Optional[Ring_Buffer]
 
         self.q = mp.Queue(maxsize=queue_size)
         """
@@ -46,13 +70,26 @@ class Picamera_Process(mp.Process, Perceptivo_Object):
 
         self._closing = mp.Event()
 
-        self.cam = None # type: typing.Optional[PiCamera]
+        self._log_queue = get_log_queue()
+        """Log queue so the process' records are written by the parent's listener, see :mod:`.data.logging`"""
+        self._metrics_queue = get_metrics_queue()
+        """Queue to publish metrics to the parent's registry, see :mod:`.data.metrics`"""
+
+        self.source = None # type: typing.Optional[Camera_Source]
 
         self.node = None # type: Optional[Node]
 
     def run(self):
         # reinint logger
-        self._logger = init_logger(self)
+        set_log_queue(self._log_queue)
+        self._logger = init_logger(self, rate_limit=True)
+        set_metrics_queue(self._metrics_queue)
+        metrics = self.metrics
+        n_frames = metrics.counter('frames')
+        n_dropped = metrics.counter('frames_dropped')
+        queue_depth = metrics.gauge('queue_depth')
+        fps = metrics.gauge('fps')
+        last_frames, last_time = 0, time.monotonic()
 
         if self.networking is not None:
             self.node = Node(
@@ -60,71 +97,102 @@ class Picamera_Process(mp.Process, Perceptivo_Object):
                 poll_mode=Node.Poll_Mode.NONE,
             )
 
-        self.cam = PiCamera(**self.params.dict())
-        self.cam.queue(self.queue_size)
-        self.cam.queueing.clear()
-
-        if self.params.output_file is not None:
-            if self.params.output_file.exists():
-                self.logger.debug('Prior output file exists, deleting...')
-                self.params.output_file.unlink()
-                self.cam.write(str(self.params.output_file))
-        self.cam.capture()
+        self.source = get_source(self.params.source)(self.params, queue_size=self.queue_size)
+        self.source.start()
+        self.logger.debug(f'Started camera source {self.params.source}')
 
         if self.params.format == "grayscale":
             color = False
         else:
             color = True
 
+        was_collecting = False
         try:
             while not self._closing.is_set():
-                if self.collecting.is_set():
-                    self.cam.queueing.set()
-                    try:
-                        timestamp, frame = self.cam.q.get(timeout=1/self.params.fps)
-                    except Empty:
-                        self.logger.debug('Queue was empty!')
-                        continue
-
-                    frame = Frame(
-                        frame=frame,
-                        timestamp=datetime.fromisoformat(timestamp),
-                        color = color
-                    )
+                # every frame is read so frames from the source are never stale,
+                # but only those read while collecting are put in the queue
+                frame = self.source.read()
+                if frame is None:
+                    if self.source.finished:
+                        break
+                    self.logger.debug('No frame from source!')
+                    continue
+
+                frame = Raw_Frame(
+                    frame=frame,
+                    timestamp=self.source.timestamp,
+                    color=color
+                )
+
+                collecting = self.collecting.is_set()
+                if collecting:
+                    if not was_collecting:
+                        n_dropped.inc(self._flush_pretrigger(color))
                     try:
                         self.q.put_nowait(frame)
                     except Full:
-                        self.logger.exception(f'Couldnt put frame in queue because it was full')
-
-                else:
-                    self.cam.queueing.clear()
-
-                    # passively clear q so when we start capturing again we're not processing stale frames
-                    try:
-                        _ = self.cam.q.get_nowait()
-                    except Empty:
-                        pass
-
-                    # just make a frame to stream if we can
-                    try:
-                        timestamp, frame = self.cam.frame
-                    except TypeError:
-                        continue
-                    frame = Frame(
-                        frame = frame,
-                        timestamp = datetime.fromisoformat(timestamp),
-                        color=color
-                    )
+                        n_dropped.inc()
+                        self.logger.exception('Couldnt put frame in queue because it was full')
+                elif self.pretrigger_size > 0:
+                    self._buffer(frame)
+                was_collecting = collecting
 
                 if self.node is not None:
                     _, jpg_buf = cv2.imencode('.jpg', frame.frame)
                     self.node.socket.send(jpg_buf)
 
+                n_frames.inc()
+                now = time.monotonic()
+                if now - last_time >= 1:
+                    fps.set((n_frames.value - last_frames) / (now - last_time))
+                    last_frames, last_time = n_frames.value, now
+                    try:
+                        queue_depth.set(self.q.qsize())
+                    except NotImplementedError:
+                        # qsize isn't implemented on macOS
+                        pass
+                    metrics.registry.publish()
+
         finally:
             # deinitialize camera
-            self.cam.stopping.set()
+            self.source.release()
 
 
+    def _buffer(self, frame: Raw_Frame):
+        """
+        Copy a frame into the pretrigger buffer, making it when the first frame's shape is known
+        """
+        if self._pre_frames is None or self._pre_frames.shape != frame.frame.shape:
+            self._pre_frames = Ring_Buffer(self.pretrigger_size, shape=frame.frame.shape,
+                                           dtype=frame.frame.dtype, fill=0)
+            self._pre_times = Ring_Buffer(self.pretrigger_size, dtype='int64', fill=0)
+        self._pre_frames.append(frame.frame)
+        self._pre_times.append(frame.timestamp)
+
+    def _flush_pretrigger(self, color: bool) -> int:
+        """
+        Put the frames in the pretrigger buffer into :attr:`.q` , oldest first, and empty it
+
+        Returns:
+            int: Number of frames dropped because the queue was full
+        """
+        if self._pre_frames is None or len(self._pre_frames) == 0:
+            return 0
+        frames = self._pre_frames.values()
+        times = self._pre_times.values()
+        self._pre_frames.clear()
+        self._pre_times.clear()
+
+        dropped = 0
+        for frame, timestamp in zip(frames, times):
+            try:
+                self.q.put_nowait(Raw_Frame(frame=frame, timestamp=int(timestamp), color=color))
+            except Full:
+                dropped += 1
+        if dropped > 0:
+            self.logger.warning(f'Dropped {dropped} pretrigger frames because the queue was full')
+        return dropped
+
     def release(self):
         """
         Stop running and release picamera resources
@@ -25,40 +25,60 @@ import numpy as np
 from skimage import exposure, morphology, filters, measure, draw
 
 from perceptivo.root import Perceptivo_Object
-from perceptivo.video import processors
-from perceptivo.types.video import Frame
-from perceptivo.types.pupil import Pupil
-from perceptivo.types.units import Ellipse
-import autopilot
+from perceptivo.types.video import Frame, Raw_Frame
+from perceptivo.types.pupil import Pupil, Raw_Pupil, EllipseExtractor_Params, Starburst_Params, Blink_Gate_Params
+from perceptivo.types.units import Ellipse, Raw_Ellipse
 
 
 class PupilExtractor(Perceptivo_Object):
     """
     Base class for pupil extraction strategies.
+
+    Pupils are extracted from every frame, so debug messages are rate limited.
+
+    If given a ``gate`` , frames it rejects (eg. blinks) aren't extracted from,
+    and :attr:`.gated` is ``True`` until the next frame is processed.
     """
+    _rate_limit_logs = True
 
     def __init__(self,
                  preprocessor:typing.Optional['Preprocessor']=None,
                  filter:typing.Optional['PupilFilter']=None,
+                 gate:typing.Optional['Blink_Gate']=None,
                  **kwargs):
         super(PupilExtractor, self).__init__(**kwargs)
         self.preprocessor = preprocessor
         self.filter = filter
+        self.gate = gate
+        self.gated = False
+        """Whether the last frame was skipped by the :attr:`.gate`"""
+        self._extraction_ms = None
+        self._gated_frames = None
 
-    def process(self, frame:Frame) -> typing.Union[Pupil, None]:
+    def process(self, frame:typing.Union[Frame, Raw_Frame]) -> typing.Union[Pupil, Raw_Pupil, None]:
         """
-        Call :meth:`.preprocess` and then :meth:`._process`, returning a Pupil estimate
+        Call :meth:`.preprocess` , check the frame with the :attr:`.gate` , and then :meth:`._process`, returning a Pupil estimate
 
         Args:
-            frame (:class:`.types.video.Frame`): Frame to process
+            frame (:class:`.types.video.Frame`, :class:`.types.video.Raw_Frame`): Frame to process
 
         Returns:
-            :class:`.types.pupil.Pupil` Pupil Estimate
+            :class:`.types.pupil.Pupil` or :class:`.types.pupil.Raw_Pupil` Pupil Estimate, or ``None`` if
+            no pupil was found or the frame was gated (see :attr:`.gated` )
         """
-        if self.preprocessor is not None:
-            frame = self.preprocessor.process(frame)
+        if self._extraction_ms is None:
+            self._extraction_ms = self.metrics.histogram('extraction_ms')
+            self._gated_frames = self.metrics.counter('gated_frames')
+        with self._extraction_ms.time():
+            if self.preprocessor is not None:
+                frame = self.preprocessor.process(frame)
+
+            self.gated = self.gate is not None and not self.gate.check(frame)
+            if self.gated:
+                self._gated_frames.inc()
+                return None
 
-        pupil = self._process(frame)
+            pupil = self._process(frame)
 
         if pupil is None:
             return None
@@ -66,6 +86,9 @@ class PupilExtractor(Perceptivo_Object):
         if self.filter is not None:
             pupil = self.filter.process(pupil)
 
+        if self.gate is not None:
+            self.gate.update(pupil)
+
         return pupil
 
 
@@ -123,14 +146,124 @@ class Preprocessor(Perceptivo_Object):
         pass
 
 
+class Blink_Gate(Perceptivo_Object):
+    """
+    Cheap check for whether a frame is worth extracting a pupil from.
+
+    In an IR image the pupil is the darkest thing around, so the fraction of dark pixels
+    (darker than :attr:`.Blink_Gate_Params.dark_threshold` ) around the last pupil that was found drops
+    when the eyelid closes over it, and rises to nearly everything when the camera is covered.
+    Only every :attr:`.Blink_Gate_Params.stride` th pixel of a box around the last pupil is checked,
+    (or every :attr:`.Blink_Gate_Params.full_stride` th pixel of the whole frame before a pupil is found),
+    a few thousand pixels at most.
+
+    A frame is a blink if its dark fraction is below :attr:`.Blink_Gate_Params.min_dark` or below
+    :attr:`.Blink_Gate_Params.min_ratio` of the running average for frames where a pupil was found,
+    and occluded if its dark fraction is above :attr:`.Blink_Gate_Params.max_dark` .
+    A pupil that moves out of the box looks like a blink, so after :attr:`.Blink_Gate_Params.max_gated`
+    gated frames in a row the gate is :meth:`.reset` and checks the whole frame again.
+
+    Give to a :class:`.PupilExtractor` as its ``gate`` , which calls :meth:`.check` before
+    and :meth:`.update` after extracting each pupil.
+
+    Args:
+        params (:class:`.types.pupil.Blink_Gate_Params`): Thresholds and sampling of the gate
+    """
+    _rate_limit_logs = True
+
+    def __init__(self, params: typing.Optional[Blink_Gate_Params] = None, **kwargs):
+        super(Blink_Gate, self).__init__(**kwargs)
+        if params is None:
+            params = Blink_Gate_Params()
+        self.params = params
+
+        self.dark_fraction = None # type: typing.Optional[float]
+        """Dark fraction of the last frame checked"""
+        self.expected = None # type: typing.Optional[float]
+        """Running average dark fraction around the last pupil for frames where a pupil was found"""
+        self._center = None # type: typing.Optional[typing.Tuple[float, float]]
+        self._radius = None # type: typing.Optional[float]
+        self._n_gated = 0
+
+    def roi(self, shape: typing.Tuple[int, ...]) -> typing.Tuple[slice, slice]:
+        """
+        Strided slices of a frame with ``shape`` to check, a box around the last pupil if there is one,
+        otherwise the whole frame.
+        """
+        if self._center is None:
+            return (slice(None, None, self.params.full_stride), slice(None, None, self.params.full_stride))
+
+        x, y = self._center
+        radius = self._radius * self.params.search_scale
+        return (
+            slice(max(0, int(y - radius)), min(shape[0], int(y + radius) + 1), self.params.stride),
+            slice(max(0, int(x - radius)), min(shape[1], int(x + radius) + 1), self.params.stride)
+        )
+
+    def measure(self, frame: typing.Union[Frame, Raw_Frame]) -> float:
+        """
+        Fraction of checked pixels that are darker than :attr:`.Blink_Gate_Params.dark_threshold`
+        """
+        pixels = frame.frame[self.roi(frame.frame.shape)]
+        if pixels.size == 0:
+            return 0.
+        if pixels.ndim == 3:
+            # only the sampled pixels, cheaper than converting the whole frame to grayscale
+            pixels = pixels.mean(axis=-1)
+        return np.count_nonzero(pixels < self.params.dark_threshold) / pixels.size
+
+    def check(self, frame: typing.Union[Frame, Raw_Frame]) -> bool:
+        """
+        Whether a pupil should be extracted from the frame
+
+        Returns:
+            bool: ``False`` if the frame is a blink or occluded
+        """
+        self.dark_fraction = self.measure(frame)
+        if self.dark_fraction > self.params.max_dark:
+            self.logger.debug('Occluded frame, dark fraction %f', self.dark_fraction)
+        elif self.dark_fraction < self.params.min_dark:
+            self.logger.debug('Blink, dark fraction %f', self.dark_fraction)
+        elif self.expected is not None and self.dark_fraction < self.params.min_ratio * self.expected:
+            self.logger.debug('Blink, dark fraction %f vs. expected %f', self.dark_fraction, self.expected)
+        else:
+            self._n_gated = 0
+            return True
+
+        self._n_gated += 1
+        if self._n_gated >= self.params.max_gated and self._center is not None:
+            self.logger.debug('%d frames gated in a row, checking the whole frame', self._n_gated)
+            self.reset()
+        return False
+
+    def update(self, pupil: typing.Union[Pupil, Raw_Pupil]):
+        """
+        Move the region that is checked to a newly found pupil, and update the running average dark fraction
+        """
+        ellipse = pupil.ellipse
+        self._center = (ellipse.x, ellipse.y)
+        self._radius = max(ellipse.a, ellipse.b)
+        self._n_gated = 0
+
+        # the dark fraction of the frame the pupil came from, measured around the pupil
+        fraction = self.measure(pupil.frame)
+        if self.expected is None:
+            self.expected = fraction
+        else:
+            self.expected += self.params.smoothing * (fraction - self.expected)
+
+    def reset(self):
+        """Forget the last pupil, eg. when the patient or camera moves"""
+        self._center = None
+        self._radius = None
+        self.expected = None
+        self._n_gated = 0
+
+
 # --------------------------------------------------
 # Extractors
 # --------------------------------------------------
 
-class EllipseExtractor_Params(BaseModel):
-    footprint_size:int = 5
-    search_scale:float = 1.5
-
 class EllipseExtractor(PupilExtractor):
     """
     Very simple extractor that estimates an ellipse from the edges of a pupil.
@@ -164,6 +297,7 @@ class EllipseExtractor(PupilExtractor):
         * Read a few years ago, might be worth revisiting: https://cdn.intechopen.com/pdfs/33559/InTech-Methods_for_ellipse_detection_from_edge_maps_of_real_images.pdf
 
     """
+    params_type = EllipseExtractor_Params
 
     def __init__(
             self,
@@ -208,18 +342,20 @@ class EllipseExtractor(PupilExtractor):
 
 
 
-    def _process(self, frame:Frame) -> typing.Union[Pupil, None]:
+    def _process(self, frame:typing.Union[Frame, Raw_Frame]) -> typing.Union[Raw_Pupil, None]:
         self.logger.debug('process start')
         # preallocate for speed!
-        if self._filter_arr is None or self._filter_arr.shape != frame.frame.shape:
-            self._filter_arr = np.zeros_like(frame.frame)
+        gray = frame.gray
+        if self._filter_arr is None or self._filter_arr.shape != gray.shape:
+            self._filter_arr = np.zeros_like(gray)
 
-        if self._edge_arr is None or self._edge_arr.shape != frame.frame.shape:
-            self._edge_arr = np.zeros_like(frame.frame)
+        # edges are floats, which would be truncated to 0 in the frame's uint8
+        if self._edge_arr is None or self._edge_arr.shape != gray.shape:
+            self._edge_arr = np.zeros(gray.shape, dtype=float)
         self.logger.debug('arrays allocated')
 
         # median filter (always copies, so we dont' need to)
-        self._filter_arr[:] = filters.rank.median(frame.gray, footprint=self.footprint)
+        self._filter_arr[:] = filters.rank.median(gray, footprint=self.footprint)
         self.logger.debug('median filter completed')
 
         # scharr to detect edges, then filter and skeletonize to 1px wide
@@ -243,12 +379,12 @@ class EllipseExtractor(PupilExtractor):
             return None
 
         # create and return our pupil object
-        pupil = Pupil(
-            ellipse= Ellipse(
-                x=ellipse.params[1],
-                y=ellipse.params[0],
-                a=ellipse.params[3],
-                b=ellipse.params[2],
+        pupil = Raw_Pupil(
+            ellipse= Raw_Ellipse(
+                x=ellipse.params[0],
+                y=ellipse.params[1],
+                a=ellipse.params[2],
+                b=ellipse.params[3],
                 t=ellipse.params[4]
             ),
             frame=frame
@@ -304,16 +440,16 @@ class EllipseExtractor(PupilExtractor):
 
             # Estimate ellipse from edge points
             pts = np.where(edges==i)
-            pts = np.column_stack(pts[1], pts[0])
+            pts = np.column_stack((pts[1], pts[0]))
             model = measure.EllipseModel()
             ok = model.estimate(pts)
             if not ok:
                 continue
 
-            # compute median value inside ellipse
+            # compute median value inside ellipse, params are (x, y, a, b, theta), see Ellipse.mask
             rr, cc = draw.ellipse(
                 model.params[1], model.params[0],
-                model.params[2], model.params[3],
+                model.params[3], model.params[2],
                 rotation=model.params[4])
             # clip to avoid indexing errors
             rr, cc = np.clip(rr, 0, edges.shape[0]-1), np.clip(cc, 0, edges.shape[1]-1)
@@ -330,6 +466,260 @@ class EllipseExtractor(PupilExtractor):
         return ells[lowest_idx]
 
 
+class Starburst_Extractor(PupilExtractor):
+    """
+    Sparse extractor that finds the pupil's edge by casting rays from a point inside it,
+    after the Starburst algorithm, touching only the pixels along the rays rather than filtering the whole frame.
+
+    In order
+
+    * Start from a seed point: the center of the last pupil, or else the darkest region in a coarse,
+      strided view of the frame (:attr:`.Starburst_Params.coarse_stride` )
+    * Cast :attr:`.Starburst_Params.n_rays` rays out from the seed, and take the first place along each
+      where the intensity rises by more than :attr:`.Starburst_Params.edge_threshold` (dark pupil to brighter iris)
+      as an edge point
+    * From each edge point, cast :attr:`.Starburst_Params.n_back` rays back across the pupil to find
+      edge points on the other side, which keeps the edge points from bunching up on the side nearest the seed
+    * Move the seed to the center of the edge points and repeat, up to :attr:`.Starburst_Params.iterations` times
+    * Fit an ellipse to the edge points with RANSAC (:func:`.fit_ellipse_ransac` ), so edges of the glint or
+      eyelashes don't pull the ellipse away from the pupil.
+
+    With the defaults, each pass reads a few thousand pixels.
+
+    References:
+
+        * Li, D., Winfield, D., & Parkhurst, D. J. (2005). Starburst: A hybrid algorithm for video-based eye tracking
+          combining feature-based and model-based approaches. CVPR Workshops.
+        * Fischler, M. A., & Bolles, R. C. (1981). Random sample consensus. Communications of the ACM, 24(6), 381-395.
+
+    Args:
+        **kwargs: Fields of :class:`.types.pupil.Starburst_Params` , and arguments to :class:`.PupilExtractor`
+    """
+    params_type = Starburst_Params
+
+    def __init__(self, preprocessor: typing.Optional[Preprocessor] = None,
+                 filter: typing.Optional[PupilFilter] = None,
+                 gate: typing.Optional['Blink_Gate'] = None,
+                 **kwargs):
+        params = {key: kwargs.pop(key) for key in list(kwargs.keys()) if key in Starburst_Params.__fields__}
+        super(Starburst_Extractor, self).__init__(preprocessor=preprocessor, filter=filter, gate=gate, **kwargs)
+        self.params = Starburst_Params(**params)
+
+        self.last_ellipse = None # type: typing.Optional[Raw_Ellipse]
+        """Ellipse found in the last frame, used as the next seed"""
+        self.points = None # type: typing.Optional[np.ndarray]
+        """Edge points (x, y) found in the last frame"""
+
+        self._angles = np.linspace(0, 2 * np.pi, self.params.n_rays, endpoint=False)
+        self._back_offsets = np.linspace(-self.params.back_spread, self.params.back_spread, self.params.n_back) \
+            if self.params.n_back > 1 else np.zeros(self.params.n_back)
+        self._radii = np.arange(0, 2 * self.params.max_radius + self.params.gradient_width + 1, dtype=float)
+        self._rng = np.random.default_rng(0)
+
+    def _process(self, frame: typing.Union[Frame, Raw_Frame]) -> typing.Union[Raw_Pupil, None]:
+        gray = frame.gray
+        if self.last_ellipse is not None:
+            seed = np.array([self.last_ellipse.x, self.last_ellipse.y], dtype=float)
+        else:
+            seed = self.coarse_seed(gray)
+
+        points = None
+        for _ in range(self.params.iterations):
+            points = self.edge_points(gray, seed)
+            if len(points) < 5:
+                self.logger.debug('Too few edge points found')
+                self.last_ellipse = None
+                return None
+            new_seed = points.mean(axis=0)
+            moved = np.hypot(*(new_seed - seed))
+            seed = new_seed
+            if moved < self.params.tolerance:
+                break
+        self.points = points
+
+        fit = fit_ellipse_ransac(
+            points, self.params.ransac_iterations, self.params.inlier_distance, rng=self._rng)
+        if fit is None:
+            self.logger.debug('No ellipse fit the edge points')
+            self.last_ellipse = None
+            return None
+
+        ellipse, inliers = fit
+        if (np.count_nonzero(inliers) < self.params.min_inliers * len(points)
+                or not self.params.min_radius <= ellipse.b <= ellipse.a <= self.params.max_radius
+                or not (0 <= ellipse.x < gray.shape[1] and 0 <= ellipse.y < gray.shape[0])):
+            self.logger.debug('Rejected ellipse (%f, %f, %f, %f)', ellipse.x, ellipse.y, ellipse.a, ellipse.b)
+            self.last_ellipse = None
+            return None
+
+        self.last_ellipse = ellipse
+        return Raw_Pupil(ellipse=ellipse, frame=frame)
+
+    def coarse_seed(self, gray: np.ndarray) -> np.ndarray:
+        """
+        Center (x, y) of the darkest ``3 x 3`` block of a strided view of the frame,
+        the blocks being roughly pupil sized at the default stride
+        """
+        stride = self.params.coarse_stride
+        small = gray[::stride, ::stride].astype(np.float32)
+        size = min(3, *small.shape)
+        # box sums from a summed area table
+        table = np.zeros((small.shape[0] + 1, small.shape[1] + 1), dtype=np.float32)
+        np.cumsum(np.cumsum(small, axis=0), axis=1, out=table[1:, 1:])
+        boxes = table[size:, size:] - table[:-size, size:] - table[size:, :-size] + table[:-size, :-size]
+        row, col = np.unravel_index(np.argmin(boxes), boxes.shape)
+        return np.array([(col + (size - 1) / 2) * stride, (row + (size - 1) / 2) * stride], dtype=float)
+
+    def edge_points(self, gray: np.ndarray, seed: np.ndarray) -> np.ndarray:
+        """
+        Cast rays out from the ``seed`` and back across the pupil from the edges they find
+
+        Returns:
+            :class:`numpy.ndarray` of (x, y) edge points, shape ``(n, 2)``
+        """
+        n_rays = len(self._angles)
+        origins = np.broadcast_to(seed, (n_rays, 2))
+        points, found = self.cast(gray, origins, self._angles, self.params.max_radius)
+        points = points[found]
+        if self.params.n_back == 0 or len(points) == 0:
+            return points
+
+        # from each edge, back towards the seed, far enough to cross the pupil
+        back = np.arctan2(seed[1] - points[:, 1], seed[0] - points[:, 0])
+        angles = (back[:, np.newaxis] + self._back_offsets[np.newaxis, :]).ravel()
+        origins = np.repeat(points, len(self._back_offsets), axis=0)
+        length = min(2 * self.params.max_radius, 2.5 * np.median(np.hypot(*(points - seed).T)))
+        more, found = self.cast(gray, origins, angles, length)
+        return np.concatenate((points, more[found]))
+
+    def cast(self, gray: np.ndarray, origins: np.ndarray, angles: np.ndarray,
+             length: float) -> typing.Tuple[np.ndarray, np.ndarray]:
+        """
+        Find the first dark-to-bright edge along rays, skipping :attr:`.Starburst_Params.min_radius` from their origin
+
+        Args:
+            gray (:class:`numpy.ndarray`): Grayscale frame
+            origins (:class:`numpy.ndarray`): (x, y) start of each ray, shape ``(n, 2)``
+            angles (:class:`numpy.ndarray`): Direction of each ray (radians)
+            length (float): Length of the rays (px)
+
+        Returns:
+            tuple of the (x, y) edge point along each ray, shape ``(n, 2)`` , and whether an edge was found along each
+        """
+        width = self.params.gradient_width
+        radii = self._radii[(self._radii >= self.params.min_radius) & (self._radii <= length + width)]
+        directions = np.column_stack((np.cos(angles), np.sin(angles)))
+        if len(radii) <= width:
+            return np.zeros((len(angles), 2)), np.zeros(len(angles), dtype=bool)
+
+        cols = np.rint(origins[:, 0, np.newaxis] + directions[:, 0, np.newaxis] * radii).astype(np.intp)
+        rows = np.rint(origins[:, 1, np.newaxis] + directions[:, 1, np.newaxis] * radii).astype(np.intp)
+        inside = (rows >= 0) & (rows < gray.shape[0]) & (cols >= 0) & (cols < gray.shape[1])
+        values = gray[np.clip(rows, 0, gray.shape[0] - 1), np.clip(cols, 0, gray.shape[1] - 1)].astype(np.int16)
+
+        gradient = values[:, width:] - values[:, :-width]
+        gradient[~(inside[:, width:] & inside[:, :-width])] = 0
+        above = gradient > self.params.edge_threshold
+        found = above.any(axis=1)
+
+        # the steepest point of the first edge along each ray
+        first = np.argmax(above, axis=1)
+        window = np.clip(first[:, np.newaxis] + np.arange(width + 1), 0, gradient.shape[1] - 1)
+        steepest = window[np.arange(len(angles)), np.argmax(np.take_along_axis(gradient, window, axis=1), axis=1)]
+        edge = radii[steepest] + width / 2
+        return origins + directions * edge[:, np.newaxis], found
+
+
+def fit_ellipse_ransac(points: np.ndarray, iterations: int = 50, inlier_distance: float = 1.5,
+                       rng: typing.Optional[np.random.Generator] = None
+                       ) -> typing.Optional[typing.Tuple[Raw_Ellipse, np.ndarray]]:
+    """
+    Fit an ellipse to points with RANSAC
+
+    Conics through random sets of five points are found all at once from the null spaces of their
+    design matrices, the one that is an ellipse with the most points within ``inlier_distance``
+    (by the Sampson approximation of the distance to a conic) is refit to those points by least squares.
+
+    Args:
+        points (:class:`numpy.ndarray`): (x, y) points, shape ``(n, 2)``
+        iterations (int): Number of random 5-point samples to try
+        inlier_distance (float): Distance (px) from an ellipse for a point to support it
+        rng (:class:`numpy.random.Generator`): Random number generator, for reproducible fits
+
+    Returns:
+        tuple of a :class:`.types.units.Raw_Ellipse` with semi-axes ``a >= b`` and a boolean array of
+        which points are inliers, or ``None`` if no ellipse could be fit
+    """
+    if len(points) < 5:
+        return None
+    if rng is None:
+        rng = np.random.default_rng()
+
+    # center and scale so the design matrices are well conditioned
+    center = points.mean(axis=0)
+    scale = np.std(points - center) or 1.
+    x, y = ((points - center) / scale).T
+    design = np.column_stack((x * x, x * y, y * y, x, y, np.ones_like(x)))
+    threshold = inlier_distance / scale
+
+    samples = np.argsort(rng.random((iterations, len(points))), axis=1)[:, :5]
+    conics = np.linalg.svd(design[samples])[2][:, -1, :]
+    distances = _sampson_distance(conics, design, x, y)
+    counts = np.count_nonzero(distances < threshold, axis=1)
+    counts[conics[:, 1] ** 2 - 4 * conics[:, 0] * conics[:, 2] >= 0] = -1
+    best = np.argmax(counts)
+    if counts[best] < 5:
+        return None
+
+    conic = conics[best]
+    inliers = distances[best] < threshold
+    refit = np.linalg.svd(design[inliers])[2][-1]
+    if refit[1] ** 2 - 4 * refit[0] * refit[2] < 0:
+        conic = refit
+        inliers = _sampson_distance(conic[np.newaxis, :], design, x, y)[0] < threshold
+
+    ellipse = _conic_to_ellipse(conic)
+    if ellipse is None:
+        return None
+    cx, cy, a, b, t = ellipse
+    return Raw_Ellipse(x=cx * scale + center[0], y=cy * scale + center[1], a=a * scale, b=b * scale, t=t), inliers
+
+
+def _sampson_distance(conics: np.ndarray, design: np.ndarray, x: np.ndarray, y: np.ndarray) -> np.ndarray:
+    """
+    First-order approximation of the distance from each point to each conic, ``|Q| / |grad Q|`` ,
+    shape ``(n_conics, n_points)``
+    """
+    A, B, C, D, E = (conics[:, i, np.newaxis] for i in range(5))
+    residual = conics @ design.T
+    grad_x = 2 * A * x + B * y + D
+    grad_y = B * x + 2 * C * y + E
+    return np.abs(residual) / np.maximum(np.hypot(grad_x, grad_y), 1e-12)
+
+
+def _conic_to_ellipse(conic: np.ndarray) -> typing.Optional[typing.Tuple[float, float, float, float, float]]:
+    """
+    Center, semi-major and semi-minor axes, and angle of the major axis of the ellipse
+    ``A x^2 + B xy + C y^2 + D x + E y + F = 0`` , or ``None`` if it isn't a real ellipse
+    """
+    A, B, C, D, E, F = conic
+    det = 4 * A * C - B * B
+    if det <= 0:
+        return None
+    cx = (B * E - 2 * C * D) / det
+    cy = (B * D - 2 * A * E) / det
+    # value of the conic at its center
+    center_value = F + (D * cx + E * cy) / 2
+    eigenvalues, eigenvectors = np.linalg.eigh(np.array([[A, B / 2], [B / 2, C]]))
+    squared = -center_value / eigenvalues
+    if np.any(squared <= 0):
+        return None
+    axes = np.sqrt(squared)
+    major = int(np.argmax(axes))
+    angle = float(np.arctan2(eigenvectors[1, major], eigenvectors[0, major]))
+    return float(cx), float(cy), float(axes[major]), float(axes[1 - major]), angle
+
+
 class EnsembleExtractor_NonIR(PupilExtractor):
     """
     Extractor that uses an ensemble of techniques to track a pupil.
@@ -364,6 +754,9 @@ class EnsembleExtractor_NonIR(PupilExtractor):
         if hough_kwargs is None:
             hough_kwargs = {}
 
+        # only this extractor needs autopilot's transforms and the processors' cv2/scipy/hough dependencies
+        import autopilot
+        from perceptivo.video import processors
         self.eyemask_kalman = autopilot.get('transform', 'Kalman')(
             dim_state = 4) # type: 'autopilot.transform.timeseries.Kalman'
 
@@ -449,10 +842,11 @@ class EnsembleExtractor_NonIR(PupilExtractor):
 
 class Pupil_Extractors(Enum):
     simple = EllipseExtractor
+    starburst = Starburst_Extractor
 
 
 
-def get_extractor(extractor = Pupil_Extractors) -> Union[typing.Type[EllipseExtractor]]:
+def get_extractor(extractor = Pupil_Extractors) -> Union[typing.Type[EllipseExtractor], typing.Type[Starburst_Extractor]]:
     """
 
     .. todo::
@@ -461,13 +855,14 @@ def get_extractor(extractor = Pupil_Extractors) -> Union[typing.Type[EllipseExtr
 
     Args:
         extractor (str, :class:`.Pupil_Extractors`) : str corresponding to one of the
-            entries in :class:`.Pupil_Extractors`, eg ``'simple'``
+            entries in :class:`.Pupil_Extractors`, eg ``'simple'`` or ``'starburst'``
 
     Returns:
-
+        The extractor class, whose ``params_type`` is the type of its parameters
     """
-
-    if extractor == Pupil_Extractors.simple.name:
-        return Pupil_Extractors.simple.value
+    if isinstance(extractor, Pupil_Extractors):
+        return extractor.value
+    elif extractor in Pupil_Extractors.__members__:
+        return Pupil_Extractors[extractor].value
     else:
         raise ValueError(f'Dont know what extractor you mean by {extractor}, needs to be one of Pupil_Extractors')
\ No newline at end of file
@@ -0,0 +1,370 @@
+"""
+Sources of frames for a :class:`.cameras.Picamera_Process` , chosen with :attr:`.Picamera_Params.source`
+
+* :class:`.PiCamera_Source` - a PiCamera, with :class:`autopilot.hardware.cameras.PiCamera`
+* :class:`.Video_File_Source` - a video file read with :class:`cv2.VideoCapture`
+* :class:`.Synthetic_Eye_Source` - an IR-lit eye whose pupil dilates on a script, see :class:`.Synthetic_Eye_Params`
+* :class:`.Memmap_Source` - a ``.npy`` array of frames, read as a memmap. Make one from any
+  other source with :func:`.record`
+
+Sources other than the PiCamera let the capture -> queue -> extraction pipeline (and the whole patient runtime)
+be run and load tested without one. They produce frames at :attr:`.Picamera_Params.fps` if
+:attr:`.Picamera_Params.realtime` , or else as fast as they can.
+"""
+import typing
+from abc import abstractmethod
+from datetime import datetime
+from enum import Enum
+from pathlib import Path
+from queue import Empty
+from time import perf_counter, sleep
+
+import numpy as np
+
+from perceptivo.clock import now_ns, get_anchor
+from perceptivo.root import Perceptivo_Object
+from perceptivo.types.video import Picamera_Params, Synthetic_Eye_Params, CAMERA_SOURCES
+
+
+class Camera_Source(Perceptivo_Object):
+    """
+    Base class for frame sources.
+
+    Subclasses implement :meth:`._read` to return the next frame, and optionally :meth:`.start`
+    and :meth:`.release` . :meth:`.read` paces frames and converts them to :attr:`.Picamera_Params.format` ,
+    and stamps them with :meth:`._timestamp` in :attr:`.timestamp`
+
+    Args:
+        params (:class:`.types.video.Picamera_Params`): Camera parameters
+        queue_size (int): Frames to buffer, for sources that buffer frames
+    """
+
+    realtime = True
+    """Whether the source should be paced by :meth:`.read` , ``False`` for sources that are paced by hardware"""
+
+    def __init__(self, params: Picamera_Params, queue_size: int = 1024, **kwargs):
+        super(Camera_Source, self).__init__(**kwargs)
+        self.params = params
+        self.queue_size = queue_size
+        self.color = params.format != 'grayscale'
+        self.n_frames = 0
+        self.finished = False
+        """Set when a source that doesn't loop runs out of frames"""
+        self.timestamp = None # type: typing.Optional[int]
+        """Capture time of the last frame from :meth:`.read` in monotonic ns, see :mod:`perceptivo.clock`"""
+        self._next_time = None # type: typing.Optional[float]
+
+    def start(self):
+        """Start capturing, if the source needs to"""
+
+    def release(self):
+        """Stop capturing and release any resources"""
+
+    @abstractmethod
+    def _read(self, timeout: float) -> typing.Optional[np.ndarray]:
+        """
+        Get the next frame as it comes from the source, or ``None`` if there isn't one within ``timeout`` seconds
+        """
+
+    def _timestamp(self) -> int:
+        """
+        Capture time of the frame just returned by :meth:`._read` in monotonic ns.
+
+        Sources that make their own frames are stamped as they're read, sources that
+        buffer frames should override this to use the time the frame was captured.
+        """
+        return now_ns()
+
+    def read(self, timeout: typing.Optional[float] = None) -> typing.Optional[np.ndarray]:
+        """
+        Get the next frame
+
+        Args:
+            timeout (float): Seconds to wait for a frame, defaults to one frame period
+
+        Returns:
+            :class:`numpy.ndarray` frame, or ``None`` if there wasn't one
+        """
+        if timeout is None:
+            timeout = 1 / self.params.fps
+        if self.realtime and self.params.realtime:
+            self._pace()
+        frame = self._read(timeout)
+        if frame is None:
+            return None
+        self.timestamp = self._timestamp()
+        self.n_frames += 1
+        return self._format(frame)
+
+    def _pace(self):
+        """Wait until the next frame is due, starting over rather than catching up if we fall behind"""
+        now = perf_counter()
+        if self._next_time is None or now - self._next_time > 1 / self.params.fps:
+            self._next_time = now
+        else:
+            sleep(max(self._next_time - now, 0))
+        self._next_time += 1 / self.params.fps
+
+    def _format(self, frame: np.ndarray) -> np.ndarray:
+        if not self.color and frame.ndim == 3:
+            import cv2
+            return cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        elif self.color and frame.ndim == 2:
+            import cv2
+            return cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR)
+        return frame
+
+
+class PiCamera_Source(Camera_Source):
+    """
+    Frames from a PiCamera, queued in a thread by :class:`autopilot.hardware.cameras.PiCamera`
+    """
+    realtime = False
+
+    def __init__(self, params: Picamera_Params, queue_size: int = 1024, **kwargs):
+        super(PiCamera_Source, self).__init__(params, queue_size, **kwargs)
+        self.cam = None
+        self._capture_time = None # type: typing.Optional[typing.Union[str, datetime]]
+
+    def start(self):
+        from autopilot.hardware.cameras import PiCamera
+        self.cam = PiCamera(**self.params.dict(include={'sensor_mode', 'resolution', 'fps', 'format', 'output_file'}))
+        self.cam.queue(self.queue_size)
+        self.cam.queueing.set()
+
+        if self.params.output_file is not None:
+            if self.params.output_file.exists():
+                self.logger.debug('Prior output file exists, deleting...')
+                self.params.output_file.unlink()
+            self.cam.write(str(self.params.output_file))
+        self.cam.capture()
+
+    def _read(self, timeout: float) -> typing.Optional[np.ndarray]:
+        try:
+            self._capture_time, frame = self.cam.q.get(timeout=timeout)
+        except Empty:
+            return None
+        return frame
+
+    def _timestamp(self) -> int:
+        """
+        Convert the wall-clock time the camera's capture thread stamped the frame with to monotonic ns,
+        frames can wait in its queue for a variable time before they're read.
+        """
+        capture_time = self._capture_time
+        if isinstance(capture_time, str):
+            capture_time = datetime.fromisoformat(capture_time)
+        return get_anchor().from_datetime(capture_time)
+
+    def release(self):
+        if self.cam is not None:
+            self.cam.stopping.set()
+
+
+class Video_File_Source(Camera_Source):
+    """
+    Frames from a video file in :attr:`.Picamera_Params.source_file` , read with :class:`cv2.VideoCapture`
+    """
+
+    def __init__(self, params: Picamera_Params, queue_size: int = 1024, **kwargs):
+        super(Video_File_Source, self).__init__(params, queue_size, **kwargs)
+        if params.source_file is None:
+            raise ValueError('Need a source_file to read frames from a video file')
+        self.path = Path(params.source_file)
+        self.capture = None
+
+    def start(self):
+        import cv2
+        if not self.path.exists():
+            raise FileNotFoundError(f'Video file {self.path} does not exist')
+        self.capture = cv2.VideoCapture(str(self.path))
+
+    def _read(self, timeout: float) -> typing.Optional[np.ndarray]:
+        if self.finished:
+            return None
+        ret, frame = self.capture.read()
+        if not ret and self.params.loop:
+            import cv2
+            self.capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, frame = self.capture.read()
+        if not ret:
+            self.finished = True
+            self.logger.info(f'Finished reading {self.n_frames} frames from {self.path}')
+            return None
+        return frame
+
+    def release(self):
+        if self.capture is not None:
+            self.capture.release()
+            self.capture = None
+
+
+class Synthetic_Eye_Source(Camera_Source):
+    """
+    An IR-lit eye drawn at :attr:`.Picamera_Params.resolution` : a dark pupil in a gray iris with a
+    corneal glint and pixel noise, whose pupil dilates as scripted by :attr:`.Picamera_Params.synthetic` .
+
+    Time in the script is counted in frames at :attr:`.Picamera_Params.fps` , so the same frames are
+    produced whether or not the source is realtime. The true diameter of each frame is given by :meth:`.diameter` .
+    """
+
+    PUPIL_LEVEL = 25
+    IRIS_LEVEL = 90
+    SCLERA_LEVEL = 160
+    GLINT_LEVEL = 250
+    N_NOISE = 16
+    """Number of noise frames to generate and cycle through"""
+
+    def __init__(self, params: Picamera_Params, queue_size: int = 1024, **kwargs):
+        super(Synthetic_Eye_Source, self).__init__(params, queue_size, **kwargs)
+        self.eye = params.synthetic # type: Synthetic_Eye_Params
+        self.width, self.height = params.resolution
+        self._background = None # type: typing.Optional[np.ndarray]
+        self._noise = None # type: typing.Optional[np.ndarray]
+        self._offset = 0
+
+    def start(self):
+        import cv2
+        rng = np.random.default_rng(self.eye.seed)
+        # noise is added with saturating uint8 addition, so offset levels by the noise's mean
+        self._offset = int(round(self.eye.noise * 2))
+        self._noise = np.clip(
+            rng.normal(self._offset, self.eye.noise, (self.N_NOISE, self.height, self.width)), 0, 255
+        ).astype(np.uint8)
+
+        background = np.full((self.height, self.width), self.SCLERA_LEVEL - self._offset, dtype=np.uint8)
+        cv2.circle(background, (self.width // 2, self.height // 2), int(self.eye.iris_diameter / 2),
+                   self.IRIS_LEVEL - self._offset, -1, lineType=cv2.LINE_AA)
+        self._background = background
+
+    def response(self, t: typing.Union[float, np.ndarray]) -> typing.Union[float, np.ndarray]:
+        """
+        Pupil response function, normalized to peak at 1 ``t_max`` seconds after an onset at ``t = 0``
+        """
+        t = np.asarray(t, dtype=float)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            x = t / self.eye.t_max
+            h = np.exp(self.eye.n * (np.log(x) - x + 1))
+        return np.where(t > 0, h, 0.)
+
+    def diameter(self, t: typing.Union[float, np.ndarray]) -> typing.Union[float, np.ndarray]:
+        """
+        Scripted pupil diameter in pixels at ``t`` seconds from the start
+        """
+        t = np.asarray(t, dtype=float)
+        if self.eye.period is not None:
+            t = t % self.eye.period
+        diameter = np.full(t.shape, self.eye.diameter)
+        for onset, amplitude in self.eye.dilations:
+            diameter = diameter + amplitude * self.response(t - onset)
+            if self.eye.period is not None:
+                # a response that runs past the end of the period continues into the next one
+                diameter = diameter + amplitude * self.response(t + self.eye.period - onset)
+        return diameter
+
+    def frame(self, index: int) -> np.ndarray:
+        """
+        Draw the ``index`` th frame
+        """
+        import cv2
+        if self._background is None:
+            self.start()
+        t = index / self.params.fps
+        radius = float(self.diameter(t)) / 2
+        center = (
+            self.width / 2 + self.eye.wander * np.sin(2 * np.pi * t / 7.3),
+            self.height / 2 + self.eye.wander * np.sin(2 * np.pi * t / 5.1)
+        )
+        frame = self._background.copy()
+        # draw with subpixel precision, the radius changes by less than a pixel between frames
+        shift = 4
+        scale = 2 ** shift
+        cv2.circle(frame, (int(center[0] * scale), int(center[1] * scale)), int(radius * scale),
+                   self.PUPIL_LEVEL - self._offset, -1, lineType=cv2.LINE_AA, shift=shift)
+        glint = (int((center[0] + radius * 0.4) * scale), int((center[1] - radius * 0.4) * scale))
+        cv2.circle(frame, glint, int(max(radius * 0.12, 2) * scale),
+                   self.GLINT_LEVEL - self._offset, -1, lineType=cv2.LINE_AA, shift=shift)
+        cv2.add(frame, self._noise[index % self.N_NOISE], dst=frame)
+        return frame
+
+    def _read(self, timeout: float) -> np.ndarray:
+        return self.frame(self.n_frames)
+
+
+class Memmap_Source(Camera_Source):
+    """
+    Frames from a ``.npy`` array in :attr:`.Picamera_Params.source_file` , shaped ``(frames, height, width[, 3])`` ,
+    read as a memmap so arbitrarily long recordings can be replayed without loading them into memory.
+    """
+
+    def __init__(self, params: Picamera_Params, queue_size: int = 1024, **kwargs):
+        super(Memmap_Source, self).__init__(params, queue_size, **kwargs)
+        if params.source_file is None:
+            raise ValueError('Need a source_file to replay frames from')
+        self.path = Path(params.source_file)
+        self.frames = None # type: typing.Optional[np.memmap]
+
+    def start(self):
+        self.frames = np.load(self.path, mmap_mode='r')
+
+    def _read(self, timeout: float) -> typing.Optional[np.ndarray]:
+        if self.finished:
+            return None
+        index = self.n_frames
+        if index >= self.frames.shape[0]:
+            if not self.params.loop:
+                self.finished = True
+                self.logger.info(f'Finished replaying {self.n_frames} frames from {self.path}')
+                return None
+            index %= self.frames.shape[0]
+        # copy out of the memmap so frames can be modified and pickled
+        return np.array(self.frames[index])
+
+    def release(self):
+        self.frames = None
+
+
+class Camera_Sources(Enum):
+    picamera = PiCamera_Source
+    file = Video_File_Source
+    synthetic = Synthetic_Eye_Source
+    memmap = Memmap_Source
+
+
+def get_source(source: CAMERA_SOURCES) -> typing.Type[Camera_Source]:
+    """
+    Get a camera source class by name, one of :data:`.types.video.CAMERA_SOURCES`
+    """
+    try:
+        return Camera_Sources[source].value
+    except KeyError:
+        raise ValueError(f'Dont know what camera source you mean by {source}, needs to be one of Camera_Sources')
+
+
+def record(source: Camera_Source, path: Path, n_frames: int) -> Path:
+    """
+    Write frames from a source to a ``.npy`` file that can be replayed with a :class:`.Memmap_Source` ,
+    eg. to render a :class:`.Synthetic_Eye_Source` once and replay it as fast as possible.
+
+    Args:
+        source (:class:`.Camera_Source`): Started source to record from
+        path (:class:`pathlib.Path`): ``.npy`` file to write
+        n_frames (int): Number of frames to record
+
+    Returns:
+        :class:`pathlib.Path` the file that was written
+    """
+    path = Path(path)
+    first = source.read(timeout=1)
+    if first is None:
+        raise RuntimeError(f'Could not read a frame from {source}')
+    out = np.lib.format.open_memmap(path, mode='w+', dtype=first.dtype, shape=(n_frames,) + first.shape)
+    out[0] = first
+    for i in range(1, n_frames):
+        frame = source.read(timeout=1)
+        if frame is None:
+            raise RuntimeError(f'Source ran out of frames after {i} frames')
+        out[i] = frame
+    out.flush()
+    del out
+    return path
@@ -0,0 +1,28 @@
+import json
+
+import pytest
+
+for module in ('cv2', 'skimage', 'sklearn', 'soundcard', 'autopilot'):
+    pytest.importorskip(module)
+
+from perceptivo.runtimes.benchmark import benchmark_patient, PHASES
+
+
+def test_benchmark_patient(tmp_path):
+    """
+    A headless exam should run to completion, time every phase of every trial,
+    and give results that can be written as JSON
+    """
+    results = benchmark_patient(n_trials=3, collection_wait=0.3, resolution=(160, 120),
+                                control_port=5652, eyecam_port=5552, timeout=60, directory=tmp_path)
+
+    assert results['completed']
+    assert results['n_trials'] == 3
+    assert results['trials_per_minute'] > 0
+    for phase in PHASES:
+        assert results['phases_ms'][phase]['n'] == 3, phase
+    # the trial waits for frames for at least the collection window
+    assert results['phases_ms']['collect']['median'] >= 300
+    assert results['processes']['picamera']['pid'] != results['processes']['patient']['pid']
+
+    json.loads(json.dumps(results))
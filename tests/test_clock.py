@@ -0,0 +1,37 @@
+from datetime import datetime
+
+import numpy as np
+
+from perceptivo.clock import Clock_Anchor, get_anchor, now_ns, to_seconds, NS_PER_S
+from perceptivo.types.pupil import Dilation, Pupil_Params
+
+
+def test_anchor_roundtrip():
+    """
+    Monotonic times should convert to datetimes and back, to within a microsecond
+    """
+    anchor = get_anchor()
+    assert get_anchor() is anchor
+
+    now = now_ns()
+    timestamp = anchor.to_datetime(now)
+    assert abs((timestamp - datetime.now()).total_seconds()) < 1
+    assert abs(anchor.from_datetime(timestamp) - now) < 1000
+
+    restored = Clock_Anchor(**anchor.dict())
+    assert restored.to_wall_ns(now) == anchor.to_wall_ns(now)
+
+
+def test_dilation_since():
+    """
+    Pupil measurements should align to a sound onset by integer subtraction
+    """
+    onset = now_ns()
+    timestamps = [onset + i * NS_PER_S // 10 for i in range(-5, 10)]
+    dilation = Dilation(params=Pupil_Params(threshold=0.5, max_diameter=100), pupils=[], timestamps=timestamps)
+
+    assert dilation.times.dtype == np.int64
+    since = dilation.since(onset)
+    assert since[5] == 0
+    assert np.allclose(since, np.arange(-5, 10) / 10)
+    assert np.array_equal(since, to_seconds(timestamps, onset))
@@ -0,0 +1,159 @@
+import logging
+
+import numpy as np
+import pytest
+
+from perceptivo import Directories
+from perceptivo.data.buffer import Ring_Buffer
+from perceptivo.data.stats import Welford, P2_Quantile
+from perceptivo.data import logging as plogging
+
+
+@pytest.mark.parametrize('chunk', [1, 7, 10, 25])
+def test_ring_buffer(chunk):
+    """
+    Appending in chunks of any size, including larger than the buffer,
+    should keep the newest values in order without reallocating.
+    """
+    buffer = Ring_Buffer(10)
+    initial = buffer.buffer
+
+    values = np.arange(53, dtype=float)
+    for i in range(0, len(values), chunk):
+        if chunk == 1:
+            buffer.append(values[i])
+        else:
+            buffer.extend(values[i:i+chunk])
+
+    assert buffer.buffer is initial
+    assert len(buffer) == 10
+    assert buffer.count == len(values)
+    assert np.array_equal(buffer.values(), values[-10:])
+
+    out = np.empty(10)
+    assert np.array_equal(buffer.values(out=out), values[-10:])
+
+    buffer.clear()
+    assert len(buffer) == 0
+    assert buffer.values().shape == (0,)
+
+
+def test_logging_queue(tmp_path, monkeypatch):
+    """
+    Records should be written to the module's file by the listener,
+    with rate limited debug messages dropped
+    """
+    monkeypatch.setattr(Directories, 'log_dir', tmp_path)
+    logger = plogging.init_logger(module_name='test_queue', class_name='Hot', loglevel='DEBUG', rate_limit=5)
+    for i in range(100):
+        logger.debug('frame %d', i)
+    logger.warning('not limited')
+    # stopping the listener writes all queued records
+    plogging.stop_listener()
+    plogging.start_listener()
+
+    lines = (tmp_path / 'test_queue.log').read_text().splitlines()
+    frames = [line for line in lines if 'frame' in line]
+    assert 5 <= len(frames) <= 6
+    assert lines[-1].endswith('not limited')
+
+
+def test_logging_benchmark():
+    """
+    Logging calls below the logger's level or dropped by the rate limit
+    should be cheaper than ones that are queued
+    """
+    results = plogging.benchmark_logging(n_calls=2000)
+    assert set(results.keys()) == {'file', 'queue', 'rate_limited', 'disabled'}
+    assert results['disabled'] < results['queue']
+    assert results['rate_limited'] < results['queue']
+
+
+def _publish_metrics():
+    from perceptivo.data.metrics import get_registry
+    registry = get_registry()
+    registry.counter('child.frames').inc(10)
+    registry.histogram('shared.latency_ms').observe(3)
+    registry.publish(interval=0)
+
+
+def test_metrics_across_processes():
+    """
+    Metrics published by a child process should be aggregated with the parent's
+    and served as text
+    """
+    import multiprocessing as mp
+    import time
+    import urllib.request
+    from perceptivo.data.metrics import get_registry, get_metrics_queue, Metrics_Server, quantile
+
+    get_metrics_queue()
+    registry = get_registry()
+    registry.histogram('shared.latency_ms').observe(30)
+
+    proc = mp.Process(target=_publish_metrics)
+    proc.start()
+    proc.join(5)
+
+    snapshot = {}
+    for _ in range(50):
+        snapshot = registry.snapshot()
+        if 'child.frames' in snapshot:
+            break
+        time.sleep(0.05)
+
+    assert snapshot['child.frames']['value'] == 10
+    assert snapshot['shared.latency_ms']['count'] == 2
+    assert quantile(snapshot['shared.latency_ms'], 1) == 30
+
+    server = Metrics_Server(registry, port=0)
+    server.start()
+    try:
+        text = urllib.request.urlopen(f'http://127.0.0.1:{server.port}/metrics').read().decode('utf-8')
+    finally:
+        server.stop()
+    assert 'perceptivo_child_frames 10' in text
+    assert 'perceptivo_shared_latency_ms_count 2' in text
+
+
+def test_welford():
+    """
+    Running mean and variance should match numpy's, including when merged from parts
+    and when the variance is tiny relative to the mean.
+    """
+    rng = np.random.default_rng(0)
+    values = 1e6 + rng.normal(0, 0.01, size=2000)
+
+    stats = Welford()
+    stats.update_many(values)
+    assert stats.n == len(values)
+    assert np.isclose(stats.mean, np.mean(values))
+    assert np.isclose(stats.var, np.var(values, ddof=1), rtol=1e-6)
+
+    first, second = Welford(), Welford()
+    first.update_many(values[:300])
+    second.update_many(values[300:])
+    merged = first.merge(second)
+    assert merged.n == stats.n
+    assert np.isclose(merged.mean, stats.mean)
+    assert np.isclose(merged.var, stats.var, rtol=1e-6)
+
+    assert np.isnan(Welford().var)
+
+
+@pytest.mark.parametrize('p', [0.1, 0.5, 0.9])
+def test_p2_quantile(p):
+    """
+    P² estimates should be close to the exact quantile, and exact for fewer than five values
+    """
+    rng = np.random.default_rng(1)
+    values = rng.normal(3, 0.5, size=5000)
+
+    quantile = P2_Quantile(p)
+    quantile.update_many(values)
+    assert abs(quantile.value - np.quantile(values, p)) < 0.02
+
+    small = P2_Quantile(p)
+    small.update_many(values[:4])
+    assert np.isclose(small.value, np.quantile(values[:4], p))
+
@@ -1,5 +1,8 @@
 from perceptivo.prefs import Clinician_Prefs
 from perceptivo.gui.main import Perceptivo_Clinician
+from perceptivo.networking.node import Node
+from perceptivo.networking.messages import Message
+from perceptivo.types.networking import Clinician_Networking, Socket
 
 from pytestqt import qt_compat
 from pytestqt.qt_compat import qt_api
@@ -17,3 +20,130 @@ def test_gui_launch(qtbot):
     qtbot.waitUntil(lambda: gui.isVisible(), timeout=10000)
 
 
+
+
+def test_gui_message_burst(qtbot):
+    """
+    A burst of messages should all be handled as soon as they arrive,
+    rather than one per polling period, with their latency recorded,
+    even if one of them is malformed
+    """
+    from perceptivo.networking.clock_sync import Clock_Sync, Clock_Sample
+    prefs = Clinician_Prefs()
+    networking = Clinician_Networking(
+        control=Socket(id='clinician:control', socket_type='ROUTER', protocol='tcp', mode='bind', port=5610)
+    )
+    gui = Perceptivo_Clinician(prefs=prefs, networking=networking)
+    qtbot.addWidget(gui)
+
+    patient = Node(
+        Socket(id='patient:control', socket_type='DEALER', protocol='tcp', mode='connect',
+               port=5610, ip='localhost', to='clinician:control'),
+        poll_mode=Node.Poll_Mode.NONE
+    )
+    # latency is only measured once the patient's clock offset is known, the same clock here
+    gui.clocks['patient:control'] = Clock_Sync('patient:control')
+    gui.clocks['patient:control'].add(Clock_Sample(0, 0, 0, 0))
+
+    patient.socket.send_multipart([b'clinician:control', b'\xc1'])
+    n_messages = 50
+    for i in range(n_messages):
+        patient.send(Message(key='CONNECT', id=f'patient_{i}'))
+
+    # 50 messages would take 2.5s to handle one per 50ms tick
+    qtbot.waitUntil(lambda: len(gui.senders) == n_messages, timeout=1000)
+    assert gui.latency['n'] == n_messages
+    assert 0 <= gui.latency['max'] < 1000
+    patient.release()
+
+
+def test_frame_receiver_coalesce(qtbot):
+    """
+    Frames decoded while one is waiting to be drawn should replace it,
+    and only signal the GUI once.
+    """
+    import numpy as np
+    receiver = Perceptivo_Clinician.Frame_Receiver(None, Clinician_Networking().eyecam)
+    signals = []
+    receiver.frame.connect(lambda: signals.append(True))
+
+    frames = [np.full((4, 4), i, dtype='uint8') for i in range(5)]
+    for frame in frames:
+        receiver._put(frame)
+
+    assert len(signals) == 1
+    assert receiver.n_dropped == len(frames) - 1
+    assert np.array_equal(receiver.take(), frames[-1])
+    assert receiver.take() is None
+
+    # after taking, the next frame signals again
+    receiver._put(frames[0])
+    assert len(signals) == 2
+
+
+def test_pupil_traces(qtbot):
+    """
+    The pupil plot should keep a fixed number of trial traces and stream points
+    however many samples it is given
+    """
+    from types import SimpleNamespace
+    from perceptivo.clock import now_ns, NS_PER_S
+    from perceptivo.gui.widgets import Pupil
+
+    widget = Pupil(stream_size=100, n_traces=3, trace_size=20)
+    qtbot.addWidget(widget)
+
+    start = now_ns()
+    for trial in range(10):
+        onset = start + trial * 2 * NS_PER_S
+        timestamps = [onset + i * NS_PER_S // 30 for i in range(30)]
+        widget.addSample(SimpleNamespace(
+            dilation=SimpleNamespace(timestamps=timestamps, diameters=list(range(30))),
+            sound=SimpleNamespace(timestamp=onset),
+            response=trial % 2 == 0
+        ))
+
+    assert widget.n_trials == 10
+    assert len(widget.stream_times) == 100
+    assert widget.trace_times.shape == (3, 20)
+    assert (widget.trace_lengths == 20).all()
+    # newest trace starts at onset
+    newest = (widget._trace_index - 1) % 3
+    assert widget.trace_times[newest, 0] == 0
+
+
+def test_audiogram_samples(qtbot):
+    """
+    Samples should be added to the audiogram incrementally, split by response,
+    and a posterior should be drawn when it is computed
+    """
+    import numpy as np
+    from types import SimpleNamespace
+    from perceptivo.gui.widgets import Audiogram
+
+    widget = Audiogram(default_amplitudes=(20, 80), default_frequencies=(500, 8000), max_samples=5)
+    qtbot.addWidget(widget)
+
+    for i in range(8):
+        widget.addSample(SimpleNamespace(
+            sound=SimpleNamespace(frequency=1000 + i, amplitude=50),
+            response=i % 2 == 0
+        ))
+    assert len(widget.sample_pos[True]) == 4
+    assert len(widget.sample_pos[False]) == 4
+
+    from perceptivo.types.psychophys import Posterior_Summary
+    freqs, amps = np.linspace(500, 8000, 10), np.linspace(20, 80, 10)
+    probability = np.tile(np.linspace(0, 1, 10), (10, 1))
+    summary = Posterior_Summary.from_arrays(
+        version=2, n_samples=8, frequencies=freqs, amplitudes=amps, probability=probability,
+        threshold_frequencies=[1000, 2000], thresholds=[50, np.nan]
+    )
+    widget.updatePosterior(summary)
+    assert widget.posterior.image.shape == (10, 10)
+    assert widget.posterior_version == 2
+
+    # stale summaries are ignored
+    stale = summary.copy(update={'version': 1, 'probability': np.zeros((10, 10), dtype='<f2').tobytes()})
+    widget.updatePosterior(stale)
+    assert widget.posterior.image.max() == 1
@@ -0,0 +1,61 @@
+"""
+Startup import time budgets, measured with ``python -X importtime`` in a fresh interpreter.
+
+Budgets can be scaled for slow machines with the ``PERCEPTIVO_IMPORT_BUDGET_SCALE`` environment variable.
+"""
+import os
+import subprocess
+import sys
+import typing
+
+import pytest
+
+BUDGET_SCALE = float(os.environ.get('PERCEPTIVO_IMPORT_BUDGET_SCALE', 1))
+
+HEAVY_MODULES = ('matplotlib', 'sklearn', 'skimage', 'pandas', 'pyqtgraph', 'autopilot', 'cv2')
+
+
+def import_time(module: str, repeats: int = 3) -> typing.Tuple[float, typing.List[str]]:
+    """
+    Time importing a module in a fresh interpreter with ``-X importtime``
+
+    Returns:
+        tuple of the fastest total import time (ms) of ``module`` across ``repeats``,
+        and which :data:`.HEAVY_MODULES` were imported
+    """
+    code = f'import sys, {module}; print(",".join(m for m in {HEAVY_MODULES!r} if m in sys.modules))'
+    times = []
+    heavy = []
+    for _ in range(repeats):
+        result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                                capture_output=True, text=True, check=True)
+        # lines look like "import time:  self [us] | cumulative | imported package",
+        # with nested imports indented, so the total is the sum of the unindented lines
+        total = 0
+        for line in result.stderr.splitlines()[1:]:
+            if not line.startswith('import time:'):
+                continue
+            _, cumulative, name = line[len('import time:'):].split('|')
+            if not name.startswith('  '):
+                total += int(cumulative) / 1000
+        times.append(total)
+        heavy = [m for m in result.stdout.strip().split(',') if m]
+    return min(times), heavy
+
+
+@pytest.mark.parametrize('module,budget,forbidden', [
+    ('perceptivo.prefs', 1500, HEAVY_MODULES),
+    ('perceptivo.types.psychophys', 1500, HEAVY_MODULES),
+    ('perceptivo.gui.main', 4000, ('matplotlib', 'sklearn', 'skimage', 'pandas', 'autopilot')),
+])
+def test_import_time(module, budget, forbidden):
+    """
+    Importing prefs and types shouldn't import heavy optional dependencies,
+    and the clinician GUI shouldn't import the patient's processing libraries.
+    """
+    if module.startswith('perceptivo.gui'):
+        pytest.importorskip('PySide6')
+
+    elapsed, heavy = import_time(module)
+    assert not set(heavy) & set(forbidden), f'{module} imported {set(heavy) & set(forbidden)}'
+    assert elapsed < budget * BUDGET_SCALE, f'importing {module} took {elapsed:.0f}ms, budget is {budget * BUDGET_SCALE:.0f}ms'
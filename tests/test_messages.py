@@ -52,3 +52,24 @@ def test_serialize_types():
     compare_dict(msg2.value, test_msg)
 
 
+
+
+def test_serialize_sample():
+    """
+    Samples (pydantic dataclasses) and their sounds should survive a round trip,
+    including the manual response, which is an InitVar rather than a field
+    """
+    from perceptivo.types.psychophys import Sample
+    from perceptivo.types.sound import Sound
+
+    sample = Sample(sound=Sound(frequency=1000, amplitude=20, timestamp=5), response=True)
+    msg = messages.Message(key='DATA', sample=sample)
+    msg2 = messages.Message.from_serialized(msg.serialize())
+
+    sample2 = msg2.value['sample']
+    assert isinstance(sample2, Sample)
+    assert sample2.response
+    assert sample2.sound.frequency == 1000
+    assert sample2.sound.timestamp == 5
+    assert sample2.sound.uuid == sample.sound.uuid
+    assert sample2.timestamp == sample.timestamp
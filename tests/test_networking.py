@@ -1,5 +1,207 @@
+import asyncio
+import time
 
+import pytest
 import zmq
 
+from perceptivo.networking.node import Node, Async_Node
+from perceptivo.networking.messages import Message
+from perceptivo.types.networking import Socket
+
 def test_zmq_capabilities():
-    assert zmq.has('ipc')
\ No newline at end of file
+    assert zmq.has('ipc')
+
+def _sockets(port:int):
+    server = Socket(id='test:server', socket_type='ROUTER', protocol='ipc', mode='bind', port=port)
+    client = Socket(id='test:client', socket_type='DEALER', protocol='ipc', mode='connect', port=port, to='test:server')
+    return server, client
+
+
+def test_async_request_reply():
+    """
+    Requests should be matched with their replies, and time out if there is no reply
+    """
+    server_sock, client_sock = _sockets(95001)
+
+    async def main():
+        server = None
+
+        async def echo(msg: Message):
+            if msg.key == 'PING':
+                await server.reply(msg, value=msg.value['value'] + 1)
+
+        server = Async_Node(server_sock, callback=echo)
+        client = Async_Node(client_sock)
+        await server.start()
+        await client.start()
+
+        replies = await asyncio.gather(*[client.request(key='PING', value=i, timeout=2) for i in range(5)])
+        assert [reply.value['value'] for reply in replies] == [1, 2, 3, 4, 5]
+
+        # messages that aren't requests go to the callback, and unanswered requests time out
+        with pytest.raises(asyncio.TimeoutError):
+            await client.request(key='IGNORED', timeout=0.1)
+        assert len(client._pending) == 0
+
+        await client.close()
+        await server.close()
+
+    asyncio.run(main())
+
+
+def test_async_recv_queue():
+    """
+    Without a callback, messages are queued for recv, and the ROUTER knows who sent them
+    """
+    server_sock, client_sock = _sockets(95002)
+
+    async def main():
+        server = Async_Node(server_sock)
+        client = Async_Node(client_sock, sndhwm=10)
+        await server.start()
+        await client.start()
+
+        await client.send(key='DATA', value=1)
+        msg = await server.recv(timeout=2)
+        assert msg.key == 'DATA'
+        assert msg.sender == 'test:client'
+
+        with pytest.raises(asyncio.TimeoutError):
+            await server.recv(timeout=0.05)
+
+        await client.close()
+        await server.close()
+
+    asyncio.run(main())
+
+
+@pytest.mark.parametrize('poll_mode', [Node.Poll_Mode.IOLOOP, Node.Poll_Mode.DEQUE])
+def test_node_compat(poll_mode):
+    """
+    Sync nodes should receive on the shared loop, and release without hanging
+    """
+    server_sock, client_sock = _sockets(95003)
+    received = []
+    server = Node(server_sock, poll_mode=poll_mode, callback=received.append)
+    client = Node(client_sock, poll_mode=Node.Poll_Mode.NONE)
+
+    client.send(key='CONNECT', id=client.id)
+    start = time.monotonic()
+    collected = received if poll_mode == Node.Poll_Mode.IOLOOP else server.deque
+    while len(collected) == 0 and time.monotonic() - start < 2:
+        time.sleep(0.01)
+    assert collected[0].key == 'CONNECT'
+
+    start = time.monotonic()
+    server.release()
+    client.release()
+    assert time.monotonic() - start < 1
+
+
+def test_node_send_from_callback():
+    """
+    IOLOOP callbacks run on the shared loop, so sending from one must not wait on the loop
+    """
+    server_sock, client_sock = _sockets(95004)
+    server = None
+
+    def echo(msg: Message):
+        server.send(key='ECHO', to=msg.sender, value=msg.value['value'])
+
+    server = Node(server_sock, poll_mode=Node.Poll_Mode.IOLOOP, callback=echo)
+    client = Node(client_sock, poll_mode=Node.Poll_Mode.DEQUE)
+
+    client.send(key='DATA', value=1)
+    start = time.monotonic()
+    while len(client.deque) == 0 and time.monotonic() - start < 2:
+        time.sleep(0.01)
+    assert client.deque[0].key == 'ECHO'
+    assert client.deque[0].value['value'] == 1
+
+    server.release()
+    client.release()
+
+
+def test_clock_sync_filter():
+    """
+    The offset should be taken from the sample with the smallest round trip time,
+    which is the least affected by asymmetric delays
+    """
+    from perceptivo.networking.clock_sync import Clock_Sync, Clock_Sample
+
+    offset = 5_000_000_000
+    clock = Clock_Sync('peer', window=8)
+    # (outbound, reply, inbound) delays in ns, mostly asymmetric queueing delays
+    delays = [(3_000_000, 100_000, 200_000), (400_000, 100_000, 5_000_000),
+              (150_000, 50_000, 150_000), (2_000_000, 100_000, 900_000)]
+    t0 = 0
+    for out, reply, back in delays:
+        t1 = t0 + out + offset
+        t2 = t1 + reply
+        t3 = t2 - offset + back
+        clock.add(Clock_Sample(t0, t1, t2, t3))
+        t0 += 1_000_000_000
+
+    assert clock.n_samples == 4
+    assert clock.rtt == 300_000
+    assert clock.offset == offset
+    assert clock.to_local(offset + 10) == 10
+    assert clock.to_remote(10) == offset + 10
+    # a message sent at 10 on our clock, received 1ms later
+    assert clock.latency_ms(offset + 10, 1_000_010) == 1
+    assert Clock_Sync('other').latency_ms(0, 0) is None
+
+    summary = clock.percentiles()
+    assert summary['n'] == 4
+    assert summary['min'] == 0.3
+    assert summary['p99'] == 5.4
+
+
+def test_ping_localhost():
+    """
+    Two nodes on localhost should estimate a small round trip time and a clock offset of about 0,
+    pinging in either direction
+    """
+    server_sock = Socket(id='test:server', socket_type='ROUTER', protocol='tcp', mode='bind', port=5671)
+    client_sock = Socket(id='test:client', socket_type='DEALER', protocol='tcp', mode='connect',
+                         port=5671, ip='localhost', to='test:server')
+
+    async def main():
+        received = []
+        server = Async_Node(server_sock, callback=received.append)
+        client = Async_Node(client_sock)
+        await server.start()
+        await client.start()
+
+        for _ in range(20):
+            clock = await client.ping(timeout=2)
+        assert clock is client.clocks['test:server']
+        assert clock.n_samples == 20
+
+        # the router can ping its peers too
+        for _ in range(5):
+            await server.ping(to='test:client', timeout=2)
+        assert server.clocks['test:client'].n_samples == 5
+
+        # pings are answered rather than given to the callback
+        assert len(received) == 0
+
+        # once the offset is known, message latency is measured with it
+        assert client._latency.count > 0
+        assert client._latency.max < 1000
+
+        for clock in (client.clocks['test:server'], server.clocks['test:client']):
+            rtts = clock.percentiles()
+            assert 0 < rtts['min'] <= rtts['p50'] <= rtts['p99'] < 1000
+            # same machine, same clock
+            assert abs(clock.offset) <= clock.rtt
+
+        # background pinging stops on close
+        client.start_pinging(interval=0.01)
+        await asyncio.sleep(0.2)
+        assert client.clocks['test:server'].n_samples > 20
+        await client.close()
+        assert client._ping_task is None
+        await server.close()
+
+    asyncio.run(main())
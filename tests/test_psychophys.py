@@ -0,0 +1,265 @@
+import numpy as np
+import pytest
+
+from perceptivo.psychophys import acquisition
+from perceptivo.psychophys.model import Gaussian_Process
+from perceptivo.psychophys.controller import Exam_Controller
+from perceptivo.psychophys.calibration import Pupil_Calibration
+from perceptivo.psychophys.dilation import Dilation_Analyzer
+from perceptivo.psychophys.oracle import reference_audiogram
+from perceptivo.types.exam import Exam_Params, Completion_Metric
+from perceptivo.types.psychophys import Sample
+
+
+def fit_model(acq:str, n_samples:int=20, batch:int=1) -> Gaussian_Process:
+    rng = np.random.default_rng(0)
+    oracle = reference_audiogram(scale=2, rng=rng)
+    params = Exam_Params(
+        frequencies=(500, 1000, 2000, 4000, 8000),
+        amplitudes=tuple(range(0, 45, 5)),
+        iti=0,
+        acquisition=acq,
+        acquisition_batch=batch
+    )
+    model = Gaussian_Process(amplitude_range=(0, 40), exam_params=params, rng=rng)
+    for i in range(n_samples):
+        sound = model.next()
+        model.update(Sample(response=oracle(sound), sound=sound))
+    return model
+
+
+def test_bald_scores():
+    """
+    BALD should prefer uncertain latent values over confidently predicted ones,
+    and be bounded by the entropy of the predicted response
+    """
+    mean = np.array([0, 0, 5, -5])
+    var = np.array([10, 0.01, 0.01, 0.01])
+    scores = acquisition.BALD().score(mean, var)
+    assert np.argmax(scores) == 0
+    assert np.all(scores >= 0)
+    assert np.all(scores <= acquisition.Uncertainty().score(mean, var) + 1e-9)
+
+
+@pytest.mark.parametrize('acq', ['Uncertainty', 'BALD', 'Batch_BALD'])
+def test_acquisition_select(acq):
+    """
+    Each acquisition function should pick valid grid points from the exam params
+    """
+    batch = 3 if acq == 'Batch_BALD' else 1
+    model = fit_model(acq, batch=batch)
+    assert isinstance(model.acquisition, acquisition.get_acquisition(acq))
+
+    sound = model.next()
+    assert sound.frequency in model.exam_params.frequencies
+    assert sound.amplitude in model.exam_params.amplitudes
+
+
+def test_batch_presented():
+    """
+    Every sound in a batch should be presented, in order, across updates,
+    before the next batch is selected
+    """
+    batch = 3
+    # just past the random warm-up, so the next sound starts a batch
+    model = fit_model('Batch_BALD', n_samples=10, batch=batch)
+    oracle = reference_audiogram(scale=2, rng=np.random.default_rng(1))
+
+    sound = model.next()
+    selected = [(sound.frequency, sound.amplitude)] + list(model._queue)
+    assert len(set(selected)) == batch
+
+    presented = [(sound.frequency, sound.amplitude)]
+    for _ in range(batch - 1):
+        model.update(Sample(response=oracle(sound), sound=sound))
+        sound = model.next()
+        presented.append((sound.frequency, sound.amplitude))
+    assert presented == selected
+
+    # then a new batch
+    model.update(Sample(response=oracle(sound), sound=sound))
+    model.next()
+    assert len(model._queue) == batch - 1
+
+
+def test_thresholds():
+    model = fit_model('BALD', n_samples=40)
+    thresholds = model.thresholds(model.exam_params.frequencies)
+    assert thresholds.shape == (len(model.exam_params.frequencies),)
+    finite = thresholds[np.isfinite(thresholds)]
+    assert np.all((finite >= 0) & (finite <= 40))
+
+
+def test_benchmark_acquisition():
+    results = acquisition.benchmark_acquisition(acquisitions=('BALD',), n_trials=15, n_repeats=1)
+    assert 1 <= results['BALD']['mean'] <= 16
+
+
+class Fake_Model:
+    """Model whose thresholds converge after a few updates"""
+    log_likelihood = -10
+
+    def __init__(self):
+        self.n = 0
+
+    def thresholds(self, frequencies):
+        self.n += 1
+        return np.full(len(frequencies), 10 + 10/self.n)
+
+
+def test_controller_n_trials():
+    metric = Completion_Metric(log_likelihood=None, n_trials=3)
+    controller = Exam_Controller(metric)
+    controller.start()
+    assert [controller.update(Fake_Model()) for _ in range(3)] == [False, False, True]
+    assert controller.reason == 'n_trials'
+
+
+def test_controller_stability():
+    metric = Completion_Metric(log_likelihood=None, threshold_stability=1, stability_window=3)
+    controller = Exam_Controller(metric, frequencies=(1000, 2000))
+    model = Fake_Model()
+    n_updates = 0
+    while not controller.update(model):
+        n_updates += 1
+        assert n_updates < 20
+    # 10/n - 10/(n+2) <= 1 first when n == 4
+    assert controller.n_trials == 6
+    assert controller.status['threshold_stability'] <= 1
+
+
+def test_controller_use():
+    metric = Completion_Metric(log_likelihood=-5, n_trials=100, use='all')
+    controller = Exam_Controller(metric)
+    assert not controller.update(Fake_Model())
+
+    with pytest.raises(ValueError):
+        Exam_Controller(Completion_Metric(use='duration'))
+
+
+def test_posterior_summary():
+    """
+    Posterior summaries should be the same size however many samples the model has,
+    and survive serialization in a message
+    """
+    import msgpack
+    from perceptivo.networking.messages import Message
+    from perceptivo.types.psychophys import Posterior_Summary
+
+    sizes = []
+    for n_samples in (5, 30):
+        model = fit_model('BALD', n_samples=n_samples)
+        summary = model.summarize(version=n_samples, resolution=20)
+        assert summary.n_samples == n_samples
+        assert summary.probability_grid.shape == (20, 20)
+        assert np.all((summary.probability_grid >= 0) & (summary.probability_grid <= 1))
+        assert summary.threshold_frequencies == [500, 1000, 2000, 4000, 8000]
+        sizes.append(len(msgpack.packb(summary.dict())))
+
+    assert sizes[0] == sizes[1]
+
+    msg = Message.from_serialized(Message(key='DATA', posterior=summary).serialize())
+    received = msg.value['posterior']
+    assert isinstance(received, Posterior_Summary)
+    assert received.version == 30
+    assert np.array_equal(received.probability_grid, summary.probability_grid)
+
+
+def test_pupil_calibration():
+    """
+    Once calibrated, the threshold should come from the patient's pupil noise
+    so that noise alone isn't a response but a real dilation is.
+    """
+    rng = np.random.default_rng(0)
+    calibration = Pupil_Calibration(threshold=0.5, trials=5)
+    onset = 10
+    times = np.arange(60)
+
+    def trial(dilation: float):
+        diameters = 40 * (1 + rng.normal(0, 0.01, size=len(times)))
+        diameters[times >= onset] *= 1 + dilation
+        return calibration.calibrate(diameters.tolist(), times.tolist(), onset)
+
+    for _ in range(5):
+        params = trial(0)
+        assert params.threshold == 0.5
+    assert calibration.calibrated
+
+    params = trial(0)
+    assert 0.01 < params.threshold < 0.1
+    assert np.isclose(params.baseline, 40, rtol=0.02)
+
+    state = calibration.state()
+    assert state.n_trials == 6
+    assert state.calibrated
+    assert np.isclose(state.noise_std, 0.01, rtol=0.3)
+    assert np.isclose(state.baseline_median, 40, rtol=0.02)
+
+    # no baseline -> default params, statistics unchanged
+    params = calibration.calibrate([40, 41], [onset, onset + 1], onset)
+    assert params.baseline is None
+    assert calibration.n_trials == 6
+
+
+def _pupil_trace(dilation: float, blinks=(), seed: int = 0, fps: float = 30):
+    """
+    Diameters with jittered timestamps from 1s before to 5s after an onset at 0,
+    dilating with a Hoeks & Levelt response peaking at 0.93s, and dropping to a tenth
+    of their size during ``blinks`` (start, end) seconds
+    """
+    rng = np.random.default_rng(seed)
+    times = np.arange(round(6 * fps)) / fps - 1 + rng.uniform(0, 0.005, size=round(6 * fps))
+    response = np.where(times > 0, np.clip(times, 0, None) ** 10 * np.exp(-10 * times / 0.93), 0)
+    diameters = 40 * (1 + dilation * response / response.max() + rng.normal(0, 0.005, size=len(times)))
+    for start, end in blinks:
+        diameters[(times >= start) & (times < end)] /= 10
+    return np.round(times * 1e9).astype(np.int64), diameters
+
+
+def test_dilation_analyzer():
+    """
+    The analyzer should measure dilations through short blinks and spurious ellipses,
+    and refuse to measure through long blinks.
+    """
+    analyzer = Dilation_Analyzer(baseline=1, duration=5)
+
+    timestamps, diameters = _pupil_trace(0.1, blinks=((2, 2.15),))
+    # a spurious ellipse, away from the blink so their margins don't merge
+    diameters[135] = 200
+    features = analyzer.analyze(timestamps, diameters, 0)
+    assert features.valid
+    assert 0 < features.blink_fraction < 0.2
+    assert np.isclose(features.baseline, 40, rtol=0.01)
+    assert np.isclose(features.peak, 0.1, atol=0.01)
+    assert np.isclose(features.peak_latency, 0.93, atol=0.15)
+    assert 0 < features.latency < features.peak_latency
+    assert np.all(np.isfinite(analyzer.trace))
+    assert np.max(analyzer.trace) < 40 * 1.12
+
+    timestamps, diameters = _pupil_trace(0, seed=1)
+    assert analyzer.analyze(timestamps, diameters, 0).peak < 0.02
+
+    timestamps, diameters = _pupil_trace(0.1, blinks=((1, 2),), seed=2)
+    features = analyzer.analyze(timestamps, diameters, 0)
+    assert not features.valid
+    assert features.peak is None
+    assert np.all(np.isnan(analyzer.trace))
+
+
+def test_dilation_analyzer_batch():
+    """
+    Analyzing trials together should give the same features as one at a time
+    """
+    analyzer = Dilation_Analyzer(baseline=1, duration=5)
+    trials = [_pupil_trace(dilation, seed=i) for i, dilation in enumerate((0, 0.05, 0.1, 0.2))]
+    onsets = [0] * len(trials)
+
+    features, traces = analyzer.analyze_batch([t[0] for t in trials], [t[1] for t in trials], onsets)
+    assert traces.shape == (len(trials), len(analyzer.grid))
+    for (timestamps, diameters), batch_features, trace in zip(trials, features, traces):
+        single = analyzer.analyze(timestamps, diameters, 0)
+        assert np.isclose(single.peak, batch_features.peak)
+        assert np.isclose(single.peak_latency, batch_features.peak_latency)
+        assert np.allclose(analyzer.trace, trace)
+    assert [f.peak for f in features] == sorted(f.peak for f in features)
+
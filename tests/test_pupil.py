@@ -0,0 +1,137 @@
+import numpy as np
+import pytest
+
+pytest.importorskip('skimage')
+
+from perceptivo.types.pupil import Raw_Pupil, Blink_Gate_Params
+from perceptivo.types.units import Raw_Ellipse
+from perceptivo.types.video import Raw_Frame
+from perceptivo.video.pupil import PupilExtractor, Blink_Gate, Starburst_Extractor, fit_ellipse_ransac, get_extractor
+
+
+def eye_frame(x: int = 320, y: int = 240, radius: int = 20, lid: float = 0, level: int = 200,
+              glint: bool = False) -> Raw_Frame:
+    """
+    A bright frame with a dark pupil, with the top ``lid`` fraction of the pupil covered by the eyelid,
+    and optionally a bright glint inside the pupil
+    """
+    rows, cols = np.ogrid[:480, :640]
+    frame = np.full((480, 640), level, dtype=np.uint8)
+    pupil = (rows - y) ** 2 + (cols - x) ** 2 <= radius ** 2
+    pupil &= rows >= y - radius + 2 * radius * lid
+    frame[pupil] = 20
+    if glint:
+        frame[(rows - (y - radius * 0.4)) ** 2 + (cols - (x + radius * 0.4)) ** 2 <= (radius * 0.15) ** 2] = 250
+    return Raw_Frame(frame=frame, timestamp=0)
+
+
+class Center_Extractor(PupilExtractor):
+    """Finds the same pupil in every frame, counting how many frames it was asked to process"""
+
+    def __init__(self, **kwargs):
+        super(Center_Extractor, self).__init__(**kwargs)
+        self.n_processed = 0
+
+    def _process(self, frame):
+        self.n_processed += 1
+        return Raw_Pupil(ellipse=Raw_Ellipse(x=320, y=240, a=20., b=20., t=0), frame=frame)
+
+
+def test_blink_gate():
+    """
+    The gate should pass open eyes, and reject blinks and occluded frames,
+    before and after it has found a pupil to check around
+    """
+    gate = Blink_Gate(Blink_Gate_Params())
+
+    # no pupil yet, check the whole frame
+    assert gate.check(eye_frame())
+    assert not gate.check(eye_frame(lid=1))
+    assert not gate.check(eye_frame(level=10))
+
+    open_eye = eye_frame()
+    gate.update(Raw_Pupil(ellipse=Raw_Ellipse(x=320, y=240, a=20., b=20., t=0), frame=open_eye))
+    assert 0.2 < gate.expected < 0.5
+    rows, cols = gate.roi(open_eye.frame.shape)
+    assert rows.start == 210 and cols.start == 290
+
+    assert gate.check(eye_frame())
+    assert gate.check(eye_frame(lid=0.2))
+    assert not gate.check(eye_frame(lid=0.8))
+    assert not gate.check(eye_frame(lid=1))
+    # a pupil that moved away from where we last saw it is treated as a blink until the gate is reset
+    assert not gate.check(eye_frame(x=100))
+    gate.reset()
+    assert gate.check(eye_frame(x=100))
+
+    # ... or until it has been gated long enough to look for it in the whole frame again
+    gate = Blink_Gate(Blink_Gate_Params(max_gated=3))
+    gate.update(Raw_Pupil(ellipse=Raw_Ellipse(x=320, y=240, a=20., b=20., t=0), frame=open_eye))
+    assert not any(gate.check(eye_frame(x=100)) for _ in range(3))
+    assert gate.roi(open_eye.frame.shape)[0].start is None
+    assert gate.check(eye_frame(x=100))
+
+
+def test_extractor_gate():
+    """
+    Extractors shouldn't process gated frames, and should mark them as gated
+    """
+    extractor = Center_Extractor(gate=Blink_Gate())
+
+    assert extractor.process(eye_frame()) is not None
+    assert not extractor.gated
+
+    assert extractor.process(eye_frame(lid=1)) is None
+    assert extractor.gated
+    assert extractor.n_processed == 1
+
+    assert extractor.process(eye_frame()) is not None
+    assert not extractor.gated
+    assert extractor.n_processed == 2
+
+
+def test_fit_ellipse_ransac():
+    """
+    RANSAC should recover an ellipse from points on it despite outliers
+    """
+    rng = np.random.default_rng(0)
+    theta = rng.uniform(0, 2 * np.pi, 60)
+    x, y, a, b, t = 100., 50., 30., 18., 0.4
+    points = np.column_stack((
+        x + a * np.cos(theta) * np.cos(t) - b * np.sin(theta) * np.sin(t),
+        y + a * np.cos(theta) * np.sin(t) + b * np.sin(theta) * np.cos(t)
+    )) + rng.normal(0, 0.2, (60, 2))
+    outliers = rng.uniform(50, 150, (20, 2))
+
+    ellipse, inliers = fit_ellipse_ransac(np.concatenate((points, outliers)), rng=rng)
+    assert np.allclose([ellipse.x, ellipse.y, ellipse.a, ellipse.b], [x, y, a, b], atol=0.5)
+    assert np.isclose(ellipse.t % np.pi, t, atol=0.05)
+    assert inliers[:60].mean() > 0.9
+    assert inliers[60:].mean() < 0.3
+
+    assert fit_ellipse_ransac(points[:4]) is None
+
+
+def test_starburst_extractor():
+    """
+    The starburst extractor should find the pupil from a coarse search, track it from the last one,
+    and give up rather than fit garbage when the eye is closed
+    """
+    assert get_extractor('starburst') is Starburst_Extractor
+    extractor = Starburst_Extractor()
+
+    pupil = extractor.process(eye_frame(x=300, y=200, radius=25, glint=True))
+    assert pupil is not None
+    assert np.allclose([pupil.ellipse.x, pupil.ellipse.y], [300, 200], atol=1)
+    assert np.allclose([pupil.ellipse.a, pupil.ellipse.b], 25, atol=1.5)
+    # only touches pixels along its rays
+    assert len(extractor.points) < 200
+
+    # seeded from the last pupil
+    pupil = extractor.process(eye_frame(x=310, y=205, radius=28, glint=True))
+    assert np.allclose([pupil.ellipse.x, pupil.ellipse.y], [310, 205], atol=1)
+    assert np.allclose(pupil.ellipse.a, 28, atol=1.5)
+
+    assert extractor.process(eye_frame(lid=1)) is None
+    assert extractor.last_ellipse is None
+
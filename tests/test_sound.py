@@ -0,0 +1,95 @@
+import time
+
+import numpy as np
+import pytest
+
+from perceptivo.sound.bank import Sound_Bank
+from perceptivo.types.sound import Sound, Jackd_Config
+
+
+def test_sound_bank_lru():
+    """
+    Tables should be evicted least-recently-used once the bank is over its budget
+    """
+    table = np.zeros(1000, dtype=np.float32)
+    bank = Sound_Bank(max_bytes=table.nbytes * 2)
+
+    sounds = [Sound(frequency=f, amplitude=0.1) for f in (1000, 2000, 3000)]
+    bank._store(bank.key(sounds[0]), table.copy())
+    bank._store(bank.key(sounds[1]), table.copy())
+
+    # touch the first so the second is the least recently used
+    assert bank.get(sounds[0]) is not None
+    bank._store(bank.key(sounds[2]), table.copy())
+
+    assert sounds[0] in bank
+    assert sounds[1] not in bank
+    assert sounds[2] in bank
+    assert bank.nbytes == table.nbytes * 2
+
+
+def test_onset_jitter():
+    """
+    Sounds should be stamped with the time they reach the (loopback) speaker,
+    not the time they were handed to the output stream
+    """
+    from perceptivo.sound.latency import measure_onset_jitter
+
+    result = measure_onset_jitter(fs=16000, blocksize=256, nperiods=2, n_sounds=10, duration=0.01)
+    assert result['n'] == 10
+    # 2 periods of 256 samples = 32ms of latency that naive stamping misses
+    assert result['naive']['median'] > 20
+    assert abs(result['stamped']['median']) < 5
+
+
+def test_playback_scheduler():
+    """
+    The scheduler should return once the sound is stamped, before it has finished playing,
+    and stamp onsets as accurately as opening a stream per sound
+    """
+    from perceptivo.sound.latency import Dummy_Speaker, measure_onset_jitter
+    from perceptivo.sound.soundcard import Playback_Scheduler
+
+    scheduler = Playback_Scheduler(Dummy_Speaker(blocksize=256), fs=16000, blocksize=256)
+    scheduler.start()
+    sound = Sound(frequency=1000, amplitude=0, duration=0.5)
+    finished = scheduler.play(np.zeros(8000, dtype=np.float32), sound)
+    assert sound.timestamp is not None
+    assert not finished.is_set()
+    assert finished.wait(2)
+    scheduler.stop()
+    assert not scheduler.running
+
+    result = measure_onset_jitter(fs=16000, blocksize=256, nperiods=2, n_sounds=10, duration=0.01, persistent=True)
+    assert abs(result['stamped']['median']) < 5
+
+
+def _fake_jackd(path, script:str):
+    """Write a stand-in jackd script that ignores its arguments"""
+    path.write_text('#!/bin/sh\n' + script)
+    path.chmod(0o755)
+    return Jackd_Config(bin=path)
+
+
+@pytest.mark.parametrize('script,error', [
+    ('sleep 0.1\necho "configuring for 44100Hz, period = 1024 frames (23.2 ms), buffer = 3 periods"\nsleep 30\n', None),
+    ('echo "Cannot open PCM device" >&2\nexit 1\n', RuntimeError),
+    ('sleep 30\n', TimeoutError)
+])
+def test_boot_jackd(tmp_path, script, error):
+    """
+    boot_jackd should return as soon as jackd prints that it's ready, and raise
+    if it exits or doesn't become ready in time
+    """
+    from perceptivo.sound import server
+
+    config = _fake_jackd(tmp_path / 'jackd', script)
+    if error is None:
+        start = time.monotonic()
+        proc = server.boot_jackd(config, probe=None)
+        assert time.monotonic() - start < 2
+        assert proc.poll() is None
+        server.kill_jackd(proc)
+    else:
+        with pytest.raises(error):
+            server.boot_jackd(config, timeout=0.5, probe=None)
@@ -0,0 +1,70 @@
+import pickle
+
+import numpy as np
+
+from perceptivo.types.video import Frame, Raw_Frame
+from perceptivo.types.units import Ellipse, Raw_Ellipse
+from perceptivo.types.pupil import Pupil, Raw_Pupil
+
+
+def test_raw_types_convert():
+    """
+    Raw types should convert to equivalent validated types, and pickle to cross process queues
+    """
+    array = np.arange(12, dtype=np.uint8).reshape(3, 4)
+    raw = Raw_Pupil(
+        ellipse=Raw_Ellipse(x=1, y=2, a=3., b=4., t=0.5),
+        frame=Raw_Frame(frame=array)
+    )
+    assert raw.frame.color is False
+    assert raw.frame.gray is array
+
+    pupil = raw.to_pupil()
+    assert isinstance(pupil, Pupil)
+    assert pupil.ellipse == Ellipse(x=1, y=2, a=3., b=4., t=0.5)
+    assert np.array_equal(pupil.frame.frame, array)
+    assert pupil.frame.timestamp == raw.frame.timestamp
+
+    unpickled = pickle.loads(pickle.dumps(raw.frame))
+    assert np.array_equal(unpickled.frame, array)
+    assert unpickled.timestamp == raw.frame.timestamp
+
+
+def test_dilation_baseline():
+    """
+    With a baseline, a response is a dilation after the onset relative to the diameter before it
+    """
+    from perceptivo.types.pupil import Dilation, Pupil_Params
+
+    onset = 10_000
+    timestamps = [onset + (i - 5) * 100 for i in range(15)]
+    diameters = [20.] * 5 + [20.5] * 5 + [22.] * 5
+    pupils = [
+        Raw_Pupil(ellipse=Raw_Ellipse(x=0, y=0, a=d, b=d, t=0), frame=Raw_Frame(frame=np.zeros((2, 2), dtype=np.uint8), timestamp=t)).to_pupil()
+        for d, t in zip(diameters, timestamps)
+    ]
+
+    dilation = Dilation(params=Pupil_Params(threshold=0.05, baseline=20.), pupils=pupils, timestamps=timestamps, onset=onset)
+    assert np.array_equal(dilation.baseline_diameters, [20.] * 5)
+    assert dilation.max_diameter == 22.
+    assert dilation.response
+
+    dilation.params = Pupil_Params(threshold=0.2, baseline=20.)
+    assert not dilation.response
+
+    # measured features take precedence over the raw diameters
+    from perceptivo.types.pupil import Dilation_Features
+    dilation.features = Dilation_Features(valid=True, baseline=20., peak=0.3)
+    assert dilation.response
+    dilation.features = Dilation_Features(valid=False)
+    assert not dilation.response
+
+    # without a baseline or valid features there is nothing to compare the peak to
+    dilation.features = None
+    dilation.params = Pupil_Params(threshold=0.05, max_diameter=22.)
+    assert not dilation.response
+
+    # no pupils after the onset
+    dilation = Dilation(params=Pupil_Params(threshold=0.05, baseline=20.), pupils=pupils[:5], timestamps=timestamps[:5], onset=onset)
+    assert dilation.max_diameter is None
+    assert not dilation.response
@@ -0,0 +1,134 @@
+import time
+
+import numpy as np
+import pytest
+
+pytest.importorskip('cv2')
+
+from perceptivo.types.video import Picamera_Params, Synthetic_Eye_Params
+from perceptivo.video.sources import get_source, record, Synthetic_Eye_Source, Memmap_Source
+
+
+def test_synthetic_eye():
+    """
+    The synthetic eye should draw a dark pupil of the scripted diameter,
+    and produce the same frames each time
+    """
+    params = Picamera_Params(
+        source='synthetic', resolution=(320, 240), fps=30, realtime=False,
+        synthetic=Synthetic_Eye_Params(diameter=40, dilations=[(0.5, 20)], period=None, noise=2, wander=0)
+    )
+    source = get_source(params.source)(params)
+    assert isinstance(source, Synthetic_Eye_Source)
+    source.start()
+
+    frames = [source.read() for _ in range(60)]
+    assert all(frame.shape == (240, 320) and frame.dtype == np.uint8 for frame in frames)
+
+    # peak dilation t_max after the onset
+    assert source.diameter(0) == 40
+    assert source.diameter(0.5 + params.synthetic.t_max) == pytest.approx(60)
+    for index in (0, 43):
+        pupil_area = np.sum(frames[index] < (Synthetic_Eye_Source.PUPIL_LEVEL + Synthetic_Eye_Source.IRIS_LEVEL) / 2)
+        diameter = 2 * np.sqrt(pupil_area / np.pi)
+        assert diameter == pytest.approx(source.diameter(index / params.fps), abs=2)
+
+    again = get_source('synthetic')(params)
+    again.start()
+    assert np.array_equal(again.read(), frames[0])
+
+
+def test_memmap_replay(tmp_path):
+    """
+    Frames recorded from a source should be replayed by a memmap source, looping if asked
+    """
+    params = Picamera_Params(source='synthetic', resolution=(64, 48), fps=1000, realtime=False)
+    source = Synthetic_Eye_Source(params)
+    source.start()
+    path = record(source, tmp_path / 'frames.npy', 10)
+    expected = [Synthetic_Eye_Source(params).frame(i) for i in range(10)]
+
+    replay = Memmap_Source(params.copy(update={'source': 'memmap', 'source_file': path, 'loop': True}))
+    replay.start()
+    replayed = [replay.read() for _ in range(15)]
+    assert all(np.array_equal(a, b) for a, b in zip(replayed, expected + expected[:5]))
+
+    once = Memmap_Source(params.copy(update={'source': 'memmap', 'source_file': path, 'loop': False}))
+    once.start()
+    assert len([frame for frame in (once.read() for _ in range(12)) if frame is not None]) == 10
+    assert once.finished
+
+
+def test_source_realtime():
+    """
+    Realtime sources should be paced at the frame rate, and others should run as fast as they can
+    """
+    params = Picamera_Params(source='synthetic', resolution=(64, 48), fps=100)
+    source = Synthetic_Eye_Source(params)
+    source.start()
+    start = time.perf_counter()
+    for _ in range(20):
+        source.read()
+    assert time.perf_counter() - start >= 19 / 100
+
+    fast = Synthetic_Eye_Source(params.copy(update={'realtime': False}))
+    fast.start()
+    start = time.perf_counter()
+    for _ in range(20):
+        fast.read()
+    assert time.perf_counter() - start < 19 / 100
+
+    with pytest.raises(ValueError):
+        get_source('webcam')
+
+
+def test_source_timestamps():
+    """
+    Frames should be stamped with when they were captured, not when they were read
+    """
+    from datetime import datetime, timedelta
+    from queue import Queue
+    from types import SimpleNamespace
+    from perceptivo.clock import now_ns, NS_PER_S
+    from perceptivo.video.sources import PiCamera_Source
+
+    params = Picamera_Params(source='synthetic', resolution=(64, 48), fps=100)
+    source = Synthetic_Eye_Source(params)
+    source.start()
+    before = now_ns()
+    source.read()
+    assert before <= source.timestamp <= now_ns()
+
+    # the picamera stamps frames in its capture thread and queues them
+    picam = PiCamera_Source(params.copy(update={'source': 'picamera'}))
+    picam.cam = SimpleNamespace(q=Queue())
+    captured = now_ns() - NS_PER_S // 2
+    picam.cam.q.put(((datetime.now() - timedelta(seconds=0.5)).isoformat(), np.zeros((48, 64), dtype=np.uint8)))
+    picam.read()
+    assert abs(picam.timestamp - captured) < NS_PER_S // 100
+
+
+def test_pretrigger_buffer():
+    """
+    Frames from before collection starts should be put in the queue oldest first,
+    keeping only the last ``pretrigger`` seconds
+    """
+    from perceptivo.video.cameras import Picamera_Process
+    from perceptivo.types.video import Raw_Frame
+
+    params = Picamera_Params(source='synthetic', resolution=(8, 6), fps=30)
+    proc = Picamera_Process(params, pretrigger=0.1)
+    assert proc.pretrigger_size == 3
+
+    for i in range(5):
+        proc._buffer(Raw_Frame(frame=np.full((6, 8), i, dtype=np.uint8), timestamp=1000 + i, color=False))
+    assert proc._flush_pretrigger(color=False) == 0
+
+    flushed = [proc.q.get(timeout=1) for _ in range(3)]
+    assert [frame.timestamp for frame in flushed] == [1002, 1003, 1004]
+    assert [int(frame.frame[0, 0]) for frame in flushed] == [2, 3, 4]
+    assert all(frame.frame.shape == (6, 8) for frame in flushed)
+
+    # the buffer is emptied once it's flushed
+    assert proc._flush_pretrigger(color=False) == 0
+    assert proc.q.empty()